@@ -0,0 +1,185 @@
+"""
+Per-source admission control and load shedding, in front of PySNMP.
+
+Every request is handled on the single dispatcher loop, so one poller that
+sends too fast (or a walk of a huge table) delays everybody else. The UDP
+transport calls admit() for each datagram before anything else (response
+cache, fast path, PySNMP decoding); it only parses the message header:
+
+- v1/v2c requests with a community the agent does not know are dropped at
+  once. PySNMP would decode the whole message just to discard it.
+- token buckets limit the requests/s of each source IP and of each
+  community (SNMPv3: user name) with a burst allowance. A request over
+  either limit is dropped: to the manager it looks like a lost datagram and
+  it retries later. Source buckets are kept in an LRU bounded by
+  max_sources (an evicted source starts again with a full bucket, like an
+  idle one).
+- load shedding: the transport reports the time the dispatcher spends on
+  each message (busy()) and run() turns it into the loop utilization every
+  `interval` seconds. After `shed_after` consecutive intervals at
+  `shed_above` or more the agent is overloaded (a short burst, or a single
+  walk, is not an overload); it stops shedding below `recover_below`.
+  While overloaded it drops GETNEXT and GETBULK (walks: many requests, and
+  the most expensive ones) but only from sources that sent more than their
+  fair share (the mean per active source) in the last interval. GET and SET
+  are still served, and so are walks from the quieter sources; a lone
+  source is never shed, there is nobody else to protect. SNMPv3 requests
+  are never shed: their PDU type may be encrypted.
+
+Responses, reports and notifications coming in (e.g. inform acknowledgements)
+are always admitted, and so is anything the header parser does not
+understand (PySNMP decides, and counts, what to do with it). A rate of 0
+disables that bucket; shed_above=0 disables shedding. Counters are served
+under agentAdmission (agentStats.4, see view()).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+from agent_logging import get_logger
+from ber_fastpath import (BerError, REQUEST_TAGS, TAG_GETBULK, TAG_GETNEXT, V3_REPORTABLE,
+                          message_version, parse_request, parse_v3)
+from mib_tables import ScalarGroup
+
+log = get_logger('admission')
+
+SHED_TAGS = frozenset((TAG_GETNEXT, TAG_GETBULK))
+
+
+def take(bucket, rate, burst, now):
+    """Refill bucket = [tokens, stamp] and take one token; False if empty"""
+    tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+    bucket[1] = now
+    if tokens < 1.0:
+        bucket[0] = tokens
+        return False
+    bucket[0] = tokens - 1.0
+    return True
+
+
+class AdmissionControl:
+    def __init__(self, communities, users=(), source_rate=500.0, source_burst=1000,
+                 community_rate=2000.0, community_burst=4000, shed_above=0.9,
+                 recover_below=0.7, shed_after=3, max_sources=10000, clock=time.monotonic):
+        self.communities = {c.encode() if isinstance(c, str) else c for c in communities}
+        self.users = {u.encode() if isinstance(u, str) else u for u in users}
+        self.source_rate = source_rate
+        self.source_burst = source_burst
+        self.community_rate = community_rate
+        self.community_burst = community_burst
+        self.shed_above = shed_above
+        self.recover_below = min(recover_below, shed_above)
+        self.shed_after = max(1, shed_after)
+        self.max_sources = max_sources
+        self.clock = clock
+        self.sources = OrderedDict()   # source IP -> [tokens, stamp]
+        self.principals = {}           # known community / v3 user (b'' = any other) -> [tokens, stamp]
+        self.overloaded = False
+        self.utilization = 0.0
+        self._busy = 0.0
+        self._over = 0                 # consecutive intervals at shed_above or more
+        self._counts = {}              # source IP -> requests in the current interval
+        self._heavy = frozenset()      # sources over their fair share in the last interval
+        self.admitted = 0
+        self.source_drops = 0
+        self.community_drops = 0
+        self.bad_community = 0
+        self.shed = 0
+
+    def admit(self, datagram, address):
+        """False if the datagram must be dropped before PySNMP sees it"""
+        try:
+            if message_version(datagram) == 3:
+                _, flags, user = parse_v3(datagram)
+                if not flags & V3_REPORTABLE:
+                    return True
+                principal, pdu_tag = (user if user in self.users else b''), None
+            else:
+                _, principal, pdu_tag, _, _, _, _, _ = parse_request(datagram)
+                if pdu_tag not in REQUEST_TAGS:
+                    return True
+                if principal not in self.communities:
+                    self.bad_community += 1
+                    return False
+        except (BerError, IndexError):
+            return True
+        if self.shed_above:
+            counts, source = self._counts, address[0]
+            if source in counts or len(counts) < self.max_sources:
+                counts[source] = counts.get(source, 0) + 1
+            if self.overloaded and pdu_tag in SHED_TAGS and source in self._heavy:
+                self.shed += 1
+                return False
+        now = self.clock()
+        if self.source_rate:
+            source = address[0]
+            bucket = self.sources.get(source)
+            if bucket is None:
+                bucket = self.sources[source] = [self.source_burst, now]
+                if len(self.sources) > self.max_sources:
+                    self.sources.popitem(last=False)
+            else:
+                self.sources.move_to_end(source)
+            if not take(bucket, self.source_rate, self.source_burst, now):
+                self.source_drops += 1
+                return False
+        if self.community_rate:
+            bucket = self.principals.get(principal)
+            if bucket is None:
+                bucket = self.principals[principal] = [self.community_burst, now]
+            if not take(bucket, self.community_rate, self.community_burst, now):
+                self.community_drops += 1
+                return False
+        self.admitted += 1
+        return True
+
+    def busy(self, seconds):
+        """Time the dispatcher spent on one message (reported by the transport)"""
+        self._busy += seconds
+
+    async def run(self, interval=0.5):
+        """Update the utilization and the overload state until cancelled"""
+        loop = asyncio.get_running_loop()
+        last = loop.time()
+        while True:
+            await asyncio.sleep(interval)
+            now = loop.time()
+            self.utilization = min(1.0, self._busy / max(now - last, 1e-6))
+            self._busy = 0.0
+            last = now
+            if not self.shed_above:
+                continue
+            counts, self._counts = self._counts, {}
+            if len(counts) > 1:
+                fair = sum(counts.values()) / len(counts)
+                self._heavy = frozenset(s for s, n in counts.items() if n > fair)
+            else:
+                self._heavy = frozenset()
+            self._over = self._over + 1 if self.utilization >= self.shed_above else 0
+            if not self.overloaded and self._over >= self.shed_after:
+                self.overloaded = True
+                log.warning("⚠️ Sobrecarga: bucle ocupado al %d%%, se descartan GETNEXT/GETBULK "
+                            "de los orígenes por encima de su parte (%d)",
+                            round(self.utilization * 100), len(self._heavy))
+            elif self.overloaded and self.utilization < self.recover_below:
+                self.overloaded = False
+                log.info("✅ Fin de la sobrecarga (bucle al %d%%, %d peticiones descartadas)",
+                         round(self.utilization * 100), self.shed)
+
+    def view(self):
+        """agentAdmission subtree: scalars .1-.7"""
+        return ScalarGroup({
+            1: ("Counter32", lambda: self.admitted),           # agentAdmissionAdmitted
+            2: ("Counter32", lambda: self.source_drops),       # agentAdmissionSourceDrops
+            3: ("Counter32", lambda: self.community_drops),    # agentAdmissionCommunityDrops
+            4: ("Counter32", lambda: self.bad_community),      # agentAdmissionBadCommunity
+            5: ("Counter32", lambda: self.shed),               # agentAdmissionShed
+            6: ("Integer32", lambda: int(self.overloaded)),    # agentAdmissionOverloaded
+            7: ("Gauge32", lambda: round(self.utilization * 100)),   # agentAdmissionUtilization
+        })
+
+    def metrics(self):
+        return {"admitted": self.admitted, "source_drops": self.source_drops,
+                "community_drops": self.community_drops, "bad_community": self.bad_community,
+                "shed": self.shed, "sources": len(self.sources)}
@@ -0,0 +1,76 @@
+"""
+Levelled, per-component logging for the mini agent.
+
+Every component logs through its own logger under the 'agent' namespace
+(agent.store, agent.get, agent.getnext, agent.getbulk, agent.set,
+agent.sampler, agent.notify, agent.persist, ...), so levels can be tuned
+one component at a time.
+
+Hot paths must stay free when a level is off:
+- pass arguments lazily:  log.debug("oid=%s value=%s", oid, val)
+  (the message is only formatted if a handler actually emits it)
+- guard anything expensive to compute (prettyPrint(), list building):
+      if log.isEnabledFor(DEBUG):
+          log.debug("varbinds=%s", [v.prettyPrint() for v in vbs])
+
+Levels come from LOG_LEVELS in mini_agent_v4.py and can be overridden with
+the MINI_AGENT_LOG environment variable, e.g.
+    MINI_AGENT_LOG="agent=INFO,agent.get=DEBUG,agent.set=DEBUG"
+"""
+
+import json
+import logging
+import os
+import sys
+
+DEBUG = logging.DEBUG
+ROOT = 'agent'
+
+TEXT_FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line (for log shippers)"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "component": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def get_logger(component):
+    return logging.getLogger(f'{ROOT}.{component}' if component else ROOT)
+
+
+def parse_levels(spec):
+    """'agent=INFO,agent.get=DEBUG' -> {'agent': 'INFO', 'agent.get': 'DEBUG'}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        if not level:
+            name, level = ROOT, name
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(levels=None, fmt='text', stream=None):
+    """Install one handler on the 'agent' logger and apply per-component levels"""
+    levels = dict(levels or {})
+    levels.update(parse_levels(os.environ.get('MINI_AGENT_LOG', '')))
+    root = logging.getLogger(ROOT)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    root.addHandler(handler)
+    root.propagate = False
+    root.setLevel(levels.pop(ROOT, 'INFO'))
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+    return root
@@ -0,0 +1,77 @@
+"""
+Agent self-monitoring counters (MYAGENT-MIB agentStats, 1.3.6.1.4.1.28308.4).
+
+Everything is preallocated at start-up in flat array.array buffers:
+
+- requests / errors per handler          (agentHandlerTable)
+- error count per (handler, errStatus)   (agentErrorTable)
+- fixed-bucket latency histogram         (agentLatencyTable)
+
+observe() is a handful of integer increments plus one bisect over a constant
+tuple of bucket bounds. It allocates no per-request structures and takes no
+locks: only the dispatcher loop thread writes these counters, and readers
+(GET/GETNEXT on agentStats) run on that same thread.
+"""
+
+import time
+from array import array
+from bisect import bisect_left
+
+from mib_tables import ColumnarTable
+
+# Handler indexes (agentHandlerIndex = position + 1)
+HANDLERS = ('get', 'getnext', 'getbulk', 'set', 'sampler')
+H_GET, H_GETNEXT, H_GETBULK, H_SET, H_SAMPLER = range(len(HANDLERS))
+
+# Upper bounds of the latency buckets in microseconds; the last one is +Inf
+LATENCY_BOUNDS_US = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000, 0xFFFFFFFF)
+N_BUCKETS = len(LATENCY_BOUNDS_US)
+N_STATUSES = 19  # errStatus 0 (noError) .. 18 (inconsistentName)
+
+now_ns = time.perf_counter_ns
+
+
+class AgentMetrics:
+    def __init__(self):
+        n = len(HANDLERS)
+        self.requests = array('Q', bytes(8 * n))
+        self.errors = array('Q', bytes(8 * n))
+        self.latency_sum_us = array('Q', bytes(8 * n))
+        self.by_status = array('Q', bytes(8 * n * N_STATUSES))
+        self.histogram = array('Q', bytes(8 * n * N_BUCKETS))
+
+    def observe(self, handler, start_ns, err_status=0):
+        """Record one request of `handler` that started at start_ns (now_ns())"""
+        elapsed_us = (now_ns() - start_ns) // 1000
+        self.requests[handler] += 1
+        self.latency_sum_us[handler] += elapsed_us
+        self.histogram[handler * N_BUCKETS + bisect_left(LATENCY_BOUNDS_US, elapsed_us)] += 1
+        if err_status:
+            self.errors[handler] += 1
+            self.by_status[handler * N_STATUSES + err_status] += 1
+
+    # ---- MIB views (mounted under agentStats) ----
+    def handler_table(self):
+        """agentHandlerTable: INDEX { agentHandlerIndex }"""
+        return ColumnarTable([
+            (2, "DisplayString", HANDLERS),
+            (3, "Counter32", self.requests),
+            (4, "Counter32", self.errors),
+            (5, "Counter64", self.latency_sum_us),
+        ], [(h + 1,) for h in range(len(HANDLERS))])
+
+    def error_table(self):
+        """agentErrorTable: INDEX { agentHandlerIndex, agentErrorStatus } (errStatus 1..18)"""
+        per_handler = N_STATUSES - 1
+        by_status = self.by_status
+        return ColumnarTable([
+            (2, "Counter32",
+             lambda row: by_status[(row // per_handler) * N_STATUSES + row % per_handler + 1]),
+        ], [(h + 1, s) for h in range(len(HANDLERS)) for s in range(1, N_STATUSES)])
+
+    def latency_table(self):
+        """agentLatencyTable: INDEX { agentHandlerIndex, agentLatencyBucket }"""
+        return ColumnarTable([
+            (2, "Gauge32", lambda row: LATENCY_BOUNDS_US[row % N_BUCKETS]),
+            (3, "Counter32", self.histogram),
+        ], [(h + 1, b + 1) for h in range(len(HANDLERS)) for b in range(N_BUCKETS)])
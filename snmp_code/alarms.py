@@ -0,0 +1,308 @@
+"""
+RMON-style alarm table (MYAGENT-MIB alarmTable, 1.3.6.1.4.1.28308.6.1).
+
+Each row watches one integer variable of the agent's MIB (any OID: cpuUsage,
+cpuCoreUsage.N, hostMemUsage, agentHandlerErrors.N...):
+
+    alarmVariable          OID sampled every sampler tick
+    alarmSampleType        absoluteValue(1) | deltaValue(2)
+    alarmValue             last sampled value (read-only)
+    alarmStartupAlarm      risingAlarm(1) | fallingAlarm(2) | risingOrFallingAlarm(3)
+    alarmRisingThreshold   rising event when value >= threshold
+    alarmFallingThreshold  falling event when value <= threshold
+    alarmAction            none(1) | trap(2) | email(3) | trapAndEmail(4)
+    alarmStatus            RowStatus (createAndGo / createAndWait / active /
+                           notInService / destroy)
+
+Hysteresis as in RFC 2819: after a rising event no other rising event is
+generated until the value has fallen to the falling threshold, and vice
+versa. The first sample only fires the events allowed by alarmStartupAlarm.
+
+Rows are configuration: they live in the store under STATE_KEY, so they are
+persisted with mib_state.json and replicated to SO_REUSEPORT workers like
+any SET. A SET only carries the rows it changes, keyed (STATE_KEY, index),
+so concurrent SETs on different rows from different workers both apply. Runtime state (previous sample, last event, alarmValue) is kept in
+arrays indexed by row position and only exists where rules are evaluated.
+
+Evaluation is batched: active rules are grouped by variable, so each
+variable is read once per tick however many rules watch it, and the loop
+yields to the dispatcher every `batch` rules.
+"""
+
+import asyncio
+from array import array
+
+from pyasn1.type.univ import Integer, ObjectIdentifier
+
+from mib_tables import ColumnarTable
+
+STATE_KEY = "alarms"
+
+ABSOLUTE, DELTA = 1, 2
+STARTUP_RISING, STARTUP_FALLING, STARTUP_BOTH = 1, 2, 3
+ACTION_NONE, ACTION_TRAP, ACTION_EMAIL, ACTION_BOTH = 1, 2, 3, 4
+ACTIVE, NOT_IN_SERVICE, NOT_READY, CREATE_AND_GO, CREATE_AND_WAIT, DESTROY = range(1, 7)
+RISING, FALLING = 1, 2
+
+# column -> (row field, type name, allowed values or None)
+COLUMNS = {
+    2: ("variable", "ObjectIdentifier", None),
+    3: ("sampleType", "Integer32", (ABSOLUTE, DELTA)),
+    5: ("startup", "Integer32", (STARTUP_RISING, STARTUP_FALLING, STARTUP_BOTH)),
+    6: ("rising", "Integer32", None),
+    7: ("falling", "Integer32", None),
+    8: ("action", "Integer32", (ACTION_NONE, ACTION_TRAP, ACTION_EMAIL, ACTION_BOTH)),
+}
+COL_VALUE, COL_STATUS = 4, 9
+MAX_INDEX = 65535
+INT32 = (-2**31, 2**31 - 1)
+
+# errStatus
+NO_ACCESS, WRONG_TYPE, WRONG_VALUE, NO_CREATION = 6, 7, 10, 11
+INCONSISTENT_VALUE, RESOURCE_UNAVAILABLE, NOT_WRITABLE = 12, 13, 17
+
+
+def new_row(status):
+    return {"variable": None, "sampleType": ABSOLUTE, "startup": STARTUP_BOTH,
+            "rising": 0, "falling": 0, "action": ACTION_TRAP, "status": status}
+
+
+def oid_str(oid):
+    return '.'.join(map(str, oid))
+
+
+def oid_tuple(text):
+    return tuple(int(arc) for arc in text.split('.')) if text else None
+
+
+class AlarmTable:
+    def __init__(self, known_oid=None, max_rows=10000):
+        """known_oid: callable(oid tuple) -> bool, accepted alarmVariable values"""
+        self.known_oid = known_oid or (lambda oid: True)
+        self.max_rows = max_rows
+        self.rows = {}                 # index -> row dict (configuration)
+        self._indexes = []             # row position -> index
+        self._state = None
+        self.generation = 0
+        self.evaluations = 0
+        self.events = 0
+        self._compile({})
+
+    # ---- configuration ----
+    def load(self, state):
+        """(Re)build from the persisted {str(index): row} mapping"""
+        self._compile({int(index): dict(row) for index, row in (state or {}).items()})
+
+    def sync(self, values):
+        """JsonStore listener: recompile when the alarm rows change"""
+        if STATE_KEY in values:
+            self.load(values[STATE_KEY])
+        # Per-row changes: {(STATE_KEY, str(index)): row or None}
+        changes = [(int(key[1]), row) for key, row in values.items()
+                   if isinstance(key, tuple) and key[0] == STATE_KEY]
+        if changes:
+            rows = dict(self.rows)
+            for index, row in changes:
+                if row is None:
+                    rows.pop(index, None)
+                else:
+                    rows[index] = dict(row)
+            self._compile(rows)
+
+    def _compile(self, rows):
+        old = {index: pos for pos, index in enumerate(self._indexes)}
+        old_rows, old_state = self.rows, self._state
+        self.rows = rows
+        self._indexes = sorted(rows)
+        n = len(self._indexes)
+        self._rows = [rows[index] for index in self._indexes]
+        self._variables = [oid_tuple(row["variable"]) for row in self._rows]
+        # Runtime state per row position; kept for rows whose variable/type did not change
+        self.values = array('q', bytes(8 * n))
+        self._prev = array('q', bytes(8 * n))
+        self._samples = array('b', bytes(n))     # 0 = none yet, 1 = first done (delta: prev set)
+        self._last = array('b', bytes(n))        # last event: 0, RISING, FALLING
+        if old_state is not None:
+            values, prev, samples, last = old_state
+            for pos, index in enumerate(self._indexes):
+                was = old.get(index)
+                if was is None:
+                    continue
+                before, row = old_rows[index], rows[index]
+                if (before["variable"], before["sampleType"]) == (row["variable"], row["sampleType"]):
+                    self.values[pos] = values[was]
+                    self._prev[pos] = prev[was]
+                    self._samples[pos] = samples[was]
+                    self._last[pos] = last[was]
+        self._state = (self.values, self._prev, self._samples, self._last)
+        # Active rules grouped by variable: each variable is read once per tick
+        groups = {}
+        for pos, row in enumerate(self._rows):
+            if row["status"] == ACTIVE and self._variables[pos]:
+                groups.setdefault(self._variables[pos], array('I')).append(pos)
+        self._groups = groups
+        self.active = sum(len(positions) for positions in groups.values())
+        rows_ = self._rows
+        self._view = ColumnarTable([
+            (2, "ObjectIdentifier", self._variables),
+            (3, "Integer32", lambda pos: rows_[pos]["sampleType"]),
+            (COL_VALUE, "Integer32", self.values),
+            (5, "Integer32", lambda pos: rows_[pos]["startup"]),
+            (6, "Integer32", lambda pos: rows_[pos]["rising"]),
+            (7, "Integer32", lambda pos: rows_[pos]["falling"]),
+            (8, "Integer32", lambda pos: rows_[pos]["action"]),
+            (COL_STATUS, "Integer32", lambda pos: rows_[pos]["status"]),
+        ], [(index,) for index in self._indexes])
+        self.generation += 1
+
+    # ---- registry provider ----
+    def get(self, suffix):
+        return self._view.get(suffix)
+
+    def next(self, suffix):
+        return self._view.next(suffix)
+
+    def prepare_set(self, writes):
+        """
+        Validate every write of one SET PDU against this table.
+        writes: [(varbind index, suffix, snmp value)]
+        -> (errStatus, errIndex, {(STATE_KEY, str(index)): row or None})
+           errStatus 0 = accepted; only the rows this SET changes, None = destroyed
+        """
+        changed = {}                   # index -> working copy of a touched row, None = destroyed
+
+        def row_of(index):
+            return changed[index] if index in changed else self.rows.get(index)
+
+        def writable(index):
+            if index not in changed:
+                changed[index] = dict(self.rows[index])
+            return changed[index]
+
+        parsed = []
+        for idx, suffix, val in writes:
+            if len(suffix) != 3 or suffix[0] != 1 or not 1 <= suffix[2] <= MAX_INDEX:
+                return NO_CREATION, idx, None
+            col, index = suffix[1], suffix[2]
+            if col == COL_VALUE:
+                return NOT_WRITABLE, idx, None
+            if col != COL_STATUS and col not in COLUMNS:
+                return NO_ACCESS if col == 1 else NO_CREATION, idx, None
+            parsed.append((idx, col, index, val))
+
+        # RowStatus first, so columns set in the same PDU apply to the new row
+        touched = {}
+        for idx, col, index, val in parsed:
+            if col != COL_STATUS:
+                continue
+            if not isinstance(val, Integer):
+                return WRONG_TYPE, idx, None
+            status = int(val)
+            exists = row_of(index) is not None
+            if status in (CREATE_AND_GO, CREATE_AND_WAIT):
+                if exists:
+                    return INCONSISTENT_VALUE, idx, None
+                size = len(self.rows) + sum(
+                    (row is not None) - (i in self.rows) for i, row in changed.items())
+                if size >= self.max_rows:
+                    return RESOURCE_UNAVAILABLE, idx, None
+                changed[index] = new_row(ACTIVE if status == CREATE_AND_GO else NOT_IN_SERVICE)
+            elif status == DESTROY:
+                changed[index] = None
+            elif status in (ACTIVE, NOT_IN_SERVICE):
+                if not exists:
+                    return INCONSISTENT_VALUE, idx, None
+                writable(index)["status"] = status
+            else:
+                return WRONG_VALUE, idx, None
+            touched[index] = idx
+
+        for idx, col, index, val in parsed:
+            if col == COL_STATUS:
+                continue
+            if row_of(index) is None:
+                return NO_CREATION, idx, None
+            row = writable(index)
+            field, type_name, allowed = COLUMNS[col]
+            if type_name == "ObjectIdentifier":
+                if not isinstance(val, ObjectIdentifier):
+                    return WRONG_TYPE, idx, None
+                oid = tuple(val)
+                if not self.known_oid(oid):
+                    return WRONG_VALUE, idx, None
+                row[field] = oid_str(oid)
+            else:
+                if not isinstance(val, Integer):
+                    return WRONG_TYPE, idx, None
+                value = int(val)
+                if (allowed and value not in allowed) or not INT32[0] <= value <= INT32[1]:
+                    return WRONG_VALUE, idx, None
+                row[field] = value
+            touched.setdefault(index, idx)
+
+        for index, idx in touched.items():
+            row = row_of(index)
+            if row is None:
+                continue
+            if row["status"] == ACTIVE and not row["variable"]:
+                return INCONSISTENT_VALUE, idx, None
+            if row["rising"] < row["falling"]:
+                return INCONSISTENT_VALUE, idx, None
+        return 0, 0, {(STATE_KEY, str(index)): row for index, row in sorted(changed.items())
+                      if row != self.rows.get(index)}
+
+    # ---- evaluation ----
+    async def evaluate(self, read, batch=1000):
+        """
+        One sampler tick over every active rule.
+        read: callable(oid tuple) -> int or None (None: skip this tick)
+        -> [(index, RISING|FALLING, variable, sample type, value, threshold, action)]
+        """
+        events = []
+        generation = self.generation
+        rows, variables = self._rows, self._variables
+        values, prev, samples, last = self._state
+        done = 0
+        for variable, positions in self._groups.items():
+            raw = read(variable)
+            if raw is not None:
+                for pos in positions:
+                    row = rows[pos]
+                    if row["sampleType"] == DELTA:
+                        if not samples[pos]:
+                            prev[pos] = raw
+                            samples[pos] = 1
+                            continue
+                        value = raw - prev[pos]
+                        prev[pos] = raw
+                        first = samples[pos] == 1
+                        samples[pos] = 2
+                    else:
+                        value = raw
+                        first = not samples[pos]
+                        samples[pos] = 2
+                    values[pos] = max(INT32[0], min(INT32[1], value))
+                    rising, falling = row["rising"], row["falling"]
+                    if value >= rising:
+                        if last[pos] != RISING and (not first or row["startup"] != STARTUP_FALLING):
+                            events.append((self._indexes[pos], RISING, variables[pos],
+                                           row["sampleType"], value, rising, row["action"]))
+                        last[pos] = RISING   # a suppressed startup event still counts
+                    elif value <= falling:
+                        if last[pos] != FALLING and (not first or row["startup"] != STARTUP_RISING):
+                            events.append((self._indexes[pos], FALLING, variables[pos],
+                                           row["sampleType"], value, falling, row["action"]))
+                        last[pos] = FALLING
+            done += len(positions)
+            if done >= batch:
+                done = 0
+                await asyncio.sleep(0)       # let the dispatcher answer requests
+                if self.generation != generation:
+                    break                    # rows changed meanwhile: positions are stale
+        self.evaluations += 1
+        self.events += len(events)
+        return events
+
+    def metrics(self):
+        return {"rows": len(self.rows), "active": self.active, "variables": len(self._groups),
+                "evaluations": self.evaluations, "events": self.events}
@@ -0,0 +1,88 @@
+"""
+Benchmark: alarmTable evaluation (alarms.py) with many rules per tick.
+
+Builds `rules` active rows spread over `variables` OIDs (mixed absolute and
+delta rows, thresholds around the sampled values so events do fire) and
+times AlarmTable.evaluate() for several batch sizes:
+
+- tick time: one full evaluation of every rule
+- max stall: longest stretch without yielding to the event loop, i.e. the
+  worst extra latency a request waiting on the dispatcher would see
+
+Usage:
+    python bench_alarms.py [rules] [variables] [ticks]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from alarms import ACTIVE, DELTA, STATE_KEY, AlarmTable
+
+
+def build_rows(rules, variables):
+    rows = {}
+    for i in range(rules):
+        delta = i % 4 == 0
+        rows[str(i + 1)] = {
+            "variable": f"1.3.6.1.4.1.28308.9.{i % variables}.0",
+            "sampleType": DELTA if delta else 1,
+            "startup": 3,
+            "rising": 10 if delta else 60 + i % 30,
+            "falling": -10 if delta else 40 - i % 30,
+            "action": 1,
+            "status": ACTIVE,
+        }
+    return rows
+
+
+async def stall_monitor(stalls, stop):
+    """Measure how long the loop goes without running this task"""
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0)
+        now = time.perf_counter()
+        stalls.append(now - last)
+        last = now
+
+
+async def run(table, values, ticks, batch):
+    def read(oid):
+        return values[oid[-2]]
+
+    stalls, stop = [], asyncio.Event()
+    monitor = asyncio.create_task(stall_monitor(stalls, stop))
+    events = 0
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        for v in range(len(values)):
+            values[v] = random.randint(0, 100)
+        events += len(await table.evaluate(read, batch))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await monitor
+    return elapsed / ticks, max(stalls), events
+
+
+def main():
+    rules = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    variables = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    ticks = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    table = AlarmTable(max_rows=rules)
+    t0 = time.perf_counter()
+    table.sync({STATE_KEY: build_rows(rules, variables)})
+    print(f"{rules} rules over {variables} variables, compile {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    values = [0] * variables
+    print(f"{'batch':>8} {'tick':>10} {'per rule':>10} {'max stall':>10} {'events':>8}")
+    for batch in (rules, 1000, 100):
+        random.seed(1)
+        tick, stall, events = asyncio.run(run(table, values, ticks, batch))
+        print(f"{batch:>8} {tick * 1000:>8.2f}ms {tick / rules * 1e9:>8.0f}ns "
+              f"{stall * 1000:>8.2f}ms {events:>8}")
+
+
+if __name__ == "__main__":
+    main()
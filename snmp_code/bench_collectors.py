@@ -0,0 +1,103 @@
+"""
+Benchmark: dispatcher-loop blocking time of the sampler collectors.
+
+Runs `n` collectors for a few seconds, each one a blocking read like the
+real ones (per-core psutil sample, process scan, a statvfs that stalls for
+BLOCKING_MS) plus a publish that writes a value into a dict, in two modes:
+
+- inline:    collect() + publish() called on the loop (the old cpu_sampler)
+- scheduler: CollectorScheduler, collect() in the thread pool
+
+and reports the loop stalls seen by a task that only yields: the extra
+latency a request waiting on the dispatcher would get. With the scheduler
+what is left is the GIL handover while a pool thread runs Python code
+(sys.getswitchinterval(), 5 ms); CPU-heavy collectors belong in the process
+pool (process=True).
+
+Usage:
+    python bench_collectors.py [duration_s] [n_collectors ...]   # default: 3 s, 1 10 50
+"""
+
+import asyncio
+import sys
+import time
+
+import psutil
+
+from collectors import CollectorScheduler
+
+BLOCKING_MS = 20
+INTERVAL = 0.5
+
+
+def blocking_read():
+    time.sleep(BLOCKING_MS / 1000)       # stands for statvfs on a slow mount
+    return BLOCKING_MS
+
+
+READS = [
+    lambda: psutil.cpu_times_percent(interval=None, percpu=True),
+    lambda: len(psutil.pids()),
+    blocking_read,
+]
+
+
+async def stall_monitor(stalls, stop):
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0)
+        now = time.perf_counter()
+        stalls.append(now - last)
+        last = now
+
+
+async def inline(collectors, duration):
+    async def run(collect, publish):
+        while True:
+            await asyncio.sleep(INTERVAL)
+            publish(collect())
+    tasks = [asyncio.create_task(run(*c)) for c in collectors]
+    await asyncio.sleep(duration)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def scheduled(collectors, duration):
+    scheduler = CollectorScheduler(threads=8)
+    for i, (collect, publish) in enumerate(collectors):
+        scheduler.add(f"c{i}", collect, publish, INTERVAL, timeout=1.0)
+    task = asyncio.create_task(scheduler.run())
+    await asyncio.sleep(duration)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    scheduler.close()
+    return scheduler.metrics()
+
+
+async def measure(mode, n, duration):
+    store = {}
+    collectors = [(READS[i % len(READS)], lambda value, key=i: store.__setitem__(key, value))
+                  for i in range(n)]
+    stalls, stop = [], asyncio.Event()
+    monitor = asyncio.create_task(stall_monitor(stalls, stop))
+    await mode(collectors, duration)
+    stop.set()
+    await monitor
+    stalls.sort()
+    return stalls[-1], stalls[int(len(stalls) * 0.99)], len(store)
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    sizes = [int(a) for a in sys.argv[2:]] or [1, 10, 50]
+    psutil.cpu_times_percent(interval=None, percpu=True)   # warm-up
+    print(f"{'collectors':>10} {'mode':>10} {'max stall':>10} {'p99 stall':>10} {'published':>10}")
+    for n in sizes:
+        for name, mode in (("inline", inline), ("scheduler", scheduled)):
+            worst, p99, published = asyncio.run(measure(mode, n, duration))
+            print(f"{n:>10} {name:>10} {worst * 1000:>8.2f}ms {p99 * 1000:>8.3f}ms {published:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: journaled state backend vs full JSON rewrite.
+
+Measures, for N stored values (default 100k):
+- cost per change with the journal (append) vs rewriting the whole JSON
+- compaction (binary snapshot) time
+- startup: snapshot load + journal tail replay vs json.load
+- alarm row SET: journal record for one (alarms, index) row vs the whole
+  alarm table, with 10k rows
+
+Usage:
+    python bench_journal.py [n_values] [tail_records]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+from alarms import ACTIVE, STATE_KEY, new_row
+from journal import JournalWriter
+from persistence import write_json_atomic
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    tail = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    state = {f"obj{i}": (i if i % 2 else f"value-{i}") for i in range(n)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = os.path.join(tmp, 'state.json')
+        snap = os.path.join(tmp, 'state.snap')
+        log = os.path.join(tmp, 'state.journal')
+
+        t0 = time.perf_counter()
+        write_json_atomic(json_file, state)
+        json_write_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with open(json_file) as f:
+            json.load(f)
+        json_load_s = time.perf_counter() - t0
+
+        writer = JournalWriter(snap, log, policy='shutdown')
+        data = writer.load()
+        data.update(state)
+        writer.mark_dirty(data)
+        t0 = time.perf_counter()
+        writer.close()
+        compact_s = time.perf_counter() - t0
+
+        writer = JournalWriter(snap, log, policy='shutdown')
+        data = writer.load()
+        t0 = time.perf_counter()
+        for i in range(tail):
+            key = f"obj{i % n}"
+            data[key] = i
+            writer.mark_dirty(data, key)
+        append_s = time.perf_counter() - t0
+        os.close(writer._fd)  # simulate a stop without final compaction
+
+        t0 = time.perf_counter()
+        writer = JournalWriter(snap, log, policy='shutdown')
+        loaded = writer.load()
+        startup_s = time.perf_counter() - t0
+        assert len(loaded) == n and loaded[f"obj{(tail - 1) % n}"] == tail - 1
+        writer.close()
+
+        rows = {str(i): new_row(ACTIVE) for i in range(1, 10_001)}
+        writer = JournalWriter(snap, log, policy='shutdown')
+        data = writer.load()
+        data[STATE_KEY] = rows
+        writer.mark_dirty(data, STATE_KEY)
+        table_bytes = writer._log_bytes
+        data[STATE_KEY] = dict(rows, **{"5000": dict(rows["5000"], rising=90)})
+        writer.mark_dirty(data, (STATE_KEY, "5000"))
+        row_bytes = writer._log_bytes - table_bytes
+        del data[STATE_KEY]["17"]
+        writer.mark_dirty(data, (STATE_KEY, "17"))
+        os.close(writer._fd)
+        writer = JournalWriter(snap, log, policy='shutdown')
+        replayed = writer.load()[STATE_KEY]
+        assert replayed["5000"]["rising"] == 90 and "17" not in replayed and len(replayed) == 9999
+        writer.close()
+
+    print(f"Values stored:              {n}")
+    print(f"JSON full rewrite (per SET): {json_write_s * 1000:.1f} ms")
+    print(f"Journal append (per SET):    {append_s / tail * 1e6:.1f} us")
+    print(f"Snapshot compaction:         {compact_s * 1000:.1f} ms")
+    print(f"Startup json.load:           {json_load_s * 1000:.1f} ms")
+    print(f"Startup snapshot + {tail} tail: {startup_s * 1000:.1f} ms")
+    print(f"Alarm row SET record:        {row_bytes} bytes (whole 10k-row table: {table_bytes} bytes)")
+
+
+if __name__ == "__main__":
+    main()
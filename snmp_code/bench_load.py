@@ -0,0 +1,358 @@
+"""
+Load generator / throughput benchmark for mini_agent_v4.
+
+Starts the agent on a high localhost port (in a scratch directory, so the real
+mib_state.json is never touched) and drives it with many simulated managers,
+each one a separate UDP socket doing closed-loop requests: send, wait for the
+response (or the timeout), send the next one.
+
+Workloads:
+    get    - GET cpuUsage.0 / cpuThreshold.0 / manager.0 / managerEmail.0
+    walk   - GETNEXT walk of the enterprise subtree, restarted at the end
+    walk-v1 - the same walk with SNMPv1 requests (Counter64 columns must be
+             skipped; the walk ends with noSuchName)
+    set    - SET manager.0 (community private)
+    mixed  - 80% get, 15% walk step, 5% set
+
+Reports requests/s, p50/p99 latency, loss (timed-out requests) and error
+responses, and writes the run to bench_results/load-<timestamp>.json so runs
+can be compared (--compare older.json).
+
+--workers 1,2,4,8 repeats every workload against the agent started with
+MINI_AGENT_WORKERS=n (SO_REUSEPORT worker mode) and prints the speedup of
+each worker count over the first one.
+
+Usage:
+    python bench_load.py [--workload get|walk|walk-v1|set|mixed|all] [--managers 50]
+                         [--duration 10] [--timeout 1.0] [--port 17161]
+                         [--workers 1,2,4,8]
+    python bench_load.py --target 127.0.0.1:161 ...   # agent already running
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from ber_fastpath import (BerError, TAG_END_OF_MIB_VIEW, TAG_GET, TAG_GETNEXT, TAG_SET,
+                          build_request, encode_value, parse_response)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AGENT = os.path.join(HERE, 'mini_agent_v4.py')
+RESULTS_DIR = os.path.join(HERE, 'bench_results')
+
+ENTERPRISE = (1, 3, 6, 1, 4, 1, 28308)
+MANAGER = ENTERPRISE + (1, 1, 0)
+MANAGER_EMAIL = ENTERPRISE + (1, 2, 0)
+CPU_USAGE = ENTERPRISE + (1, 3, 0)
+CPU_THRESHOLD = ENTERPRISE + (1, 4, 0)
+GET_OIDS = (CPU_USAGE, CPU_THRESHOLD, MANAGER, MANAGER_EMAIL)
+WORKLOADS = ('get', 'walk', 'walk-v1', 'set', 'mixed')
+NO_SUCH_NAME = 2      # SNMPv1 end of the MIB view
+
+# Threshold 100 keeps the sampler from sending traps/emails while we load the CPU
+BENCH_STATE = {
+    "manager": "bench",
+    "managerEmail": "bench@example.com",
+    "cpuUsage": 0,
+    "cpuThreshold": 100,
+}
+
+
+class Manager(asyncio.DatagramProtocol):
+    """One simulated manager: a UDP socket with at most one request in flight"""
+
+    def __init__(self, ident, workload, timeout, stats):
+        self.ident = ident
+        self.workload = workload
+        self.timeout = timeout
+        self.stats = stats
+        self.rng = random.Random(ident)
+        self.transport = None
+        self.request_id = ident << 20
+        self.pending = None       # (request_id, future)
+        self.walk_oid = ENTERPRISE
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            request_id, error_status, _, varbinds = parse_response(data)
+        except (BerError, IndexError):
+            self.stats['malformed'] += 1
+            return
+        if self.pending is not None and self.pending[0] == request_id and not self.pending[1].done():
+            self.pending[1].set_result((error_status, varbinds))
+        else:
+            self.stats['late'] += 1    # answer to a request we already gave up on
+
+    def _next_request(self):
+        kind = self.workload
+        if kind == 'mixed':
+            r = self.rng.random()
+            kind = 'get' if r < 0.80 else 'walk' if r < 0.95 else 'set'
+        self.request_id = (self.request_id + 1) & 0x7FFFFFFF
+        if kind == 'get':
+            oid = GET_OIDS[self.request_id % len(GET_OIDS)]
+            return kind, build_request(1, 'public', TAG_GET, self.request_id, [(oid, None)])
+        if kind in ('walk', 'walk-v1'):
+            version = 0 if kind == 'walk-v1' else 1
+            return kind, build_request(version, 'public', TAG_GETNEXT, self.request_id,
+                                       [(self.walk_oid, None)])
+        value = encode_value("DisplayString", f"bench-{self.ident}-{self.request_id & 0xFF}")
+        return kind, build_request(1, 'private', TAG_SET, self.request_id, [(MANAGER, value)])
+
+    async def run(self, deadline):
+        loop = asyncio.get_running_loop()
+        stats = self.stats
+        while loop.time() < deadline:
+            kind, msg = self._next_request()
+            fut = loop.create_future()
+            self.pending = (self.request_id, fut)
+            t0 = time.perf_counter_ns()
+            self.transport.sendto(msg)
+            stats['sent'] += 1
+            try:
+                error_status, varbinds = await asyncio.wait_for(fut, self.timeout)
+            except asyncio.TimeoutError:
+                stats['lost'] += 1
+                continue
+            stats['latencies_ns'].append(time.perf_counter_ns() - t0)
+            stats['received'] += 1
+            end_v1 = kind == 'walk-v1' and error_status == NO_SUCH_NAME
+            if error_status and not end_v1:
+                stats['errors'] += 1
+            if kind in ('walk', 'walk-v1'):
+                oid, tag, _ = varbinds[0]
+                if end_v1 or tag == TAG_END_OF_MIB_VIEW or oid[:len(ENTERPRISE)] != ENTERPRISE:
+                    oid = ENTERPRISE
+                    stats['walks'] += 1
+                self.walk_oid = oid
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def run_workload(target, workload, managers, duration, timeout):
+    loop = asyncio.get_running_loop()
+    stats = {'sent': 0, 'received': 0, 'lost': 0, 'errors': 0, 'late': 0,
+             'malformed': 0, 'walks': 0, 'latencies_ns': []}
+    endpoints = []
+    for i in range(managers):
+        transport, proto = await loop.create_datagram_endpoint(
+            lambda i=i: Manager(i + 1, workload, timeout, stats), remote_addr=target)
+        endpoints.append((transport, proto))
+    t0 = loop.time()
+    await asyncio.gather(*(proto.run(t0 + duration) for _, proto in endpoints))
+    elapsed = loop.time() - t0
+    for transport, _ in endpoints:
+        transport.close()
+
+    lat = sorted(stats.pop('latencies_ns'))
+    stats.update({
+        'workload': workload,
+        'managers': managers,
+        'duration_s': round(elapsed, 3),
+        'requests_per_s': round(stats['received'] / elapsed, 1),
+        'loss_pct': round(100.0 * stats['lost'] / stats['sent'], 3) if stats['sent'] else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(lat, 0.50) / 1e6, 3),
+            'p99': round(percentile(lat, 0.99) / 1e6, 3),
+            'mean': round(sum(lat) / len(lat) / 1e6, 3) if lat else 0.0,
+            'max': round(lat[-1] / 1e6, 3) if lat else 0.0,
+        },
+    })
+    return stats
+
+
+async def wait_ready(target, timeout=20.0):
+    """Poll the agent with GETs until it answers"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    stats = {'sent': 0, 'received': 0, 'lost': 0, 'errors': 0, 'late': 0,
+             'malformed': 0, 'walks': 0, 'latencies_ns': []}
+    transport, proto = await loop.create_datagram_endpoint(
+        lambda: Manager(0, 'get', 0.25, stats), remote_addr=target)
+    try:
+        while loop.time() < deadline:
+            await proto.run(loop.time() + 0.01)
+            if stats['received']:
+                return True
+            await asyncio.sleep(0.1)
+        return False
+    finally:
+        transport.close()
+
+
+def start_agent(port, extra_env=None):
+    """Run mini_agent_v4 on 127.0.0.1:port from a scratch directory"""
+    workdir = tempfile.mkdtemp(prefix='mini-agent-bench-')
+    with open(os.path.join(workdir, 'mib_state.json'), 'w') as f:
+        json.dump(BENCH_STATE, f)
+    env = dict(os.environ, MINI_AGENT_HOST='127.0.0.1', MINI_AGENT_PORT=str(port),
+               MINI_AGENT_LOG=os.environ.get('MINI_AGENT_LOG', 'agent=WARNING'))
+    env.update(extra_env or {})
+    logf = open(os.path.join(workdir, 'agent.log'), 'w')
+    # Every simulated manager sends from 127.0.0.1: no admission limits, no shedding
+    proc = subprocess.Popen([sys.executable, AGENT, '--source-rate', '0', '--community-rate', '0',
+                             '--shed-above', '0'], cwd=workdir, env=env,
+                            stdout=logf, stderr=subprocess.STDOUT)
+    return proc, workdir, logf
+
+
+def wait_workers(workdir, workers, timeout=30.0):
+    """Wait until the hub logs that every worker process is connected"""
+    if workers <= 1:
+        return True
+    marker = f"All {workers - 1} workers ready"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with open(os.path.join(workdir, 'agent.log'), errors='replace') as f:
+            if marker in f.read():
+                return True
+        time.sleep(0.1)
+    return False
+
+
+def stop_agent(proc, workdir, logf):
+    proc.terminate()
+    try:
+        proc.wait(10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    logf.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def print_result(r):
+    lat = r['latency_ms']
+    workers = f", {r['workers']} workers" if r.get('workers', 1) > 1 else ""
+    print(f"{r['workload']:>6}: {r['requests_per_s']:>10,.0f} req/s  "
+          f"p50 {lat['p50']:.3f} ms  p99 {lat['p99']:.3f} ms  "
+          f"loss {r['loss_pct']:.2f}%  errors {r['errors']}  ({r['managers']} managers{workers})")
+
+
+def print_scaling(results):
+    """req/s of every worker count relative to the first one, per workload"""
+    counts = sorted({r['workers'] for r in results})
+    if len(counts) < 2:
+        return
+    by_key = {(r['workload'], r['workers']): r['requests_per_s'] for r in results}
+    print("\nscaling (req/s, speedup vs %d worker%s):" % (counts[0], "s" if counts[0] > 1 else ""))
+    print(f"{'':>6}  " + "  ".join(f"{n:>14}" for n in counts))
+    for workload in dict.fromkeys(r['workload'] for r in results):
+        base = by_key.get((workload, counts[0])) or 0
+        cells = []
+        for n in counts:
+            rps = by_key.get((workload, n), 0)
+            cells.append(f"{rps:>7,.0f} x{rps / base:4.2f}" if base else f"{rps:>14,.0f}")
+        print(f"{workload:>6}  " + "  ".join(cells))
+
+
+def compare(previous_file, results):
+    with open(previous_file) as f:
+        previous = {(r['workload'], r.get('workers', 1)): r for r in json.load(f)['results']}
+    print(f"\nvs {previous_file}:")
+    for r in results:
+        old = previous.get((r['workload'], r['workers']))
+        if old is None or not old['requests_per_s']:
+            continue
+        print(f"{r['workload']:>6} x{r['workers']}: req/s x{r['requests_per_s'] / old['requests_per_s']:.2f}  "
+              f"p99 {old['latency_ms']['p99']:.3f} -> {r['latency_ms']['p99']:.3f} ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workload', choices=WORKLOADS + ('all',), default='all')
+    parser.add_argument('--managers', type=int, default=50, help='concurrent simulated managers')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per workload')
+    parser.add_argument('--timeout', type=float, default=1.0, help='seconds before a request counts as lost')
+    parser.add_argument('--port', type=int, default=17161, help='port for the spawned agent')
+    parser.add_argument('--target', help='host:port of an already running agent (no spawn)')
+    parser.add_argument('--workers', default='1',
+                        help='comma separated agent process counts to measure, e.g. 1,2,4,8')
+    parser.add_argument('--label', default='', help='free text stored with the results')
+    parser.add_argument('--output', default=RESULTS_DIR, help='directory for the JSON results')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workloads = WORKLOADS if args.workload == 'all' else (args.workload,)
+    worker_counts = [int(n) for n in args.workers.split(',')]
+    if args.target:
+        host, _, port = args.target.rpartition(':')
+        target = (host or '127.0.0.1', int(port))
+        worker_counts = worker_counts[:1]
+    else:
+        target = ('127.0.0.1', args.port)
+
+    results = []
+    for workers in worker_counts:
+        agent = None
+        if not args.target:
+            log_spec = os.environ.get('MINI_AGENT_LOG', 'agent=WARNING')
+            agent = start_agent(args.port, {'MINI_AGENT_WORKERS': str(workers),
+                                            'MINI_AGENT_LOG': log_spec + ',agent=INFO'})
+        try:
+            if agent is not None and not wait_workers(agent[1], workers):
+                print(f"❌ Agent did not start {workers} processes")
+                sys.exit(1)
+            if not asyncio.run(wait_ready(target)):
+                print(f"❌ Agent not answering on {target[0]}:{target[1]}")
+                sys.exit(1)
+            for workload in workloads:
+                result = asyncio.run(run_workload(target, workload, args.managers,
+                                                  args.duration, args.timeout))
+                result['workers'] = workers
+                print_result(result)
+                results.append(result)
+        finally:
+            if agent is not None:
+                stop_agent(*agent)
+    print_scaling(results)
+
+    run = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'label': args.label,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'target': f"{target[0]}:{target[1]}",
+        'config': {'managers': args.managers, 'duration_s': args.duration,
+                   'timeout_s': args.timeout, 'workers': worker_counts},
+        'results': results,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    out = os.path.join(args.output, f"load-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"Results saved to {out}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: request handler throughput with debug logging off vs on.
+
+Builds the agent with create_agent() on a high localhost port, in a scratch
+directory so mib_state.json is not touched (nothing is served; the handlers
+are called directly with a pre-built PDU and send_pdu stubbed), then
+times JsonGet / JsonGetNext / JsonSet with the handler loggers at INFO and at
+DEBUG. Log output goes to os.devnull, so the numbers show formatting cost,
+not terminal speed.
+
+Usage:
+    python bench_logging.py [iterations]
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('MINI_AGENT_PORT', '17161')
+
+from pysnmp.proto import rfc1902
+from pysnmp.proto.api import v2c
+
+import mini_agent_v4 as agent
+from agent_logging import setup_logging
+
+HANDLER_LOGGERS = ('agent.get', 'agent.getnext', 'agent.set', 'agent.store')
+
+
+def make_pdu(pdu_cls, varBinds):
+    pdu = pdu_cls()
+    v2c.apiPDU.set_defaults(pdu)
+    v2c.apiPDU.set_varbinds(pdu, varBinds)
+    return pdu
+
+
+def make_handler(cls):
+    # Bypass __init__: re-registering in the engine's context would fail
+    handler = cls.__new__(cls)
+    handler.send_pdu = lambda *args: None
+    return handler
+
+
+def run(handler, pdu, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        handler.handle_management_operation(agent.snmpEngine, None, '', pdu)
+    return n / (time.perf_counter() - t0)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    os.chdir(tempfile.mkdtemp(prefix='bench-logging-'))
+    agent.create_agent()
+    # The four scalars (manager, managerEmail, cpuUsage, cpuThreshold), not the mounted tables
+    oids = [agent.ObjectIdentifier(oid) for oid in agent.REGISTRY if agent.REGISTRY.name(oid)]
+    cases = [
+        ("GET x1", agent.JsonGet, make_pdu(v2c.GetRequestPDU, [(oids[0], v2c.null)])),
+        ("GET x4", agent.JsonGet, make_pdu(v2c.GetRequestPDU, [(o, v2c.null) for o in oids])),
+        ("GETNEXT x1", agent.JsonGetNext, make_pdu(v2c.GetNextRequestPDU, [(oids[0], v2c.null)])),
+        # Denied SET (no request context): exercises validation + logging, not the disk
+        ("SET x1", agent.JsonSet, make_pdu(v2c.SetRequestPDU,
+                                           [(oids[-1], rfc1902.Integer32(80))])),
+    ]
+    devnull = open(os.devnull, 'w')
+    results = {}
+    for level in ('INFO', 'DEBUG'):
+        setup_logging({'agent': 'INFO', **{name: level for name in HANDLER_LOGGERS}},
+                      stream=devnull)
+        for name, cls, pdu in cases:
+            results[(name, level)] = run(make_handler(cls), pdu, n)
+    setup_logging({'agent': 'INFO'})
+    logging.getLogger('agent').info("Benchmark terminado")
+    agent.snmpEngine.transport_dispatcher.close_dispatcher()
+
+    print(f"{'handler':<12}{'debug off':>14}{'debug on':>14}{'ratio':>8}")
+    for name, _, _ in cases:
+        off, on = results[(name, 'INFO')], results[(name, 'DEBUG')]
+        print(f"{name:<12}{off:>12,.0f}/s{on:>12,.0f}/s{off / on:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark: agent startup cost of the OID definitions for large MIBs.
+
+Generates a synthetic SMIv2 module with `n` OBJECT-TYPEs (half scalars in
+groups of 100, half table columns) and times each way the agent can get
+its MibRegistry at startup:
+
+- compile:  parse MYAGENT-MIB-style ASN.1 and write the binary cache
+- cache:    load the cache (source size/mtime unchanged, no hashing)
+- hashed:   load the cache after a touch (sha256 of the source, no parse)
+- json:     the old path, myagent_oids.json layout + MibRegistry build
+
+Usage:
+    python bench_mib.py [n_objects ...]       # default: 10000 50000
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+from mib_compiler import load_mib
+from mib_registry import MibRegistry
+
+HEADER = """BENCH-MIB DEFINITIONS ::= BEGIN
+IMPORTS
+    MODULE-IDENTITY, OBJECT-TYPE, Integer32, Counter32, enterprises
+        FROM SNMPv2-SMI
+    DisplayString
+        FROM SNMPv2-TC;
+
+benchMib MODULE-IDENTITY
+    LAST-UPDATED "202511061200Z"
+    ORGANIZATION "bench"
+    CONTACT-INFO "bench"
+    DESCRIPTION  "Synthetic MIB for bench_mib.py"
+    ::= { enterprises 28308 9 }
+
+"""
+
+SCALAR = """obj{g}x{i} OBJECT-TYPE
+    SYNTAX      {syntax}
+    MAX-ACCESS  read-write
+    STATUS      current
+    DESCRIPTION "Scalar {i} of group {g}."
+    ::= {{ group{g} {i} }}
+
+"""
+
+TABLE = """tbl{t}Table OBJECT-TYPE
+    SYNTAX      SEQUENCE OF Tbl{t}Entry
+    MAX-ACCESS  not-accessible
+    STATUS      current
+    DESCRIPTION "Table {t}."
+    ::= {{ tables {t} }}
+
+tbl{t}Entry OBJECT-TYPE
+    SYNTAX      Tbl{t}Entry
+    MAX-ACCESS  not-accessible
+    STATUS      current
+    DESCRIPTION "Row of table {t}."
+    INDEX       {{ tbl{t}c1 }}
+    ::= {{ tbl{t}Table 1 }}
+
+Tbl{t}Entry ::= SEQUENCE {{ {members} }}
+
+"""
+
+COLUMN = """tbl{t}c{c} OBJECT-TYPE
+    SYNTAX      Counter32
+    MAX-ACCESS  read-only
+    STATUS      current
+    DESCRIPTION "Column {c} of table {t}."
+    ::= {{ tbl{t}Entry {c} }}
+
+"""
+
+
+def generate(n):
+    parts = [HEADER, "tables OBJECT IDENTIFIER ::= { benchMib 2 }\n\n"]
+    scalars, columns = n // 2, n - n // 2
+    for g in range(scalars // 100 + 1):
+        count = min(100, scalars - g * 100)
+        if count <= 0:
+            break
+        parts.append(f"group{g} OBJECT IDENTIFIER ::= {{ benchMib 1 {g + 1} }}\n\n")
+        for i in range(1, count + 1):
+            syntax = "DisplayString (SIZE (0..64))" if i % 2 else "Integer32 (0..1000)"
+            parts.append(SCALAR.format(g=g, i=i, syntax=syntax))
+    t = 0
+    while columns > 0:
+        t += 1
+        width = min(20, columns)
+        members = ', '.join(f"tbl{t}c{c} Counter32" for c in range(1, width + 1))
+        parts.append(TABLE.format(t=t, members=members))
+        for c in range(1, width + 1):
+            parts.append(COLUMN.format(t=t, c=c))
+        columns -= width
+    parts.append("END\n")
+    return ''.join(parts)
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, result
+
+
+def bench(n, workdir):
+    mib_file = os.path.join(workdir, f"BENCH-{n}.txt")
+    cache = mib_file + '.cache'
+    oids_file = mib_file + '.json'
+    with open(mib_file, 'w') as f:
+        f.write(generate(n))
+
+    def compile_():
+        if os.path.exists(cache):
+            os.remove(cache)
+        return load_mib(mib_file, cache)
+
+    def cached():
+        mib, how = load_mib(mib_file, cache)
+        assert how == 'cache'
+        return MibRegistry(mib.scalars())
+
+    def hashed():
+        os.utime(mib_file)                 # same content, new mtime
+        return cached()
+
+    ms_compile, (mib, _) = timed(compile_, 1)
+    with open(oids_file, 'w') as f:
+        json.dump(mib.to_dict(), f)
+    ms_cache, registry = timed(cached)
+    ms_hashed, _ = timed(hashed)
+    ms_json, _ = timed(lambda: MibRegistry.from_json(oids_file))
+    size_kb = os.path.getsize(mib_file) // 1024
+    cache_kb = os.path.getsize(cache) // 1024
+    json_kb = os.path.getsize(oids_file) // 1024
+    print(f"{len(mib):>7} objects ({len(registry)} scalars)  MIB {size_kb} KB, cache {cache_kb} KB, "
+          f"json (scalars only) {json_kb} KB")
+    print(f"    compile {ms_compile:8.1f} ms   cache {ms_cache:7.1f} ms   "
+          f"hashed {ms_hashed:7.1f} ms   json {ms_json:7.1f} ms")
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 50_000]
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in sizes:
+            bench(n, workdir)
+
+
+if __name__ == "__main__":
+    main()
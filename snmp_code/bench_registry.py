@@ -0,0 +1,107 @@
+"""
+Benchmark: full GETNEXT walk over a large MIB registry.
+
+Compares the bisect-based MibRegistry.next_oid against the old linear scan
+over SORTED_OIDS. The linear baseline is quadratic, so it runs on a smaller
+sample and is extrapolated to the full size. Also times a hot reload that
+changes a handful of definitions (prepare_update + swap) against a full
+rebuild.
+
+Usage:
+    python bench_registry.py [n_oids]
+"""
+
+import sys
+import time
+
+from mib_registry import MibRegistry
+
+BASE = (1, 3, 6, 1, 4, 1, 28308, 9)
+
+
+def build_definitions(n):
+    # Table-shaped MIB: 10 columns x n/10 rows, inserted out of order
+    rows = max(1, n // 10)
+    defs = []
+    for col in range(10, 0, -1):
+        for row in range(rows, 0, -1):
+            defs.append((f"obj{col}.{row}", BASE + (1, col, row),
+                         {"type": "Integer32", "access": "read-only"}))
+    return defs
+
+
+def walk_registry(registry):
+    count = 0
+    oid = BASE
+    while True:
+        oid = registry.next_oid(oid)
+        if oid is None or oid[:len(BASE)] != BASE:
+            return count
+        count += 1
+
+
+def walk_linear(sorted_oids):
+    # Old JsonStore.get_next algorithm, restarted from index 0 on every call
+    count = 0
+    oid = BASE
+    while True:
+        idx = 0
+        while idx < len(sorted_oids) and sorted_oids[idx] <= oid:
+            idx += 1
+        if idx >= len(sorted_oids):
+            return count
+        oid = sorted_oids[idx]
+        count += 1
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    defs = build_definitions(n)
+
+    t0 = time.perf_counter()
+    registry = MibRegistry(defs)
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    walked = walk_registry(registry)
+    walk_s = time.perf_counter() - t0
+
+    sample = min(len(defs), 3_000)
+    small = sorted(d[1] for d in defs[:sample])
+    t0 = time.perf_counter()
+    walk_linear(small)
+    linear_small_s = time.perf_counter() - t0
+    # O(n^2): scale quadratically to the full size
+    linear_est_s = linear_small_s * (len(registry) / sample) ** 2
+
+    t0 = time.perf_counter()
+    sub = registry.subtree(BASE + (1, 5))
+    subtree_s = time.perf_counter() - t0
+
+    print(f"OIDs registered:        {len(registry)}")
+    print(f"Registry build:         {build_s * 1000:.1f} ms")
+    print(f"Bisect walk:            {walked} OIDs in {walk_s * 1000:.1f} ms "
+          f"({walk_s / max(walked, 1) * 1e6:.2f} us/GETNEXT)")
+    print(f"Linear walk ({sample}):    {linear_small_s * 1000:.1f} ms")
+    print(f"Linear walk (est. full): {linear_est_s:.1f} s")
+    print(f"Subtree query:          {len(sub)} OIDs in {subtree_s * 1e6:.1f} us")
+
+    # Hot reload: one object added, one removed, one with new props
+    changed = list(defs[1:])
+    changed[0] = (changed[0][0], changed[0][1], {"type": "Integer32", "access": "read-write"})
+    changed.append(("extra", BASE + (2, 1), {"type": "Integer32", "access": "read-only"}))
+    t0 = time.perf_counter()
+    update = registry.prepare_update(changed)
+    prepare_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    registry.swap(update)
+    swap_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    MibRegistry(changed)
+    rebuild_s = time.perf_counter() - t0
+    print(f"Reload (+1 -1 ~1):      prepare {prepare_s * 1000:.1f} ms (off loop), "
+          f"swap {swap_s * 1e6:.1f} us, full rebuild {rebuild_s * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: cost of retransmitted requests, with and without the response cache.
+
+Starts mini_agent_v4 in a child process (scratch directory, so the real
+mib_state.json is never touched) once with RESPONSE_CACHE_WINDOW = 0 and
+once with the default window, and sends sequentially from a raw socket:
+
+- GET unique / SET unique:        a new request-id every time
+- GET duplicate / SET duplicate:  the same datagram again and again, like a
+                                  manager retransmitting
+
+Reports µs per request and how many SETs reached JsonSet (agentHandlerRequests
+for 'set'): with the cache, a retransmitted SET is answered from the cache
+and applied once.
+
+Usage:
+    python bench_retransmit.py [requests]      # default: 2000 per case
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from ber_fastpath import TAG_GET, TAG_SET, build_request, encode_value, parse_response
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CPU_USAGE = (1, 3, 6, 1, 4, 1, 28308, 1, 3, 0)
+MANAGER = (1, 3, 6, 1, 4, 1, 28308, 1, 1, 0)
+SET_REQUESTS = (1, 3, 6, 1, 4, 1, 28308, 4, 1, 1, 3, 4)   # agentHandlerRequests.set
+
+# Runs in the child interpreter: the CLI agent with the given cache window
+AGENT = """
+import mini_agent_v4 as agent
+agent.RESPONSE_CACHE_WINDOW = {window}
+agent.main(['--port', '{port}', '--reload-interval', '0',
+            '--source-rate', '0', '--community-rate', '0'])
+"""
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def ask(sock, request):
+    sock.send(request)
+    return parse_response(sock.recv(65535))
+
+
+def wait_ready(sock, proc, timeout=30.0):
+    request = build_request(1, 'public', TAG_GET, 1, [(CPU_USAGE, None)])
+    sock.settimeout(0.05)
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        if proc.poll() is not None:
+            sys.exit(f"❌ Agent exited with status {proc.returncode}")
+        try:
+            ask(sock, request)
+            sock.settimeout(2)
+            return
+        except (socket.timeout, ConnectionRefusedError):
+            pass
+    sys.exit("❌ Agent did not answer")
+
+
+def run_case(sock, make_request, n):
+    """Seconds per request; make_request(i) -> datagram"""
+    t0 = time.perf_counter()
+    for i in range(n):
+        ask(sock, make_request(i))
+    return (time.perf_counter() - t0) / n
+
+
+def bench_agent(window, n):
+    workdir = tempfile.mkdtemp(prefix='mini-agent-retransmit-')
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, '-c', AGENT.format(window=window, port=port)],
+                            cwd=workdir,
+                            env=dict(os.environ, PYTHONPATH=HERE, MINI_AGENT_LOG='agent=WARNING'),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect(('127.0.0.1', port))
+    try:
+        wait_ready(sock, proc)
+        value = encode_value("DisplayString", "bench")
+        get_dup = build_request(1, 'public', TAG_GET, 7, [(CPU_USAGE, None)])
+        set_dup = build_request(1, 'private', TAG_SET, 8, [(MANAGER, value)])
+        cases = [
+            ("GET unique", lambda i: build_request(1, 'public', TAG_GET, 1000 + i, [(CPU_USAGE, None)])),
+            ("GET duplicate", lambda i: get_dup),
+            ("SET unique", lambda i: build_request(1, 'private', TAG_SET, 100000 + i, [(MANAGER, value)])),
+            ("SET duplicate", lambda i: set_dup),
+        ]
+        results = {name: run_case(sock, make, n) for name, make in cases}
+        # The GET itself is not a SET: the counter shows what JsonSet handled
+        _, _, _, varbinds = ask(sock, build_request(1, 'public', TAG_GET, 9, [(SET_REQUESTS, None)]))
+        return results, int.from_bytes(varbinds[0][2], 'big')
+    finally:
+        sock.close()
+        proc.terminate()
+        proc.wait(10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    runs = [("no cache", bench_agent(0, n)), ("cache 5 s", bench_agent(5.0, n))]
+    print(f"{n} sequential requests per case (µs/request)")
+    print(f"{'case':<16}" + "".join(f"{name:>12}" for name, _ in runs))
+    for case in runs[0][1][0]:
+        print(f"{case:<16}" + "".join(f"{results[case] * 1e6:12.0f}" for _, (results, _) in runs))
+    print(f"{'SETs applied':<16}" + "".join(f"{applied:>12}" for _, (_, applied) in runs)
+          + f"   (of {2 * n} sent)")
+
+
+if __name__ == "__main__":
+    main()
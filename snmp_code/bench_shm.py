@@ -0,0 +1,98 @@
+"""
+Benchmark: shared-memory seqlock state (shm_state.py) vs the plain dict store.
+
+1. Single process: data.get(name) on a dict, on SharedData, and a direct
+   SharedSegment.read(slot), plus the write cost of each.
+2. Cross process: a writer process keeps rewriting a string slot and an int
+   slot as fast as it can while this process reads them. Every string is a
+   repeated digit, so a torn read (bytes from two different writes) is
+   detected; the run reports reads/s, seqlock retries and torn reads (must
+   be 0).
+
+Usage:
+    python bench_shm.py [reads]
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+from shm_state import SharedData, SharedSegment
+
+LAYOUT = [
+    ("manager", "DisplayString", 64),
+    ("managerEmail", "DisplayString", 128),
+    ("cpuUsage", "Integer32", 8),
+    ("cpuThreshold", "Integer32", 8),
+]
+STATE = {"manager": "Admin", "managerEmail": "admin@example.com",
+         "cpuUsage": 12, "cpuThreshold": 80}
+
+
+def time_loop(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def writer_process(name):
+    """Child process (separate interpreter, like an agent worker)"""
+    segment = SharedSegment.attach(name)
+    segment.readonly = False      # the benchmark writer takes over the writer role
+    slot_s, slot_i = segment.index["manager"], segment.index["cpuUsage"]
+    i = 0
+    while True:
+        digit = str(i % 10)
+        segment.write(slot_s, digit * (20 + i % 40))
+        segment.write(slot_i, i)
+        i += 1
+
+
+def main():
+    if sys.argv[1:2] == ['--writer']:
+        writer_process(sys.argv[2])
+        return
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    name = f"mini-agent-bench-{os.getpid()}"
+    segment = SharedSegment.create(name, LAYOUT)
+    shared = SharedData(segment, STATE)
+    plain = dict(STATE)
+    slot = segment.index["cpuUsage"]
+
+    print(f"Single process ({n} ops):")
+    print(f"  dict.get            {time_loop(lambda: plain.get('cpuUsage'), n):7.1f} ns")
+    print(f"  SharedData.get      {time_loop(lambda: shared.get('cpuUsage'), n):7.1f} ns")
+    print(f"  SharedSegment.read  {time_loop(lambda: segment.read(slot), n):7.1f} ns")
+    print(f"  SharedData.get str  {time_loop(lambda: shared.get('managerEmail'), n):7.1f} ns")
+    print(f"  dict set            {time_loop(lambda: plain.__setitem__('cpuUsage', 42), n):7.1f} ns")
+    print(f"  SharedData set      {time_loop(lambda: shared.__setitem__('cpuUsage', 42), n):7.1f} ns")
+
+    # Cross-process: reader here, writer in a child process
+    writer = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--writer', name])
+    reader = segment              # attaching again here would confuse the resource tracker
+    reader.retries = 0
+    slot_s = reader.index["manager"]
+    torn = 0
+    reads = n // 2
+    time.sleep(0.2)
+    t0 = time.perf_counter()
+    for _ in range(reads):
+        value = reader.read(slot_s)
+        if value.strip(value[0]):
+            torn += 1
+        reader.read(slot)
+    elapsed = time.perf_counter() - t0
+    writer.kill()
+    writer.wait()
+
+    print(f"\nCross process (writer busy-looping in another process, {os.cpu_count()} CPUs):")
+    print(f"  reads/s             {2 * reads / elapsed:,.0f}")
+    print(f"  seqlock retries     {reader.retries}")
+    print(f"  torn reads          {torn}")
+    segment.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark: cold-start time of mini_agent_v4.
+
+Each measurement runs in a fresh interpreter, from a scratch directory (the
+real mib_state.json and MIB cache are never touched):
+
+- import:  `import mini_agent_v4` (must not touch files, sockets or the
+           engine, nor load psutil/smtplib/email)
+- create:  create_agent() on a free port: registry, store, SnmpEngine,
+           transport, VACM and responders
+- ready:   `python mini_agent_v4.py --port N` until it answers a GET, from
+           process spawn (interpreter startup included); 'first run' has no
+           state file nor MIB cache, 'warm' reuses the ones it wrote
+
+The median of the runs is compared with the targets below; the exit status
+is 1 when one of them is exceeded, so the benchmark can gate a change.
+
+Usage:
+    python bench_startup.py [runs]            # default: 5
+"""
+
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from ber_fastpath import TAG_GET, build_request, parse_response
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AGENT = os.path.join(HERE, 'mini_agent_v4.py')
+CPU_USAGE = (1, 3, 6, 1, 4, 1, 28308, 1, 3, 0)
+
+# Targets (median, ms)
+IMPORT_TARGET_MS = 350
+CREATE_TARGET_MS = 400
+READY_TARGET_MS = 1200
+
+LAZY_MODULES = ('psutil', 'smtplib', 'email.mime.text', 'shm_state', 'journal', 'ber_fastpath',
+                'usm_users', 'response_cache', 'admission')
+
+# Runs in the child interpreter: import + create_agent(), reported as JSON
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import mini_agent_v4 as agent
+t1 = time.perf_counter()
+loaded = [m for m in {lazy!r} if m in sys.modules]
+agent.AGENT_PORT = {port}
+agent.create_agent()
+t2 = time.perf_counter()
+agent.snmpEngine.transport_dispatcher.close_dispatcher()
+print(json.dumps({{"import": (t1 - t0) * 1000, "create": (t2 - t1) * 1000, "loaded": loaded}}))
+"""
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def child_env():
+    return dict(os.environ, PYTHONPATH=HERE, MINI_AGENT_LOG='agent=WARNING')
+
+
+def measure_create(workdir):
+    code = PROBE.format(lazy=LAZY_MODULES, port=free_port())
+    out = subprocess.run([sys.executable, '-c', code], cwd=workdir, env=child_env(),
+                         capture_output=True, text=True, timeout=60)
+    if out.returncode:
+        sys.exit(f"❌ create_agent() failed:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_ready(workdir, timeout=30.0):
+    """ms from spawning the CLI until the first GET response"""
+    port = free_port()
+    request = build_request(1, 'public', TAG_GET, 1, [(CPU_USAGE, None)])
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(0.005)
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, AGENT, '--port', str(port)], cwd=workdir,
+                            env=child_env(), stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - t0 < timeout:
+            sock.sendto(request, ('127.0.0.1', port))
+            try:
+                data = sock.recv(4096)
+            except (socket.timeout, ConnectionRefusedError):
+                if proc.poll() is not None:
+                    sys.exit(f"❌ Agent exited with status {proc.returncode}")
+                continue
+            if parse_response(data)[0] == 1:
+                return (time.perf_counter() - t0) * 1000
+        sys.exit("❌ Agent did not answer")
+    finally:
+        sock.close()
+        proc.terminate()
+        proc.wait(10)
+
+
+def report(name, values, target=None):
+    median = statistics.median(values)
+    verdict = "" if target is None else (f"  ✅ <= {target} ms" if median <= target
+                                         else f"  ❌ > {target} ms")
+    print(f"{name:<18} median {median:7.1f} ms   min {min(values):7.1f} ms   "
+          f"max {max(values):7.1f} ms{verdict}")
+    return target is None or median <= target
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    imports, creates, first, warm, loaded = [], [], [], [], set()
+    for _ in range(runs):
+        workdir = tempfile.mkdtemp(prefix='mini-agent-startup-')
+        try:
+            first.append(measure_ready(workdir))
+            warm.append(measure_ready(workdir))
+            result = measure_create(workdir)
+            imports.append(result["import"])
+            creates.append(result["create"])
+            loaded.update(result["loaded"])
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"mini_agent_v4 cold start, {runs} runs")
+    ok = report("import", imports, IMPORT_TARGET_MS)
+    ok &= report("create_agent()", creates, CREATE_TARGET_MS)
+    report("ready (first run)", first)
+    ok &= report("ready (warm)", warm, READY_TARGET_MS)
+    if loaded:
+        print(f"❌ Loaded at import time: {', '.join(sorted(loaded))}")
+        ok = False
+    else:
+        print(f"✅ Not loaded at import time: {', '.join(LAZY_MODULES)}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Benchmark: cost of SNMPv3 USM (SHA / AES) versus v2c on the JsonGet path.
+
+- keys:     passphrase -> localized key (hash_passphrase + localize_key, what
+            PySNMP does for every user on every start) vs a LocalizedKeyCache hit
+- crypto:   per-message work of an authPriv GET with PySNMP's own services:
+            HMAC-SHA-96 check + AES-128-CFB decrypt of the request, AES
+            encrypt + HMAC of the response
+- agent:    an agent in a child process (scratch directory) with one user
+            per security level. A GET of cpuUsage is captured from the PySNMP
+            client (through a relay, after the USM discovery) and replayed
+            sequentially from a raw socket, so the times are the agent's:
+            v3 requests stay valid for the 150 s timeliness window and USM
+            keeps no msgID replay cache.
+
+Usage:
+    python bench_usm.py [requests]      # default: 2000 GETs per mode
+"""
+
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from pysnmp.entity import config
+from pysnmp.hlapi.v3arch.asyncio import (
+    CommunityData, ContextData, ObjectIdentity, ObjectType, SnmpEngine, UdpTransportTarget,
+    UsmUserData, get_cmd, usmAesCfb128Protocol, usmHMACSHAAuthProtocol, usmNoPrivProtocol)
+from pysnmp.proto import rfc1902
+
+from usm_users import LocalizedKeyCache, engine_id_from, localize_auth_key, localize_priv_key
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CPU_USAGE = '1.3.6.1.4.1.28308.1.3.0'
+AUTH_PASS, PRIV_PASS = 'bench-auth-pass', 'bench-priv-pass'
+ENGINE_ID = engine_id_from(28308, 'bench')
+
+# Runs in the child interpreter: the CLI agent with the benchmark users
+AGENT = """
+import mini_agent_v4 as agent
+agent.RESPONSE_CACHE_WINDOW = 0     # the replayed GET would be answered from the cache
+agent.V3_USERS = {{
+    'bench-auth': ('sha', {auth!r}, 'none', None, 'ro'),
+    'bench-priv': ('sha', {auth!r}, 'aes', {priv!r}, 'ro'),
+}}
+agent.main(['--port', '{port}', '--reload-interval', '0',
+            '--source-rate', '0', '--community-rate', '0'])
+"""
+
+MODES = [
+    ("v2c", CommunityData('public', mpModel=1)),
+    ("v3 authNoPriv SHA", UsmUserData('bench-auth', AUTH_PASS, authProtocol=usmHMACSHAAuthProtocol,
+                                      privProtocol=usmNoPrivProtocol)),
+    ("v3 authPriv SHA/AES", UsmUserData('bench-priv', AUTH_PASS, PRIV_PASS,
+                                        authProtocol=usmHMACSHAAuthProtocol,
+                                        privProtocol=usmAesCfb128Protocol)),
+]
+
+
+def timeit(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def bench_keys(n=20):
+    workdir = tempfile.mkdtemp(prefix='mini-agent-usm-')
+    try:
+        cache = LocalizedKeyCache(os.path.join(workdir, 'usm_keys.json'))
+        auth, priv = config.USM_AUTH_HMAC96_SHA, config.USM_PRIV_CFB128_AES
+        cold = timeit(lambda: (cache.keys.clear(),
+                               cache.auth_key(auth, AUTH_PASS, ENGINE_ID),
+                               cache.priv_key(auth, priv, PRIV_PASS, ENGINE_ID)), n)
+        cache.keys = dict(cache.used)
+        warm = timeit(lambda: (cache.auth_key(auth, AUTH_PASS, ENGINE_ID),
+                               cache.priv_key(auth, priv, PRIV_PASS, ENGINE_ID)), n * 100)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print("Key localization per SHA/AES user (auth + priv key)")
+    print(f"  {'passphrase (PySNMP)':<22} {cold * 1000:8.2f} ms")
+    print(f"  {'LocalizedKeyCache hit':<22} {warm * 1e6:8.2f} µs")
+    return cold, warm
+
+
+def bench_crypto(n=5000):
+    auth = config.AUTH_SERVICES[config.USM_AUTH_HMAC96_SHA]
+    aes = config.PRIV_SERVICES[config.USM_PRIV_CFB128_AES]
+    auth_key = rfc1902.OctetString(localize_auth_key(config.USM_AUTH_HMAC96_SHA, AUTH_PASS, ENGINE_ID))
+    priv_key = rfc1902.OctetString(localize_priv_key(config.USM_AUTH_HMAC96_SHA,
+                                                     config.USM_PRIV_CFB128_AES, PRIV_PASS, ENGINE_ID))
+    # A one-varbind GET scoped PDU and its message (digest placeholder included)
+    scoped_pdu = bytes(range(48))
+    header = b'\x30\x81\x90\x02\x01\x03' + ENGINE_ID + b'\x00' * 12 + b'\x01' * 8
+    privParameters = (1, 1000, 0)
+    encrypted, salt = aes.encrypt_data(priv_key, privParameters, scoped_pdu)
+    request = auth.authenticate_outgoing_message(auth_key, header + encrypted.asOctets())
+    digest = rfc1902.OctetString(request[len(header) - 20:len(header) - 8])
+
+    rows = [
+        ("HMAC-SHA-96 verify", lambda: auth.authenticate_incoming_message(auth_key, digest, request)),
+        ("AES-128-CFB decrypt", lambda: aes.decrypt_data(priv_key, (1, 1000, salt), encrypted)),
+        ("AES-128-CFB encrypt", lambda: aes.encrypt_data(priv_key, privParameters, scoped_pdu)),
+        ("HMAC-SHA-96 sign", lambda: auth.authenticate_outgoing_message(
+            auth_key, header + encrypted.asOctets())),
+    ]
+    print(f"Per-message crypto, GET of 1 varbind ({len(request)} bytes)")
+    total = 0.0
+    for name, fn in rows:
+        t = timeit(fn, n)
+        total += t
+        print(f"  {name:<22} {t * 1e6:8.1f} µs")
+    print(f"  {'authPriv request+reply':<22} {total * 1e6:8.1f} µs")
+    return total
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class RecordingProxy(asyncio.DatagramProtocol):
+    """Relays the client's datagrams to the agent and keeps the last request"""
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.client = None
+        self.last_request = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if addr == self.agent:
+            self.transport.sendto(data, self.client)
+        else:
+            self.client, self.last_request = addr, data
+            self.transport.sendto(data, self.agent)
+
+
+async def capture_get(port, auth, warmup=20):
+    """A valid GET of cpuUsage for this security level, as sent by the PySNMP client"""
+    loop = asyncio.get_running_loop()
+    transport, proxy = await loop.create_datagram_endpoint(
+        lambda: RecordingProxy(('127.0.0.1', port)), local_addr=('127.0.0.1', 0))
+    snmp = SnmpEngine()
+    try:
+        target = await UdpTransportTarget.create(transport.get_extra_info('sockname'),
+                                                 timeout=1, retries=0)
+        for _ in range(warmup):    # also does the USM engine discovery
+            errorIndication, errorStatus, _, _ = await get_cmd(
+                snmp, auth, target, ContextData(), ObjectType(ObjectIdentity(CPU_USAGE)),
+                lookupMib=False)
+            if errorIndication or errorStatus:
+                raise RuntimeError(errorIndication or errorStatus.prettyPrint())
+    finally:
+        snmp.close_dispatcher()
+        transport.close()
+    return proxy.last_request
+
+
+def replay(port, request, n):
+    """Seconds per request for n sequential copies of request (thin client: agent time)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect(('127.0.0.1', port))
+        sock.settimeout(2)
+        t0 = time.perf_counter()
+        for _ in range(n):
+            sock.send(request)
+            sock.recv(65535)
+        return (time.perf_counter() - t0) / n
+
+
+def wait_ready(port, proc, timeout=30.0):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        if proc.poll() is not None:
+            sys.exit(f"❌ Agent exited with status {proc.returncode}")
+        try:
+            return asyncio.run(capture_get(port, MODES[0][1], warmup=1))
+        except RuntimeError:
+            time.sleep(0.2)
+    sys.exit("❌ Agent did not answer")
+
+
+def bench_end_to_end(n):
+    workdir = tempfile.mkdtemp(prefix='mini-agent-usm-')
+    port = free_port()
+    code = AGENT.format(auth=AUTH_PASS, priv=PRIV_PASS, port=port)
+    proc = subprocess.Popen([sys.executable, '-c', code], cwd=workdir,
+                            env=dict(os.environ, PYTHONPATH=HERE, MINI_AGENT_LOG='agent=WARNING'),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port, proc)
+        print(f"Agent GET path (JsonGet), {n} sequential requests per mode")
+        base = None
+        for name, auth in MODES:
+            request = asyncio.run(capture_get(port, auth))
+            replay(port, request, min(n, 100))     # warm-up
+            per_req = replay(port, request, n)
+            base = base or per_req
+            print(f"  {name:<22} {1 / per_req:8.0f} req/s {per_req * 1e6:8.0f} µs/req "
+                  f"{(per_req / base - 1) * 100:+7.1f}%")
+    finally:
+        proc.terminate()
+        proc.wait(10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    bench_keys()
+    bench_crypto()
+    bench_end_to_end(n)
+
+
+if __name__ == "__main__":
+    main()
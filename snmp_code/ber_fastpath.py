@@ -0,0 +1,384 @@
+"""
+Pre-encoded BER fast path for hot scalar GETs.
+
+Most traffic is the same cpuUsage.0 / cpuThreshold.0 GET from many pollers.
+For those, the full PySNMP path (pyasn1 decode -> message/PDU dispatch ->
+responder -> pyasn1 encode) is mostly wasted work. This module:
+
+- parses just enough of an SNMPv1/v2c message to recognise a GetRequest
+  (version, community, request-id, varbind OIDs),
+- keeps the BER-encoded varbind (OID + value) of each scalar ready to use,
+  rebuilt only after the value changes (invalidate()),
+- assembles the GetResponse by splicing bytes: version, community, the
+  re-encoded request-id, zero error fields and the cached varbinds.
+
+Anything it does not fully understand (other PDU types, unknown community or
+OID, odd encodings) returns None and goes down the normal path. With a
+verifier installed, every freshly built entry is compared byte for byte with
+the response the normal path would produce, and mismatching OIDs are
+permanently routed to the normal path.
+"""
+
+# BER / SNMP tags
+TAG_INTEGER = 0x02
+TAG_OCTET_STRING = 0x04
+TAG_NULL = 0x05
+TAG_OID = 0x06
+TAG_SEQUENCE = 0x30
+TAG_COUNTER32 = 0x41
+TAG_GAUGE32 = 0x42
+TAG_TIMETICKS = 0x43
+TAG_COUNTER64 = 0x46
+TAG_GET = 0xA0
+TAG_GETNEXT = 0xA1
+TAG_RESPONSE = 0xA2
+TAG_SET = 0xA3
+TAG_GETBULK = 0xA5
+TAG_INFORM = 0xA6
+TAG_TRAP2 = 0xA7
+TAG_NO_SUCH_OBJECT = 0x80
+TAG_NO_SUCH_INSTANCE = 0x81
+TAG_END_OF_MIB_VIEW = 0x82
+
+REQUEST_TAGS = frozenset((TAG_GET, TAG_GETNEXT, TAG_GETBULK, TAG_SET))
+V3_REPORTABLE = 0x04     # msgFlags bit set on SNMPv3 requests
+
+_ZERO_ERRORS = b'\x02\x01\x00\x02\x01\x00'   # error-status 0, error-index 0
+
+
+class BerError(ValueError):
+    pass
+
+
+# ---- encoding ----
+def encode_length(n):
+    if n < 0x80:
+        return bytes((n,))
+    raw = n.to_bytes((n.bit_length() + 7) // 8, 'big')
+    return bytes((0x80 | len(raw),)) + raw
+
+
+def encode_tlv(tag, payload):
+    return bytes((tag,)) + encode_length(len(payload)) + payload
+
+
+def encode_integer(value, tag=TAG_INTEGER):
+    length = (value + (value < 0)).bit_length() // 8 + 1
+    return encode_tlv(tag, value.to_bytes(length, 'big', signed=True))
+
+
+def encode_unsigned(value, tag):
+    # Counter32/Gauge32/TimeTicks/Counter64: unsigned, minimal, leading 0x00 if MSB set
+    length = value.bit_length() // 8 + 1
+    return encode_tlv(tag, value.to_bytes(length, 'big'))
+
+
+def encode_oid_value(oid):
+    if len(oid) < 2:
+        raise BerError("OID needs at least two arcs")
+    arcs = [oid[0] * 40 + oid[1]] + list(oid[2:])
+    out = bytearray()
+    for arc in arcs:
+        chunk = [arc & 0x7F]
+        arc >>= 7
+        while arc:
+            chunk.append(0x80 | (arc & 0x7F))
+            arc >>= 7
+        out.extend(reversed(chunk))
+    return bytes(out)
+
+
+def encode_oid(oid):
+    return encode_tlv(TAG_OID, encode_oid_value(oid))
+
+
+UNSIGNED_TAGS = {
+    "Counter32": TAG_COUNTER32,
+    "Gauge32": TAG_GAUGE32,
+    "Unsigned32": TAG_GAUGE32,
+    "TimeTicks": TAG_TIMETICKS,
+    "Counter64": TAG_COUNTER64,
+}
+
+
+def encode_value(type_name, value):
+    """Encode a store value exactly like mini_agent_v4.to_snmp_value + pyasn1 would"""
+    if type_name == "DisplayString":
+        # pyasn1 OctetString encodes str as iso-8859-1; anything else -> normal path
+        return encode_tlv(TAG_OCTET_STRING, ("" if value is None else str(value)).encode('iso-8859-1'))
+    try:
+        value = 0 if value is None else int(value)
+    except (TypeError, ValueError):
+        value = 0
+    tag = UNSIGNED_TAGS.get(type_name)
+    if tag is not None:
+        if tag == TAG_COUNTER32:
+            value &= 0xFFFFFFFF
+        elif tag == TAG_COUNTER64:
+            value &= 0xFFFFFFFFFFFFFFFF
+        else:
+            value = max(0, min(value, 0xFFFFFFFF))
+        return encode_unsigned(value, tag)
+    return encode_integer(value)
+
+
+def encode_varbind(oid, type_name, value):
+    return encode_tlv(TAG_SEQUENCE, encode_oid(oid) + encode_value(type_name, value))
+
+
+# ---- decoding ----
+def read_tlv(buf, pos):
+    """Return (tag, value_start, value_end) of the TLV at pos"""
+    tag = buf[pos]
+    length = buf[pos + 1]
+    start = pos + 2
+    if length & 0x80:
+        n = length & 0x7F
+        if not n or n > 4:
+            raise BerError("unsupported length encoding")
+        length = int.from_bytes(buf[start:start + n], 'big')
+        start += n
+    end = start + length
+    if end > len(buf):
+        raise BerError("truncated TLV")
+    return tag, start, end
+
+
+def decode_oid_value(raw):
+    arcs = []
+    arc = 0
+    for byte in raw:
+        arc = (arc << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            arcs.append(arc)
+            arc = 0
+    if not arcs or raw[-1] & 0x80:
+        raise BerError("empty or truncated OID")
+    first = arcs[0]
+    head = (min(first // 40, 2), first - 40 * min(first // 40, 2))
+    return head + tuple(arcs[1:])
+
+
+def decode_integer(buf, start, end):
+    return int.from_bytes(buf[start:end], 'big', signed=True)
+
+
+def parse_request(buf):
+    """
+    Parse an SNMPv1/v2c request header.
+
+    Returns (version, community, pdu_tag, request_id, pdu_start, pdu_end,
+    varbinds_start, varbinds_end) or raises BerError/IndexError.
+    """
+    tag, start, end = read_tlv(buf, 0)
+    if tag != TAG_SEQUENCE or end != len(buf):
+        raise BerError("not an SNMP message")
+    tag, vs, ve = read_tlv(buf, start)
+    if tag != TAG_INTEGER:
+        raise BerError("bad version")
+    version = decode_integer(buf, vs, ve)
+    tag, cs, ce = read_tlv(buf, ve)
+    if tag != TAG_OCTET_STRING:
+        raise BerError("bad community")
+    pdu_tag, ps, pe = read_tlv(buf, ce)
+    tag, rs, re_ = read_tlv(buf, ps)
+    if tag != TAG_INTEGER:
+        raise BerError("bad request-id")
+    request_id = decode_integer(buf, rs, re_)
+    _, _, e1 = read_tlv(buf, re_)     # error-status / non-repeaters
+    _, _, e2 = read_tlv(buf, e1)      # error-index / max-repetitions
+    tag, ls, le = read_tlv(buf, e2)
+    if tag != TAG_SEQUENCE:
+        raise BerError("bad varbind list")
+    return version, buf[cs:ce], pdu_tag, request_id, ps, pe, ls, le
+
+
+def iter_varbind_oids(buf, start, end):
+    """Yield the raw (still encoded) OID value bytes of each varbind"""
+    pos = start
+    while pos < end:
+        tag, vbs, vbe = read_tlv(buf, pos)
+        if tag != TAG_SEQUENCE:
+            raise BerError("bad varbind")
+        tag, os_, oe = read_tlv(buf, vbs)
+        if tag != TAG_OID:
+            raise BerError("bad varbind OID")
+        yield bytes(buf[os_:oe])
+        pos = vbe
+
+
+def build_response(version, community, request_id, varbind_bytes):
+    pdu = encode_tlv(TAG_RESPONSE, encode_integer(request_id) + _ZERO_ERRORS
+                     + encode_tlv(TAG_SEQUENCE, varbind_bytes))
+    return encode_tlv(TAG_SEQUENCE, encode_integer(version)
+                      + encode_tlv(TAG_OCTET_STRING, community) + pdu)
+
+
+def build_request(version, community, pdu_tag, request_id, varbinds,
+                  non_repeaters=0, max_repetitions=0):
+    """
+    Request message (used by load generators / tests).
+
+    varbinds: iterable of (oid tuple, encoded value TLV or None for NULL).
+    non_repeaters/max_repetitions fill the error-status/error-index slots.
+    """
+    if isinstance(community, str):
+        community = community.encode()
+    vbs = b''.join(encode_tlv(TAG_SEQUENCE, encode_oid(oid) + (b'\x05\x00' if value is None else value))
+                   for oid, value in varbinds)
+    pdu = encode_tlv(pdu_tag, encode_integer(request_id) + encode_integer(non_repeaters)
+                     + encode_integer(max_repetitions) + encode_tlv(TAG_SEQUENCE, vbs))
+    return encode_tlv(TAG_SEQUENCE, encode_integer(version)
+                      + encode_tlv(TAG_OCTET_STRING, community) + pdu)
+
+
+def message_version(buf):
+    """msgVersion of an SNMP message: 0 (v1), 1 (v2c) or 3"""
+    _, start, _ = read_tlv(buf, 0)
+    tag, vs, ve = read_tlv(buf, start)
+    if tag != TAG_INTEGER:
+        raise BerError("bad version")
+    return decode_integer(buf, vs, ve)
+
+
+def parse_v3(buf):
+    """(msgID, msgFlags, user name) of an SNMPv3 message, or raises BerError/IndexError"""
+    tag, start, end = read_tlv(buf, 0)
+    if tag != TAG_SEQUENCE or end != len(buf):
+        raise BerError("not an SNMP message")
+    _, _, pos = read_tlv(buf, start)                     # msgVersion
+    tag, hs, he = read_tlv(buf, pos)                     # msgGlobalData
+    if tag != TAG_SEQUENCE:
+        raise BerError("bad msgGlobalData")
+    tag, is_, ie = read_tlv(buf, hs)
+    if tag != TAG_INTEGER:
+        raise BerError("bad msgID")
+    msg_id = decode_integer(buf, is_, ie)
+    _, _, pos = read_tlv(buf, ie)                        # msgMaxSize
+    tag, fs, fe = read_tlv(buf, pos)
+    if tag != TAG_OCTET_STRING or fe - fs != 1:
+        raise BerError("bad msgFlags")
+    flags = buf[fs]
+    tag, ss, _ = read_tlv(buf, he)                       # msgSecurityParameters
+    if tag != TAG_OCTET_STRING:
+        raise BerError("bad msgSecurityParameters")
+    tag, us, _ = read_tlv(buf, ss)                       # UsmSecurityParameters
+    if tag != TAG_SEQUENCE:
+        raise BerError("bad UsmSecurityParameters")
+    _, _, pos = read_tlv(buf, us)                        # msgAuthoritativeEngineID
+    _, _, pos = read_tlv(buf, pos)                       # msgAuthoritativeEngineBoots
+    _, _, pos = read_tlv(buf, pos)                       # msgAuthoritativeEngineTime
+    tag, ns, ne = read_tlv(buf, pos)
+    if tag != TAG_OCTET_STRING:
+        raise BerError("bad msgUserName")
+    return msg_id, flags, buf[ns:ne]
+
+
+def parse_response(buf):
+    """(request_id, error_status, error_index, [(oid tuple, value tag, raw value bytes)])"""
+    _, _, _, request_id, ps, _, ls, le = parse_request(buf)
+    _, _, re_ = read_tlv(buf, ps)
+    _, es, ee = read_tlv(buf, re_)
+    _, is_, ie = read_tlv(buf, ee)
+    varbinds = []
+    pos = ls
+    while pos < le:
+        _, vbs, vbe = read_tlv(buf, pos)
+        _, os_, oe = read_tlv(buf, vbs)
+        tag, vs, ve = read_tlv(buf, oe)
+        varbinds.append((decode_oid_value(buf[os_:oe]), tag, bytes(buf[vs:ve])))
+        pos = vbe
+    return request_id, decode_integer(buf, es, ee), decode_integer(buf, is_, ie), varbinds
+
+
+class BerFastPath:
+    def __init__(self, lookup, communities, max_varbinds=8, max_entries=4096):
+        """
+        lookup: oid tuple -> (type name, python value) or None
+        communities: communities allowed to read every hot OID
+        max_entries: bound of the varbind cache and of the disabled set
+        """
+        self.lookup = lookup
+        self.communities = {c.encode() if isinstance(c, str) else c for c in communities}
+        self.max_varbinds = max_varbinds
+        self.max_entries = max_entries
+        self.verifier = None        # (request datagram, fast response) -> bool
+        # Keyed by the canonical OID encoding (what invalidate() computes): a
+        # request with any other encoding of an OID never matches and falls back
+        self._varbinds = {}         # OID bytes -> pre-encoded varbind
+        self._disabled = set()      # OID bytes that failed verification
+        self.hits = 0
+        self.fallbacks = 0
+        self.rebuilds = 0
+        self.mismatches = 0
+
+    def invalidate(self, oid_tuple):
+        """Value of oid_tuple changed: rebuild its bytes on next use"""
+        self._varbinds.pop(encode_oid_value(oid_tuple), None)
+
+    def clear(self):
+        self._varbinds.clear()
+
+    def _build(self, raw_oid):
+        oid = decode_oid_value(raw_oid)
+        if encode_oid_value(oid) != raw_oid:
+            return None             # non-canonical (0x80 padding): PySNMP rejects it
+        found = self.lookup(oid)
+        if found is None:
+            return None
+        type_name, value = found
+        try:
+            vb = encode_tlv(TAG_SEQUENCE, encode_tlv(TAG_OID, raw_oid) + encode_value(type_name, value))
+        except UnicodeEncodeError:
+            return None
+        self.rebuilds += 1
+        return vb
+
+    def respond(self, datagram):
+        """GetResponse bytes for datagram, or None to use the normal path"""
+        try:
+            version, community, pdu_tag, request_id, _, _, ls, le = parse_request(datagram)
+            if pdu_tag != TAG_GET or version not in (0, 1) or community not in self.communities:
+                self.fallbacks += 1
+                return None
+            parts = []
+            fresh = False
+            for raw_oid in iter_varbind_oids(datagram, ls, le):
+                vb = self._varbinds.get(raw_oid)
+                if vb is None:
+                    if (raw_oid in self._disabled or len(parts) >= self.max_varbinds
+                            or len(self._varbinds) >= self.max_entries):
+                        self.fallbacks += 1
+                        return None
+                    vb = self._build(raw_oid)
+                    if vb is None:
+                        self.fallbacks += 1
+                        return None
+                    self._varbinds[raw_oid] = vb
+                    fresh = True
+                parts.append(vb)
+        except (BerError, IndexError):
+            self.fallbacks += 1
+            return None
+        if not parts:
+            self.fallbacks += 1
+            return None
+        rsp = build_response(version, community, request_id, b''.join(parts))
+        if fresh and self.verifier is not None and not self.verifier(datagram, rsp):
+            self.mismatches += 1
+            for raw_oid in iter_varbind_oids(datagram, ls, le):
+                self._varbinds.pop(raw_oid, None)
+                if len(self._disabled) < self.max_entries:
+                    self._disabled.add(raw_oid)
+            return None
+        self.hits += 1
+        return rsp
+
+    def metrics(self):
+        return {
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "rebuilds": self.rebuilds,
+            "mismatches": self.mismatches,
+            "entries": len(self._varbinds),
+        }
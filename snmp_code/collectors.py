@@ -0,0 +1,145 @@
+"""
+Periodic collectors for the sampler, run off the dispatcher loop.
+
+A Collector pairs a blocking `collect()` (psutil reads, /proc scans,
+statvfs...) with a `publish(result)` that applies the result to the store.
+The CollectorScheduler runs every collector on its own interval:
+
+- collect() runs in a bounded ThreadPoolExecutor, or in a ProcessPoolExecutor
+  for CPU-heavy collectors (process=True; collect must then be a picklable
+  module-level function). Workers are spawned, not forked, so they do not
+  inherit the agent's threads and sockets.
+- per-collector timeout: a collection slower than `timeout` s is dropped for
+  that tick. Threads cannot be killed, so the call keeps running, but the
+  collector is not submitted again until it returns (skipped ticks are
+  counted): a hung statvfs never piles up threads.
+- publish() runs on the loop with no await between reading the result and
+  updating the store, so a request never sees half a sample. It may be a
+  coroutine (e.g. batched alarm evaluation that yields to the dispatcher).
+
+The loop only pays for the submit and the publish (plus the GIL handover
+while a pool thread runs Python code, at most sys.getswitchinterval()).
+metrics() reports per collector runs, timeouts, errors, skipped ticks, the
+collect time in the pool and the publish time (for coroutines, including
+the time they spent yielding).
+"""
+
+import asyncio
+import inspect
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from agent_logging import get_logger
+
+log = get_logger('sampler')
+
+
+class Collector:
+    def __init__(self, name, collect, publish, interval, timeout=None, process=False, setup=None):
+        """setup: optional callable run once in the pool before the first tick (warm-up)"""
+        self.name = name
+        self.collect = collect
+        self.publish = publish
+        self.interval = interval
+        self.timeout = timeout or interval
+        self.process = process
+        self.setup = setup
+        self.pending = None          # concurrent future of the collection in flight
+        self.runs = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.skipped = 0
+        self.collect_s = 0.0         # last collection time (in the pool)
+        self.publish_s = 0.0         # last publish time (on the loop)
+        self.max_publish_s = 0.0
+
+    def metrics(self):
+        return {"runs": self.runs, "timeouts": self.timeouts, "errors": self.errors,
+                "skipped": self.skipped, "collect_ms": round(self.collect_s * 1000, 3),
+                "publish_ms": round(self.publish_s * 1000, 3),
+                "max_publish_ms": round(self.max_publish_s * 1000, 3)}
+
+
+class CollectorScheduler:
+    def __init__(self, threads=4, processes=0):
+        self.threads = threads
+        self.processes = processes
+        self.collectors = []
+        self._thread_pool = None     # created on first use
+        self._process_pool = None
+
+    def add(self, name, collect, publish, interval, timeout=None, process=False, setup=None):
+        collector = Collector(name, collect, publish, interval, timeout, process, setup)
+        self.collectors.append(collector)
+        return collector
+
+    def _executor(self, collector):
+        if collector.process and self.processes:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    self.processes, mp_context=multiprocessing.get_context('spawn'))
+            return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(self.threads, thread_name_prefix='collector')
+        return self._thread_pool
+
+    async def run(self):
+        """Run every collector until cancelled"""
+        await asyncio.gather(*(self._run(collector) for collector in self.collectors))
+
+    async def _call(self, collector, fn):
+        """fn() in the collector's pool; (True, result) or (False, None) on timeout/error"""
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        collector.pending = self._executor(collector).submit(fn)
+        wrapped = asyncio.wrap_future(collector.pending, loop=loop)
+        # A late result or error is dropped, but still retrieved (no "never retrieved" warning)
+        wrapped.add_done_callback(lambda fut: fut.cancelled() or fut.exception())
+        done, _ = await asyncio.wait({wrapped}, timeout=collector.timeout)
+        collector.collect_s = time.perf_counter() - t0
+        if not done:
+            collector.timeouts += 1
+            log.warning("⚠️ Collector %s: sin respuesta en %.1f s, tick descartado",
+                        collector.name, collector.timeout)
+            return False, None
+        if wrapped.exception() is not None:
+            collector.errors += 1
+            log.error("❌ Collector %s: %s", collector.name, wrapped.exception())
+            return False, None
+        return True, wrapped.result()
+
+    async def _run(self, collector):
+        loop = asyncio.get_running_loop()
+        if collector.setup is not None:
+            await self._call(collector, collector.setup)
+        due = loop.time()
+        while True:
+            due += collector.interval
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            if collector.pending is not None and not collector.pending.done():
+                collector.skipped += 1       # previous (timed out) call still running
+                continue
+            ok, result = await self._call(collector, collector.collect)
+            if not ok:
+                continue
+            t0 = time.perf_counter()
+            try:
+                published = collector.publish(result)
+                if inspect.isawaitable(published):
+                    await published
+            except Exception as e:
+                collector.errors += 1
+                log.error("❌ Collector %s: error al publicar: %s", collector.name, e)
+                continue
+            collector.publish_s = time.perf_counter() - t0
+            collector.max_publish_s = max(collector.max_publish_s, collector.publish_s)
+            collector.runs += 1
+
+    def metrics(self):
+        return {collector.name: collector.metrics() for collector in self.collectors}
+
+    def close(self):
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,69 @@
+"""
+Per-core CPU usage (MYAGENT-MIB cpuCoreTable, 1.3.6.1.4.1.28308.1.5).
+
+One psutil.cpu_times_percent(percpu=True) call per sampler tick fills four
+preallocated array.array columns (usage, user, system, iowait) in place, so
+the ColumnarTable view never changes shape and GETNEXT/GETBULK walk the
+columns without building per-row dicts. The same sample also gives the
+aggregate cpuUsage (mean over the cores), so a tick reads /proc/stat once.
+
+usage follows psutil.cpu_percent: 100 - idle - iowait.
+
+psutil is imported on the first sample (start()), not when the agent is
+imported or built. read() is the blocking part (it may run in the sampler's
+thread pool); apply() only copies the sample into the columns, on the loop.
+"""
+
+import os
+from array import array
+
+from mib_tables import ColumnarTable
+
+
+class CpuCores:
+    def __init__(self, count=None):
+        self.count = count or os.cpu_count() or 1
+        zeros = bytes(4 * self.count)
+        self.usage = array('i', zeros)
+        self.user = array('i', zeros)
+        self.system = array('i', zeros)
+        self.iowait = array('i', zeros)
+        self.aggregate = 0.0
+
+    def start(self):
+        """Warm-up sample, before the first tick (psutil's first call returns 0.0)"""
+        self.read()
+
+    def read(self):
+        """One psutil sample (reads /proc/stat)"""
+        import psutil
+        return psutil.cpu_times_percent(interval=None, percpu=True)
+
+    def sample(self):
+        """Refresh every column from one psutil sample; return the mean usage"""
+        return self.apply(self.read())
+
+    def apply(self, times):
+        """Refresh every column from a read() sample; return the mean usage"""
+        usage, user, system, iowait = self.usage, self.user, self.system, self.iowait
+        total = 0.0
+        times = times[:self.count]             # psutil may report more cores than the table has
+        for i, t in enumerate(times):
+            wait = getattr(t, 'iowait', 0.0)      # Linux only
+            busy = max(0.0, min(100.0, 100.0 - t.idle - wait))
+            usage[i] = round(busy)
+            user[i] = round(t.user)
+            system[i] = round(t.system)
+            iowait[i] = round(wait)
+            total += busy
+        self.aggregate = total / len(times) if times else 0.0
+        return self.aggregate
+
+    def table(self):
+        """cpuCoreTable: INDEX { cpuCoreIndex } (core number + 1)"""
+        return ColumnarTable([
+            (2, "Integer32", self.usage),
+            (3, "Integer32", self.user),
+            (4, "Integer32", self.system),
+            (5, "Integer32", self.iowait),
+        ], [(i + 1,) for i in range(self.count)])
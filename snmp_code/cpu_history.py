@@ -0,0 +1,86 @@
+"""
+cpuUsage history (MYAGENT-MIB cpuHistory, 1.3.6.1.4.1.28308.1.6).
+
+A fixed-size ring buffer keeps the last 15 minutes of sampler ticks in an
+array.array, so memory does not grow with uptime. Everything is updated
+incrementally on each tick:
+
+- 1/5/15-minute averages: one running sum per window, plus the new sample,
+  minus the sample leaving that window: O(1)
+- 1/5/15-minute maxima: one monotonic deque per window (amortised O(1),
+  never longer than the window)
+- EWMA with a configurable smoothing factor: O(1)
+- cpuHistoryTable: one row appended per tick until the ring is full, O(1)
+
+Values are kept and served in hundredths of a percent (0..10000).
+"""
+
+from array import array
+from collections import deque
+
+from mib_tables import ColumnarTable, ScalarGroup
+
+WINDOWS_S = (60, 300, 900)
+
+
+class CpuHistory:
+    def __init__(self, interval=5, alpha=0.2):
+        self.interval = interval
+        self.alpha = alpha
+        self.windows = tuple(max(1, int(w // interval)) for w in WINDOWS_S)   # in samples
+        self.capacity = self.windows[-1]
+        self.samples = array('H', bytes(2 * self.capacity))
+        self.count = 0                     # samples ever added
+        self.sums = [0] * len(self.windows)
+        self._max = [deque() for _ in self.windows]   # (sample number, value), decreasing
+        self.ewma = None
+        self._table = ColumnarTable([
+            (2, "Integer32", self.at),
+            (3, "Integer32", lambda row: row * self.interval),
+        ])
+
+    def add(self, usage):
+        """Record one tick (usage in percent, float or int)"""
+        value = max(0, min(10000, round(usage * 100)))
+        n = self.count
+        samples, capacity = self.samples, self.capacity
+        for i, window in enumerate(self.windows):
+            self.sums[i] += value
+            if n >= window:
+                self.sums[i] -= samples[(n - window) % capacity]
+            peaks = self._max[i]
+            while peaks and peaks[-1][1] <= value:
+                peaks.pop()
+            peaks.append((n, value))
+            if peaks[0][0] <= n - window:
+                peaks.popleft()
+        samples[n % capacity] = value
+        self.count = n + 1
+        self.ewma = value if self.ewma is None else self.ewma + self.alpha * (value - self.ewma)
+        if n < capacity:                   # the table only grows until the ring is full
+            self._table.append_row((n + 1,))
+
+    def average(self, i):
+        filled = min(self.count, self.windows[i])
+        return round(self.sums[i] / filled) if filled else None
+
+    def maximum(self, i):
+        peaks = self._max[i]
+        return peaks[0][1] if peaks else None
+
+    def at(self, row):
+        """Sample `row` ticks ago (0 = newest)"""
+        return self.samples[(self.count - 1 - row) % self.capacity]
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def view(self):
+        """cpuHistory subtree: scalars .1-.8, cpuHistoryTable at .9"""
+        scalars = {}
+        for i in range(len(self.windows)):
+            scalars[1 + i] = ("Integer32", lambda i=i: self.average(i))    # cpuUsageAvg1/5/15
+            scalars[4 + i] = ("Integer32", lambda i=i: self.maximum(i))    # cpuUsageMax1/5/15
+        scalars[7] = ("Integer32", lambda: None if self.ewma is None else round(self.ewma))
+        scalars[8] = ("Gauge32", self.__len__)                              # cpuHistorySamples
+        return ScalarGroup(scalars, {9: self._table})
@@ -0,0 +1,92 @@
+"""
+Local UDP trap/inform receiver stand-in for testing the notification path.
+
+Decodes SNMPv2c notifications, acknowledges InformRequests with a Response PDU,
+and can simulate a lossy or slow manager so you can watch the agent's
+outstanding-inform table, retransmissions and timeouts.
+
+Usage:
+    python inform_receiver.py [--port 1162] [--drop 0.3] [--delay 0.2]
+
+Then set TRAP_TARGETS = [('127.0.0.1', 1162)] and NOTIFY_MODE = 'inform'
+in mini_agent_v4.py.
+"""
+
+import argparse
+import asyncio
+import random
+
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto.api import v2c
+
+
+class ReceiverProtocol(asyncio.DatagramProtocol):
+    def __init__(self, drop, delay):
+        self.drop = drop
+        self.delay = delay
+        self.transport = None
+        self.received = 0
+        self.acked = 0
+        self.dropped = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            reqMsg, _ = decoder.decode(data, asn1Spec=v2c.Message())
+        except Exception as e:
+            print(f"⚠️ Undecodable datagram from {addr}: {e}")
+            return
+        self.received += 1
+        reqPDU = v2c.apiMessage.get_pdu(reqMsg)
+        is_inform = reqPDU.isSameTypeWith(v2c.InformRequestPDU())
+        kind = "INFORM" if is_inform else "TRAP"
+        print(f"📥 {kind} #{self.received} from {addr}, "
+              f"community={v2c.apiMessage.get_community(reqMsg).prettyPrint()}, "
+              f"request-id={v2c.apiPDU.get_request_id(reqPDU)}")
+        for oid, val in v2c.apiPDU.get_varbinds(reqPDU):
+            print(f"  {oid.prettyPrint()} = {val.prettyPrint()}")
+        if not is_inform:
+            return
+        if random.random() < self.drop:
+            self.dropped += 1
+            print("  (dropped, no ack)")
+            return
+        rspMsg = v2c.apiMessage.get_response(reqMsg)
+        rspPDU = v2c.apiMessage.get_pdu(rspMsg)
+        v2c.apiPDU.set_varbinds(rspPDU, v2c.apiPDU.get_varbinds(reqPDU))
+        wire = encoder.encode(rspMsg)
+        if self.delay:
+            asyncio.get_running_loop().call_later(self.delay, self._ack, wire, addr)
+        else:
+            self._ack(wire, addr)
+
+    def _ack(self, wire, addr):
+        self.transport.sendto(wire, addr)
+        self.acked += 1
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1162)
+    parser.add_argument('--drop', type=float, default=0.0, help='probability of not acking an inform')
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds before sending the ack')
+    args = parser.parse_args()
+
+    loop = asyncio.get_running_loop()
+    _, protocol = await loop.create_datagram_endpoint(
+        lambda: ReceiverProtocol(args.drop, args.delay), local_addr=(args.host, args.port))
+    print(f"Receiver listening on {args.host}:{args.port} (drop={args.drop}, delay={args.delay}s)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(f"received={protocol.received} acked={protocol.acked} dropped={protocol.dropped}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
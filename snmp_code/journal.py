@@ -0,0 +1,278 @@
+"""
+Journaled state backend: append-only log + compact binary snapshots.
+
+Drop-in alternative to persistence.WriteBehindWriter for JsonStore:
+
+- every change appends one small record (crc32, length, marshal((key, value)))
+  to the journal -> constant cost per SET, independent of state size. Nested
+  state (the alarm rows) is journaled per entry: key (name, sub-key), value
+  None when the entry was removed
+- a background compactor rotates the journal, writes a binary snapshot of the
+  whole state (marshal, atomically replaced) and then drops the old segment
+- startup loads the snapshot and replays the journal tail; a torn last
+  record (crash mid-append) is detected by its CRC and truncated
+- a human-readable JSON export is refreshed after every compaction
+
+Usage from the command line:
+    python journal.py export mib_state.snap mib_state.journal out.json
+"""
+
+import asyncio
+import json
+import marshal
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+from agent_logging import get_logger
+from persistence import POLICIES, write_json_atomic
+
+log = get_logger('persist')
+
+SNAPSHOT_MAGIC = b'MASNAP1\x00'
+RECORD_HEADER = struct.Struct('<II')   # crc32(payload), len(payload)
+
+
+def encode_record(key, value):
+    payload = marshal.dumps((key, value))
+    return RECORD_HEADER.pack(zlib.crc32(payload), len(payload)) + payload
+
+
+def apply_record(data, key, value):
+    if isinstance(key, tuple):       # (name, sub-key): one entry of a nested dict
+        name, sub = key
+        entry = data.get(name)
+        if not isinstance(entry, dict):
+            entry = data[name] = {}
+        if value is None:
+            entry.pop(sub, None)
+        else:
+            entry[sub] = value
+    else:
+        data[key] = value
+
+
+def replay_journal(fname, data):
+    """Apply every valid record of fname to data; return the valid byte length"""
+    try:
+        with open(fname, 'rb') as f:
+            buf = f.read()
+    except FileNotFoundError:
+        return 0
+    pos = 0
+    hsize = RECORD_HEADER.size
+    while pos + hsize <= len(buf):
+        crc, length = RECORD_HEADER.unpack_from(buf, pos)
+        payload = buf[pos + hsize:pos + hsize + length]
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            break  # torn or corrupt tail
+        key, value = marshal.loads(payload)
+        apply_record(data, key, value)
+        pos += hsize + length
+    return pos
+
+
+def read_snapshot(fname):
+    try:
+        with open(fname, 'rb') as f:
+            buf = f.read()
+    except FileNotFoundError:
+        return None
+    if buf[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError(f"{fname} is not a state snapshot")
+    (crc,) = struct.unpack_from('<I', buf, len(SNAPSHOT_MAGIC))
+    body = buf[len(SNAPSHOT_MAGIC) + 4:]
+    if zlib.crc32(body) != crc:
+        raise ValueError(f"{fname}: snapshot checksum mismatch")
+    return marshal.loads(body)
+
+
+def write_snapshot(fname, data):
+    body = marshal.dumps(data)
+    tmp = fname + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack('<I', zlib.crc32(body)))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, fname)
+
+
+class JournalWriter:
+    def __init__(self, snapshot_file, journal_file, json_export=None,
+                 policy='interval', interval=2.0,
+                 compact_interval=60.0, max_log_bytes=1 << 20):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown persistence policy {policy!r} (expected one of {POLICIES})")
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.old_journal = journal_file + '.old'
+        self.json_export = json_export
+        self.policy = policy
+        self.interval = interval
+        self.compact_interval = compact_interval
+        self.max_log_bytes = max_log_bytes
+        self._data = None
+        self._fd = None
+        self._log_bytes = 0
+        self._unsynced = False
+        self._full_dirty = False     # save() without key -> next compaction
+        self._compacting = False
+        self._lock = threading.Lock()   # one snapshot writer at a time
+        self._last_compact = time.monotonic()
+        self.records = 0
+        self.compactions = 0
+
+    @property
+    def dirty(self):
+        return self._unsynced or self._full_dirty
+
+    # ---- startup ----
+    def load(self):
+        """Snapshot + journal replay. Falls back to the JSON export on first run."""
+        data = read_snapshot(self.snapshot_file)
+        if data is None:
+            data = {}
+            if self.json_export and os.path.exists(self.json_export):
+                with open(self.json_export) as f:
+                    data = json.load(f)
+        replay_journal(self.old_journal, data)
+        valid = replay_journal(self.journal_file, data)
+        self._data = data
+        self._open_log(truncate_at=valid)
+        if os.path.exists(self.old_journal):
+            # Crash during a previous compaction: finish it now
+            self._compact_sync()
+        return data
+
+    def _open_log(self, truncate_at=None):
+        self._fd = os.open(self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        size = os.fstat(self._fd).st_size
+        if truncate_at is not None and truncate_at < size:
+            os.ftruncate(self._fd, truncate_at)
+            size = truncate_at
+        self._log_bytes = size
+
+    # ---- writes ----
+    def mark_dirty(self, data, key=None):
+        self._data = data
+        if key is None:
+            self._full_dirty = True
+            return
+        if isinstance(key, tuple):
+            name, sub = key
+            rec = encode_record(key, data[name].get(sub))
+        else:
+            rec = encode_record(key, data[key])
+        os.write(self._fd, rec)
+        self._log_bytes += len(rec)
+        self.records += 1
+        if self.policy == 'always':
+            os.fsync(self._fd)
+        else:
+            self._unsynced = True
+
+    def flush(self):
+        """Make appended records durable"""
+        if self._unsynced:
+            os.fsync(self._fd)
+            self._unsynced = False
+
+    # ---- compaction ----
+    def _rotate(self):
+        """Close the live journal and start a new one; returns the state snapshot"""
+        os.close(self._fd)
+        if os.path.exists(self.old_journal):
+            # Previous compaction failed: keep its segment, chain ours after it
+            with open(self.journal_file, 'rb') as src, open(self.old_journal, 'ab') as dst:
+                dst.write(src.read())
+            os.remove(self.journal_file)
+        else:
+            os.replace(self.journal_file, self.old_journal)
+        self._open_log()
+        self._unsynced = False
+        self._full_dirty = False
+        return dict(self._data)
+
+    def _write_compaction(self, snapshot):
+        with self._lock:
+            write_snapshot(self.snapshot_file, snapshot)
+            os.remove(self.old_journal)
+            if self.json_export:
+                write_json_atomic(self.json_export, snapshot)
+
+    def _compact_sync(self):
+        # Wait for any in-flight background compaction before rotating again
+        with self._lock:
+            snapshot = self._rotate()
+        self._write_compaction(snapshot)
+        self.compactions += 1
+        self._last_compact = time.monotonic()
+
+    async def compact(self):
+        """Rotate on the loop (cheap), write the snapshot in a worker thread"""
+        if self._compacting:
+            return
+        self._compacting = True
+        try:
+            snapshot = self._rotate()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write_compaction, snapshot)
+            self.compactions += 1
+        except Exception as e:
+            # Not only OSError: e.g. a ValueError from a value marshal cannot
+            # serialise; the rotated segment is kept and the next run retries
+            self._full_dirty = True
+            log.error("❌ Journal compaction failed: %s", e)
+        finally:
+            self._compacting = False
+            self._last_compact = time.monotonic()
+
+    def _compaction_due(self):
+        return (self._log_bytes >= self.max_log_bytes or self._full_dirty
+                or (self._log_bytes and time.monotonic() - self._last_compact >= self.compact_interval))
+
+    async def run(self):
+        """Background task: periodic fsync ('interval' policy) and compaction"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if self.policy == 'interval' and self._unsynced:
+                    self._unsynced = False
+                    await loop.run_in_executor(None, os.fsync, self._fd)
+                if self._compaction_due():
+                    await self.compact()
+            except Exception as e:
+                self._unsynced = True
+                log.error("❌ Journal background task error: %s", e)
+
+    def close(self):
+        """Final compaction: leaves a fresh snapshot, an empty journal and the JSON export"""
+        if self._fd is None:
+            return
+        if self._log_bytes or self._full_dirty or os.path.exists(self.old_journal):
+            self._compact_sync()
+        os.close(self._fd)
+        self._fd = None
+
+
+def export_json(snapshot_file, journal_file, out_file):
+    """Rebuild the current state from disk and write it as JSON"""
+    data = read_snapshot(snapshot_file) or {}
+    replay_journal(journal_file + '.old', data)
+    replay_journal(journal_file, data)
+    write_json_atomic(out_file, data)
+    return data
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 5 or sys.argv[1] != 'export':
+        print(__doc__)
+        sys.exit(1)
+    state = export_json(sys.argv[2], sys.argv[3], sys.argv[4])
+    print(f"✅ Exported {len(state)} values to {sys.argv[4]}")
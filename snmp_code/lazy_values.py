@@ -0,0 +1,147 @@
+"""
+Lazy, on-demand managed values with a per-provider TTL cache.
+
+A LazyGroup wraps one collector callable (e.g. psutil.virtual_memory) that
+returns several related fields at once. Nothing runs in the background:
+the collector is called only when a GET/GETNEXT/GETBULK touches one of the
+group's OIDs and the cached result is older than the group's TTL.
+
+- Fast collectors (blocking=False) run inline on the dispatcher loop.
+- Collectors that may block (statvfs on a network mount, walking /proc)
+  run in a thread pool. While such a group is stale, reading it raises
+  StaleValue carrying the refresh future. The responder defers its answer
+  until the future completes, then builds the response again.
+- Single flight: all requests that hit a stale group while it refreshes
+  share the same future, so there is at most one collection per group.
+
+LazyScalar exposes one field of a group as a registry mount provider
+(get/next, see mib_registry.py), mounted at the object OID and serving the
+.0 instance.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+
+from agent_logging import get_logger
+
+log = get_logger('lazy')
+
+_allow_stale = False
+
+
+class StaleValue(Exception):
+    """A blocking group is being refreshed; retry once `future` is done"""
+
+    def __init__(self, group, future):
+        super().__init__(group.name)
+        self.group = group
+        self.future = future
+
+
+@contextmanager
+def allow_stale():
+    """Serve the last collected values instead of raising StaleValue"""
+    global _allow_stale
+    previous, _allow_stale = _allow_stale, True
+    try:
+        yield
+    finally:
+        _allow_stale = previous
+
+
+class LazyGroup:
+    def __init__(self, name, collect, ttl=5.0, blocking=False, executor=None):
+        """
+        collect:  callable() -> {field: value}
+        ttl:      seconds a collected result stays fresh
+        blocking: run collect in `executor` (thread pool) instead of inline
+        """
+        self.name = name
+        self.collect = collect
+        self.ttl = ttl
+        self.blocking = blocking
+        self.executor = executor
+        self._values = None
+        self._expires = 0.0
+        self._inflight = None
+        self.hits = 0
+        self.collections = 0
+        self.errors = 0
+
+    def values(self):
+        """Fresh {field: value}, collecting if needed (may raise StaleValue)"""
+        if time.monotonic() < self._expires:
+            self.hits += 1
+            return self._values
+        if not self.blocking:
+            self._store(self._collect())
+            return self._values
+        future = self.refresh()
+        if _allow_stale:
+            return self._values   # last result (None -> noSuchObject)
+        raise StaleValue(self, future)
+
+    def refresh(self):
+        """Start (or join) the background collection; asyncio future"""
+        if self._inflight is None:
+            loop = asyncio.get_running_loop()
+            self._inflight = loop.run_in_executor(self.executor, self._collect)
+            self._inflight.add_done_callback(self._refreshed)
+        return self._inflight
+
+    def _refreshed(self, future):
+        self._inflight = None
+        if not future.cancelled():   # executor shut down with the agent
+            self._store(future.result())
+
+    def _collect(self):
+        t0 = time.perf_counter()
+        try:
+            values = self.collect()
+        except Exception as e:
+            log.warning("⚠️ Provider %s falló: %s", self.name, e)
+            return None
+        log.debug("Provider %s recolectado en %.1f ms", self.name, (time.perf_counter() - t0) * 1000)
+        return values
+
+    def _store(self, values):
+        self.collections += 1
+        if values is None:
+            self.errors += 1      # keep the previous values, retry after the TTL
+        else:
+            self._values = values
+        self._expires = time.monotonic() + self.ttl
+
+    def scalar(self, field, type_name):
+        return LazyScalar(self, field, type_name)
+
+    def metrics(self):
+        return {"hits": self.hits, "collections": self.collections, "errors": self.errors,
+                "refreshing": self._inflight is not None}
+
+
+class LazyScalar:
+    """Registry provider for group field `field`, instance .0"""
+    __slots__ = ("group", "field", "type")
+
+    def __init__(self, group, field, type_name):
+        self.group = group
+        self.field = field
+        self.type = type_name
+
+    def _value(self):
+        values = self.group.values()
+        return None if values is None else values.get(self.field)
+
+    def get(self, suffix):
+        if suffix != (0,):
+            return None
+        value = self._value()
+        return None if value is None else (self.type, value)
+
+    def next(self, suffix):
+        if suffix >= (0,):
+            return None
+        value = self._value()
+        return None if value is None else ((0,), self.type, value)
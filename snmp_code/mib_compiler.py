@@ -0,0 +1,423 @@
+"""
+MIB compiler: MYAGENT-MIB.txt -> compact, versioned binary registry cache.
+
+Parses the SMIv2 subset used by the agent's MIB module (OBJECT IDENTIFIER
+assignments, OBJECT-TYPE with SYNTAX / MAX-ACCESS / INDEX, notifications,
+groups and compliance statements) and resolves every OID. Each OBJECT-TYPE
+becomes one (name, kind, oid, type, access, min, max) record, where kind is
+scalar, table, entry or column and min/max come from the SIZE/range (or
+enumeration) of its SYNTAX.
+
+The result is cached in a small binary file:
+
+    header   magic, cache version, source size, source mtime_ns, sha256(source)
+    payload  marshal((module name, one list per record field))
+
+load_mib() uses the cache when its hash matches the MIB source (hashing is
+skipped when size and mtime are unchanged) and recompiles otherwise, so
+startup never parses ASN.1 unless the MIB was edited.
+
+Usage:
+    python mib_compiler.py MYAGENT-MIB.txt [cache]   # compile, print summary
+    python mib_compiler.py MYAGENT-MIB.txt --json    # myagent_oids.json layout
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import re
+import struct
+import sys
+from collections import namedtuple
+
+from agent_logging import get_logger
+
+log = get_logger('mib')
+
+CACHE_MAGIC = b'MAMIBC1\x00'
+CACHE_VERSION = 1            # bump when the record layout or parsing rules change
+CACHE_HEADER = struct.Struct('<8sIQq32s')
+
+SCALAR, TABLE, ENTRY, COLUMN = 'scalar', 'table', 'entry', 'column'
+
+MibObject = namedtuple('MibObject', 'name kind oid type access min max')
+
+# Well-known roots (SNMPv2-SMI) that a module may hang from
+ROOTS = {
+    'iso': (1,), 'org': (1, 3), 'dod': (1, 3, 6), 'internet': (1, 3, 6, 1),
+    'directory': (1, 3, 6, 1, 1), 'mgmt': (1, 3, 6, 1, 2), 'mib-2': (1, 3, 6, 1, 2, 1),
+    'transmission': (1, 3, 6, 1, 2, 1, 10), 'experimental': (1, 3, 6, 1, 3),
+    'private': (1, 3, 6, 1, 4), 'enterprises': (1, 3, 6, 1, 4, 1),
+    'security': (1, 3, 6, 1, 5), 'snmpV2': (1, 3, 6, 1, 6),
+    'zeroDotZero': (0, 0),
+}
+
+MACROS = {'OBJECT-TYPE', 'MODULE-IDENTITY', 'OBJECT-IDENTITY', 'NOTIFICATION-TYPE',
+          'OBJECT-GROUP', 'NOTIFICATION-GROUP', 'MODULE-COMPLIANCE', 'AGENT-CAPABILITIES'}
+CLAUSES = {'SYNTAX', 'UNITS', 'MAX-ACCESS', 'ACCESS', 'STATUS', 'DESCRIPTION', 'REFERENCE',
+           'INDEX', 'AUGMENTS', 'DEFVAL'}
+
+# SYNTAX base type -> agent type name, default (min, max)
+INT32 = (-2**31, 2**31 - 1)
+UINT32 = (0, 2**32 - 1)
+TYPES = {
+    'DisplayString': ('DisplayString', (0, 255)),
+    'OCTET': ('DisplayString', (0, 65535)),
+    'Integer32': ('Integer32', INT32),
+    'INTEGER': ('Integer32', INT32),
+    'Unsigned32': ('Unsigned32', UINT32),
+    'Gauge32': ('Gauge32', UINT32),
+    'Counter32': ('Counter32', UINT32),
+    'Counter64': ('Counter64', (0, 2**64 - 1)),
+    'TimeTicks': ('TimeTicks', UINT32),
+    'OBJECT': ('ObjectIdentifier', (0, 128)),
+    'IpAddress': ('IpAddress', (4, 4)),
+    # SNMPv2-TC textual conventions over INTEGER
+    'RowStatus': ('Integer32', (1, 6)),
+    'TruthValue': ('Integer32', (1, 2)),
+    'StorageType': ('Integer32', (1, 5)),
+    'TimeStamp': ('TimeTicks', UINT32),
+}
+
+TOKEN_RE = re.compile(r'''
+    (?P<comment>--[^\n]*)
+  | (?P<string>"[^"]*")
+  | (?P<assign>::=)
+  | (?P<range>\.\.)
+  | (?P<word>[A-Za-z][\w-]*|-?\d+)
+  | (?P<punct>[{}(),|;\[\]])
+  | (?P<space>\s+)
+''', re.VERBOSE)
+
+
+def tokenize(text, fname='<mib>'):
+    """[(token, line)] without comments, whitespace or quoted strings' content"""
+    tokens = []
+    line = 1
+    pos = 0
+    while pos < len(text):
+        m = TOKEN_RE.match(text, pos)
+        if m is None:
+            raise ValueError(f"{fname}:{line}: unexpected character {text[pos]!r}")
+        kind = m.lastgroup
+        value = m.group()
+        if kind == 'string':
+            tokens.append(('""', line))      # descriptions are not kept
+        elif kind not in ('comment', 'space'):
+            tokens.append((value, line))
+        line += value.count('\n')
+        pos = m.end()
+    return tokens
+
+
+class Parser:
+    def __init__(self, text, fname='<mib>'):
+        self.fname = fname
+        self.tokens = tokenize(text, fname)
+        self.pos = 0
+        self.module = None
+        self.nodes = {}       # name -> (parent name, arcs tuple)
+        self.types = {}       # OBJECT-TYPE name -> clause dict
+        self.order = []       # OBJECT-TYPE names in source order
+
+    def error(self, message):
+        line = self.tokens[min(self.pos, len(self.tokens) - 1)][1] if self.tokens else 0
+        raise ValueError(f"{self.fname}:{line}: {message}")
+
+    def peek(self, offset=0):
+        i = self.pos + offset
+        return self.tokens[i][0] if i < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if token is None or (expected is not None and token != expected):
+            self.error(f"expected {expected or 'token'}, got {token!r}")
+        self.pos += 1
+        return token
+
+    def skip_braces(self):
+        self.take('{')
+        depth = 1
+        while depth:
+            token = self.take()
+            depth += (token == '{') - (token == '}')
+
+    def parse(self):
+        if self.peek(1) == 'DEFINITIONS':
+            self.module = self.take()
+            while self.take() != 'BEGIN':
+                pass
+        while self.peek() is not None:
+            token = self.peek()
+            if token == 'END':
+                self.pos += 1
+            elif token == 'IMPORTS':
+                while self.take() != ';':
+                    pass
+            elif token[0].isupper() and self.peek(1) == '::=':
+                self.skip_type_assignment()
+            elif token[0].islower() and self.peek(1) == 'OBJECT' and self.peek(2) == 'IDENTIFIER':
+                name = self.take()
+                self.pos += 2
+                self.take('::=')
+                self.nodes[name] = self.oid_value()
+            elif token[0].islower() and self.peek(1) in MACROS:
+                self.macro()
+            else:
+                self.error(f"unexpected {token!r}")
+        return self
+
+    def skip_type_assignment(self):
+        """Type definitions (SEQUENCE for table entries, TCs): nothing to register"""
+        self.pos += 2
+        while self.peek() is not None and self.peek() != 'END':
+            if self.peek() == '{':
+                self.skip_braces()
+                continue
+            if self.peek()[0].islower() and (self.peek(1) in MACROS or self.peek(1) == 'OBJECT'):
+                return
+            if self.peek()[0].isupper() and self.peek(1) == '::=':
+                return
+            self.pos += 1
+
+    def macro(self):
+        name, macro = self.take(), self.take()
+        clauses = {}
+        clause = None
+        while self.peek() != '::=':
+            token = self.peek()
+            if token is None:
+                self.error(f"{name}: missing ::=")
+            if token in CLAUSES:
+                clause = token
+                clauses[clause] = []
+                self.pos += 1
+                continue
+            if token == '{':
+                start = self.pos
+                self.skip_braces()
+                if clause is not None:
+                    clauses[clause].extend(t for t, _ in self.tokens[start:self.pos])
+                continue
+            if clause is not None:
+                clauses[clause].append(token)
+            self.pos += 1
+        self.take('::=')
+        self.nodes[name] = self.oid_value()
+        if macro == 'MODULE-IDENTITY' and self.module is None:
+            self.module = name
+        if macro == 'OBJECT-TYPE':
+            if 'SYNTAX' not in clauses:
+                self.error(f"{name}: OBJECT-TYPE without SYNTAX")
+            self.types[name] = clauses
+            self.order.append(name)
+
+    def oid_value(self):
+        """{ parent arc ... } / { iso org(3) dod(6) ... } -> (parent name or None, arcs)"""
+        self.take('{')
+        parent, arcs = None, []
+        while self.peek() != '}':
+            token = self.take()
+            if token.lstrip('-').isdigit():
+                arcs.append(int(token))
+            elif self.peek() == '(':
+                self.take('(')
+                arcs.append(int(self.take()))
+                self.take(')')
+                if parent is None and not arcs[:-1]:
+                    parent = ''          # named-number form starting at the root
+            elif parent is None and not arcs:
+                parent = token
+            else:
+                self.error(f"bad OID component {token!r}")
+        self.take('}')
+        return parent, tuple(arcs)
+
+
+def resolve(nodes, fname='<mib>'):
+    """name -> absolute OID tuple"""
+    resolved = dict(ROOTS)
+    for name in nodes:
+        chain = []
+        current = name
+        while current not in resolved:
+            if current not in nodes:
+                raise ValueError(f"{fname}: unknown OID parent {current!r} (from {name})")
+            if current in chain:
+                raise ValueError(f"{fname}: OID cycle through {current!r}")
+            chain.append(current)
+            parent, _ = nodes[current]
+            if parent == '':
+                resolved[current] = nodes[current][1]
+                chain.pop()
+                break
+            current = parent
+        for node in reversed(chain):
+            parent, arcs = nodes[node]
+            resolved[node] = (resolved[parent] if parent else ()) + arcs
+    return resolved
+
+
+def syntax_type(tokens):
+    """SYNTAX tokens -> (type name, min, max)"""
+    base = tokens[0]
+    if base not in TYPES:
+        raise ValueError(f"unsupported SYNTAX {base!r}")
+    type_name, (lo, hi) = TYPES[base]
+    rest = tokens[2:] if base in ('OCTET', 'OBJECT') else tokens[1:]
+    if rest[:1] == ['{']:                   # enumeration: { up(1), down(2) }
+        values = [int(t) for t in rest if t.lstrip('-').isdigit()]
+        if values:
+            lo, hi = min(values), max(values)
+    elif rest[:1] == ['(']:                 # (a..b | c..d) or (SIZE (a..b))
+        bounds = [int(t) for t in rest if t.lstrip('-').isdigit()]
+        if bounds:
+            lo, hi = min(bounds), max(bounds)
+    return type_name, lo, hi
+
+
+class CompiledMib:
+    """Column storage: item i of every list describes the same OBJECT-TYPE"""
+
+    def __init__(self, module, columns):
+        self.module = module
+        self.names, self.kinds, self.oids, self.types, self.access, self.mins, self.maxs = columns
+
+    @classmethod
+    def from_objects(cls, module, objects):
+        return cls(module, [list(column) for column in zip(*objects)] or [[]] * len(MibObject._fields))
+
+    def columns(self):
+        return self.names, self.kinds, self.oids, self.types, self.access, self.mins, self.maxs
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def objects(self):
+        return [MibObject(*row) for row in zip(*self.columns())]
+
+    def scalars(self, parents=None):
+        """(name, instance oid, props) of every scalar, for MibRegistry
+
+        parents: only scalars whose OID is a direct child of one of these
+        OIDs (e.g. the groups whose values live in the state store)
+        """
+        parents = set(map(tuple, parents)) if parents is not None else None
+        for name, kind, oid, type_name, access, lo, hi in zip(*self.columns()):
+            if kind != SCALAR or (parents is not None and oid[:-1] not in parents):
+                continue
+            yield name, oid + (0,), {"type": type_name, "access": access, "min": lo, "max": hi}
+
+    def to_dict(self, parents=None):
+        """myagent_oids.json layout"""
+        return {name: {"oid": list(oid), **props} for name, oid, props in self.scalars(parents)}
+
+
+def compile_text(text, fname='<mib>'):
+    parser = Parser(text, fname).parse()
+    oids = resolve(parser.nodes, fname)
+    entries = {name for name, clauses in parser.types.items()
+               if 'INDEX' in clauses or 'AUGMENTS' in clauses}
+    objects = []
+    for name in parser.order:
+        clauses = parser.types[name]
+        # interned: marshal then stores each distinct string once in the cache
+        access = sys.intern(' '.join(clauses.get('MAX-ACCESS') or clauses.get('ACCESS') or ['read-only']))
+        parent = parser.nodes[name][0]
+        if clauses['SYNTAX'][:2] == ['SEQUENCE', 'OF']:
+            kind = TABLE
+        elif name in entries:
+            kind = ENTRY
+        else:
+            kind = COLUMN if parent in entries else SCALAR
+        if kind in (TABLE, ENTRY):
+            type_name, lo, hi = 'Sequence', 0, 0
+        else:
+            try:
+                type_name, lo, hi = syntax_type(clauses['SYNTAX'])
+            except (ValueError, IndexError) as e:
+                raise ValueError(f"{fname}: {name}: {e}") from None
+        objects.append((name, kind, oids[name], type_name, access, lo, hi))
+    return CompiledMib.from_objects(parser.module, objects)
+
+
+def compile_mib(fname):
+    with open(fname, encoding='utf-8') as f:
+        return compile_text(f.read(), fname)
+
+
+# =========================
+# Binary cache
+# =========================
+def write_cache(cache_file, mib, source_stat, digest):
+    payload = marshal.dumps((mib.module, mib.columns()))
+    header = CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, source_stat.st_size,
+                               source_stat.st_mtime_ns, digest)
+    tmp = f'{cache_file}.{os.getpid()}.tmp'      # workers may reload at the same time
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp, cache_file)
+
+
+def read_cache(cache_file):
+    """(size, mtime_ns, sha256, CompiledMib), or None if missing/invalid/other version"""
+    try:
+        with open(cache_file, 'rb') as f:
+            blob = f.read()
+        magic, version, size, mtime_ns, digest = CACHE_HEADER.unpack_from(blob)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            return None
+        module, columns = marshal.loads(blob[CACHE_HEADER.size:])
+        mib = CompiledMib(module, columns)
+    except (OSError, struct.error, ValueError, EOFError, TypeError):
+        return None
+    return size, mtime_ns, digest, mib
+
+
+def load_mib(fname, cache_file):
+    """(CompiledMib, 'cache' | 'compiled'): compile only if the source changed"""
+    st = os.stat(fname)
+    cached = read_cache(cache_file)
+    if cached is not None:
+        size, mtime_ns, digest, mib = cached
+        if (size, mtime_ns) == (st.st_size, st.st_mtime_ns):
+            return mib, 'cache'
+    with open(fname, 'rb') as f:
+        source = f.read()
+    sha = hashlib.sha256(source).digest()
+    if cached is not None and cached[2] == sha:
+        write_cache(cache_file, cached[3], st, sha)    # touched, not edited: refresh stat
+        return cached[3], 'cache'
+    mib = compile_text(source.decode('utf-8'), fname)
+    try:
+        write_cache(cache_file, mib, st, sha)
+    except OSError as e:
+        log.warning("⚠️ No se pudo escribir la caché MIB %s: %s", cache_file, e)
+    log.info("MIB %s compilado: %d objetos", fname, len(mib))
+    return mib, 'compiled'
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    fname = sys.argv[1]
+    if sys.argv[2:3] == ['--json']:
+        print(json.dumps(compile_mib(fname).to_dict(), indent=2))
+        return
+    cache_file = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(fname)[0] + '.cache'
+    mib, how = load_mib(fname, cache_file)
+    kinds = {}
+    for obj in mib.objects:
+        kinds[obj.kind] = kinds.get(obj.kind, 0) + 1
+    print(f"{mib.module}: {len(mib)} objects {kinds} ({how}, {cache_file})")
+    for obj in mib.objects:
+        print(f"  {'.'.join(map(str, obj.oid)):<32} {obj.name:<28} {obj.kind:<7} "
+              f"{obj.type:<16} {obj.access:<12} {obj.min}..{obj.max}")
+
+
+if __name__ == "__main__":
+    main()
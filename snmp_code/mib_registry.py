@@ -0,0 +1,253 @@
+"""
+MIB registry for the mini SNMP agent.
+
+Keeps every managed OID in a sorted array (tuples compare arc by arc, which is
+exactly SNMP lexicographic order) plus two hash maps:
+
+- exact lookup  (oid  -> name)       O(1)
+- successor     (GETNEXT)            O(log n) via bisect
+- subtree range (all OIDs under X)   O(log n + k) via two bisects
+
+It replaces the old NAME_MAP / OID_PROPS / SORTED_OIDS trio, so a full walk of
+n objects costs O(n log n) instead of O(n^2).
+
+Besides scalars, whole subtrees can be mounted with a provider object that
+serves them dynamically (conceptual tables, agent statistics...). A provider
+implements:
+
+    get(suffix)  -> (type name, value) or None
+    next(suffix) -> (suffix, type name, value) of the first instance after
+                    suffix, or None when the subtree is exhausted
+
+where suffix is the part of the OID below the mount prefix. The mount prefix
+sits in the sorted array like any scalar, so ordering stays O(log n).
+
+Scalar definitions can be replaced while the agent runs (hot reload):
+prepare_update() diffs a new definition set against the current one off the
+event loop, without copying the registry. swap() then splices a small diff
+into the live structures on the event loop thread (O(k log n) for k changed
+entries), or installs structures rebuilt off the loop when a large part of
+the MIB changed. Either way a request never sees a half applied update.
+"""
+
+import json
+from bisect import bisect_left, bisect_right, insort
+
+RESORT_FRACTION = 8     # more than 1/8 of the entries changed: sort again instead of patching
+
+
+class RegistryUpdate:
+    """Diff for MibRegistry.swap(), plus rebuilt structures when it is large"""
+    __slots__ = ("added", "removed", "changed", "structures", "base", "moved", "fresh")
+
+    def __init__(self, added, removed, changed, structures, base, moved=(), fresh=()):
+        self.added = added          # {name: (oid, props)}
+        self.removed = removed      # {name: old oid}
+        self.changed = changed      # {name: (oid, props)} (OID and/or props differ)
+        self.structures = structures  # rebuilt lookup structures, or None: splice the diff
+        self.base = base            # registry version it was computed from
+        self.moved = moved          # old OIDs leaving the sorted array
+        self.fresh = fresh          # new OIDs entering it
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def oids(self):
+        """Every OID whose meaning changes (old and new positions)"""
+        oids = set(self.removed.values())
+        oids.update(oid for oid, _ in self.added.values())
+        oids.update(oid for oid, _ in self.changed.values())
+        return oids
+
+
+class MibRegistry:
+    def __init__(self, definitions=None):
+        """definitions: iterable of (name, oid, props) tuples"""
+        self._names = {}    # oid tuple -> name
+        self._props = {}    # name -> props dict (type, access, min, max, ...)
+        self._oids = {}     # name -> oid tuple
+        self._sorted = []   # sorted oid tuples (scalars + mount prefixes)
+        self._mounts = {}   # mount prefix -> provider
+        self._version = 0   # bumped by every mutation, checked by swap()
+        if definitions:
+            for name, oid, props in definitions:
+                oid = tuple(oid)
+                self._names[oid] = name
+                self._props[name] = props
+                self._oids[name] = oid
+            self._sorted = sorted(self._names)
+
+    @classmethod
+    def from_dict(cls, oids):
+        """Build from the myagent_oids.json layout: {name: {"oid": [...], ...}}"""
+        return cls((name, props["oid"], props) for name, props in oids.items())
+
+    @classmethod
+    def from_json(cls, fname):
+        with open(fname) as f:
+            return cls.from_dict(json.load(f))
+
+    # ---- mutation ----
+    def add(self, name, oid, props):
+        oid = tuple(oid)
+        if oid in self._names or self.find_mount(oid):
+            raise ValueError(f"OID {oid} already registered")
+        self._names[oid] = name
+        self._props[name] = props
+        self._oids[name] = oid
+        insort(self._sorted, oid)
+        self._version += 1
+
+    def mount(self, prefix, provider):
+        """Serve every OID under prefix from provider (see module docstring)"""
+        prefix = tuple(prefix)
+        if self.find_mount(prefix) or self.subtree(prefix):
+            raise ValueError(f"Subtree {prefix} overlaps registered OIDs")
+        self._mounts[prefix] = provider
+        insort(self._sorted, prefix)
+        self._version += 1
+
+    # ---- exact lookups ----
+    def __len__(self):
+        return len(self._sorted)
+
+    def __contains__(self, oid_tuple):
+        return oid_tuple in self._names
+
+    def __iter__(self):
+        return iter(self._sorted)
+
+    def name(self, oid_tuple):
+        """Name registered at exactly oid_tuple, or None"""
+        return self._names.get(oid_tuple)
+
+    def props(self, name):
+        return self._props[name]
+
+    def oid(self, name):
+        return self._oids[name]
+
+    def names(self):
+        return self._props.keys()
+
+    def mount_at(self, prefix):
+        """Provider mounted exactly at prefix, or None"""
+        return self._mounts.get(prefix)
+
+    def find_mount(self, oid_tuple):
+        """(prefix, provider) of the mounted subtree containing oid_tuple, or None"""
+        if not self._mounts:
+            return None
+        # Nothing else can sort between a mount prefix and an OID below it
+        idx = bisect_right(self._sorted, oid_tuple) - 1
+        if idx >= 0:
+            prefix = self._sorted[idx]
+            provider = self._mounts.get(prefix)
+            if provider is not None and oid_tuple[:len(prefix)] == prefix:
+                return prefix, provider
+        return None
+
+    @property
+    def has_mounts(self):
+        return bool(self._mounts)
+
+    # ---- hot reload ----
+    def prepare_update(self, definitions):
+        """
+        RegistryUpdate replacing every scalar with `definitions` ((name, oid,
+        props) tuples); mounts are kept. Safe to run in a worker thread: it
+        only reads the current structures. Raises ValueError on duplicate or
+        overlapping OIDs.
+        """
+        names, props, oids = self._names, self._props, self._oids
+        added, changed, seen = {}, {}, set()
+        for name, oid, p in definitions:
+            oid = tuple(oid)
+            seen.add(name)
+            old = oids.get(name)
+            if old is None:
+                added[name] = (oid, p)
+            elif old != oid or props[name] != p:
+                changed[name] = (oid, p)
+        removed = {name: oids[name] for name in oids.keys() - seen}
+        if not (added or removed or changed):
+            return RegistryUpdate(added, removed, changed, None, self._version)
+
+        moved = [oids[name] for name in removed] + \
+                [oids[name] for name, (oid, _) in changed.items() if oids[name] != oid]
+        vacated = set(moved)
+        claimed = {}         # new oid -> name, to catch duplicates inside definitions
+        fresh = []
+        for name, (oid, _) in list(added.items()) + list(changed.items()):
+            owner = claimed.get(oid)
+            if owner is None and oid not in vacated:
+                owner = names.get(oid)
+            if owner is not None and owner != name:
+                raise ValueError(f"OID {oid} of {name} already registered to {owner}")
+            if self.find_mount(oid) is not None:
+                raise ValueError(f"OID {oid} of {name} lies in a mounted subtree")
+            claimed[oid] = name
+            if names.get(oid) != name:
+                fresh.append(oid)
+
+        structures = None
+        if len(moved) + len(fresh) > len(self._sorted) // RESORT_FRACTION:
+            # Large change: build fresh structures, swap() just assigns them
+            names, props, oids = dict(names), dict(props), dict(oids)
+            self._apply_delta(names, props, oids, None, removed, moved, added, changed)
+            structures = (names, props, oids, sorted(list(names) + list(self._mounts)))
+        return RegistryUpdate(added, removed, changed, structures, self._version,
+                              moved, fresh)
+
+    def swap(self, update):
+        """
+        Install a prepared update (call from the event loop thread). A small
+        update is spliced into the live structures: O(k log n) dict and
+        bisect operations plus the list shifts, no copy of the registry.
+        Requests run on the same thread, so none sees it half applied.
+        """
+        if update.base != self._version:
+            raise ValueError("registry changed since the update was prepared")
+        if update.structures is not None:
+            self._names, self._props, self._oids, self._sorted = update.structures
+        elif update:
+            self._apply_delta(self._names, self._props, self._oids, self._sorted,
+                              update.removed, update.moved, update.added, update.changed)
+            for oid in update.fresh:
+                insort(self._sorted, oid)
+        self._version += 1
+
+    @staticmethod
+    def _apply_delta(names, props, oids, sorted_oids, removed, moved, added, changed):
+        for oid in moved:
+            del names[oid]
+            if sorted_oids is not None:
+                del sorted_oids[bisect_left(sorted_oids, oid)]
+        for name in removed:
+            del props[name], oids[name]
+        for name, (oid, p) in list(added.items()) + list(changed.items()):
+            names[oid] = name
+            props[name] = p
+            oids[name] = oid
+
+    # ---- ordered queries ----
+    def next_oid(self, oid_tuple):
+        """Lexicographic successor entry (scalar or mount prefix), or None at end of MIB"""
+        idx = bisect_right(self._sorted, oid_tuple)
+        if idx < len(self._sorted):
+            return self._sorted[idx]
+        return None
+
+    def successors(self, oid_tuple, count):
+        """Up to `count` consecutive successors of oid_tuple"""
+        idx = bisect_right(self._sorted, oid_tuple)
+        return self._sorted[idx:idx + count]
+
+    def subtree(self, prefix):
+        """All registered OIDs (and mount prefixes) that start with prefix, in order"""
+        prefix = tuple(prefix)
+        lo = bisect_left(self._sorted, prefix)
+        if not prefix:
+            return self._sorted[lo:]
+        hi = bisect_left(self._sorted, prefix[:-1] + (prefix[-1] + 1,), lo)
+        return self._sorted[lo:hi]
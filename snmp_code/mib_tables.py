@@ -0,0 +1,138 @@
+"""
+Conceptual tables served straight from column storage.
+
+ColumnarTable is a MibRegistry subtree provider for a table mounted at its
+xxxTable OID. Instances are (1 = entry, column, *index): cells are read from
+per-column sequences (array.array, list...) or accessor callables by row
+position. There are no per-row dicts. GET is a dict lookup plus an index;
+GETNEXT/GETBULK walks column by column using bisect over the sorted row
+indexes.
+
+ScalarGroup serves a small subtree of scalars (arc.0, read through getter
+callables) mixed with tables mounted at other arcs.
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+class Column:
+    __slots__ = ("col_id", "type", "read")
+
+    def __init__(self, col_id, type_name, values):
+        self.col_id = col_id
+        self.type = type_name
+        # sequence indexed by row position, or callable(row position) -> value
+        self.read = values if callable(values) else values.__getitem__
+
+
+class ColumnarTable:
+    def __init__(self, columns, indexes=()):
+        """
+        columns: iterable of (column id, type name, values-or-accessor)
+        indexes: one index tuple per row, in row-position order
+        """
+        self._columns = {}
+        for col_id, type_name, values in columns:
+            self._columns[col_id] = Column(col_id, type_name, values)
+        self._col_ids = sorted(self._columns)
+        self.set_rows(indexes)
+
+    def set_rows(self, indexes):
+        """Replace the row set (row position i has index tuple indexes[i])"""
+        indexes = [tuple(i) for i in indexes]
+        order = sorted(range(len(indexes)), key=indexes.__getitem__)
+        self._sorted_indexes = [indexes[i] for i in order]
+        self._sorted_rows = order              # sorted position -> row position
+        self._row_of = {idx: row for row, idx in enumerate(indexes)}
+
+    def append_row(self, index):
+        """Add a row at the next row position: O(1) when index sorts last"""
+        index = tuple(index)
+        if self._sorted_indexes and index <= self._sorted_indexes[-1]:
+            self.set_rows(self._sorted_indexes_by_row() + [index])
+            return
+        self._row_of[index] = len(self._sorted_indexes)
+        self._sorted_rows.append(len(self._sorted_indexes))
+        self._sorted_indexes.append(index)
+
+    def _sorted_indexes_by_row(self):
+        indexes = [None] * len(self._sorted_rows)
+        for si, row in enumerate(self._sorted_rows):
+            indexes[row] = self._sorted_indexes[si]
+        return indexes
+
+    def __len__(self):
+        return len(self._sorted_indexes)
+
+    def get(self, suffix):
+        if len(suffix) < 3 or suffix[0] != 1:
+            return None
+        column = self._columns.get(suffix[1])
+        if column is None:
+            return None
+        row = self._row_of.get(suffix[2:])
+        if row is None:
+            return None
+        return column.type, column.read(row)
+
+    def _cell(self, ci, si):
+        column = self._columns[self._col_ids[ci]]
+        index = self._sorted_indexes[si]
+        return (1, column.col_id) + index, column.type, column.read(self._sorted_rows[si])
+
+    def next(self, suffix):
+        if not self._sorted_indexes or not self._col_ids:
+            return None
+        if len(suffix) < 2 or suffix[0] < 1:
+            if suffix[:1] > (1,):
+                return None
+            return self._cell(0, 0)
+        if suffix[0] > 1:
+            return None
+        ci = bisect_left(self._col_ids, suffix[1])
+        if ci < len(self._col_ids) and self._col_ids[ci] == suffix[1]:
+            si = bisect_right(self._sorted_indexes, suffix[2:])
+            if si < len(self._sorted_indexes):
+                return self._cell(ci, si)
+            ci += 1
+        if ci < len(self._col_ids):
+            return self._cell(ci, 0)
+        return None
+
+
+class ScalarGroup:
+    def __init__(self, scalars, tables=None):
+        """
+        scalars: {arc: (type name, getter() -> value or None)}  served at arc.0
+        tables:  {arc: provider}  (ColumnarTable...) served below arc
+        """
+        self._scalars = dict(scalars)
+        self._tables = dict(tables or {})
+        self._arcs = sorted(set(self._scalars) | set(self._tables))
+
+    def get(self, suffix):
+        if not suffix:
+            return None
+        table = self._tables.get(suffix[0])
+        if table is not None:
+            return table.get(suffix[1:])
+        scalar = self._scalars.get(suffix[0])
+        if scalar is None or suffix[1:] != (0,):
+            return None
+        value = scalar[1]()
+        return None if value is None else (scalar[0], value)
+
+    def next(self, suffix):
+        start = bisect_left(self._arcs, suffix[0]) if suffix else 0
+        for arc in self._arcs[start:]:
+            table = self._tables.get(arc)
+            if table is not None:
+                found = table.next(suffix[1:] if suffix[:1] == (arc,) else ())
+                if found is not None:
+                    return ((arc,) + found[0], found[1], found[2])
+            elif (arc, 0) > suffix:
+                type_name, getter = self._scalars[arc]
+                value = getter()
+                if value is not None:
+                    return (arc, 0), type_name, value
+        return None
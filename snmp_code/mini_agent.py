@@ -9,6 +9,8 @@ import asyncio, psutil, time, smtplib
 from email.mime.text import MIMEText
 from pysnmp.hlapi.asyncio import *
 
+from mib_registry import MibRegistry
+
 # --- Configuración SNMP Engine ---
 snmpEngine = SnmpEngine()
 
@@ -24,7 +26,7 @@ scalars = {}
 for name, props in json_data['scalars'].items():
     props['oid'] = tuple(int(x) for x in props['oid'].split('.'))
     scalars[name] = props
-sorted_oids = sorted([props['oid'] for props in scalars.values()])
+registry = MibRegistry((name, props['oid'], props) for name, props in scalars.items())
 
 def py_to_snmp_type(value, type_snmp):
     if type_snmp == "DisplayString":
@@ -34,10 +36,7 @@ def py_to_snmp_type(value, type_snmp):
     return value
 
 def oid_tuple_to_scalar(oid_tuple):
-    for obj, info in scalars.items():
-        if info["oid"] == oid_tuple:
-            return obj
-    return None
+    return registry.name(oid_tuple)
 
 class Store:
     def get_exact(self, oid_tuple):
@@ -51,13 +50,13 @@ class Store:
             return False, None
 
     def get_next(self, oid_tuple):
-        for soid in sorted_oids:
-            if soid > oid_tuple:
-                obj = oid_tuple_to_scalar(soid)
-                value_py = scalars[obj]['value']
-                type_snmp = scalars[obj]['type']
-                value_snmp = py_to_snmp_type(value_py, type_snmp)
-                return True, soid, value_snmp
+        soid = registry.next_oid(oid_tuple)
+        if soid is not None:
+            obj = oid_tuple_to_scalar(soid)
+            value_py = scalars[obj]['value']
+            type_snmp = scalars[obj]['type']
+            value_snmp = py_to_snmp_type(value_py, type_snmp)
+            return True, soid, value_snmp
         return False, oid_tuple, None
 
     def validate_set(self, oid_tuple, val, community_name="public"):
@@ -179,6 +178,18 @@ def send_email_alert(cpu, threshold, to_addr):
     except Exception as e:
         print(f"❌ Error email: {e}")
 
+# --- Traps en segundo plano (acotadas) ---
+MAX_PENDING_TRAPS = 8
+pending_traps = set()   # referencias a las tareas: el loop solo guarda referencias débiles
+
+def schedule_trap(snmpEngine, cpu, threshold, manager, managerEmail):
+    if len(pending_traps) >= MAX_PENDING_TRAPS:
+        print(f"⚠️ Trap descartada: {len(pending_traps)} envíos pendientes")
+        return
+    task = asyncio.ensure_future(send_trap(snmpEngine, cpu, threshold, manager, managerEmail))
+    pending_traps.add(task)
+    task.add_done_callback(pending_traps.discard)
+
 async def send_trap(snmpEngine, cpu, threshold, manager, managerEmail):
     errorIndication = await sendNotification(
         snmpEngine,
@@ -214,7 +225,8 @@ async def cpusampler(store, snmpEngine):
 
         over = cpu > threshold
         if over and not lastover:
-            await send_trap(snmpEngine, cpu, threshold, manager, managerEmail)
+            # No esperar al envío: el muestreo no se bloquea por la red
+            schedule_trap(snmpEngine, cpu, threshold, manager, managerEmail)
             send_email_alert(cpu, threshold, managerEmail)
         lastover = over
 
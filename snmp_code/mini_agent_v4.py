@@ -6,15 +6,26 @@ Mini SNMP Agent - Python 3.13 + PySNMP 7.1.22
 - Gmail SMTP email notification on threshold crossing
 - SNMP Trap notification on threshold crossing
 - No dependency on acInfo in handlers (compatible with 7.x)
+
+Importing this module has no side effects: create_agent() builds the agent
+(files, registry, engine, UDP socket...) and main() is the CLI entry point:
+
+    python mini_agent_v4.py --port 1161 --read-community public
+    python mini_agent_v4.py --help
+
+psutil, smtplib/email and the optional backends (shared memory, journal,
+BER fast path, worker processes) are imported only when used.
 """
 
+import argparse
 import json
 import os
+import signal
+import sys
 import time
-import psutil
 import asyncio
-import smtplib
-from email.mime.text import MIMEText
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 # PySNMP 7.1.22
 from pysnmp.entity import engine, config
@@ -22,6 +33,22 @@ from pysnmp.entity.rfc3413 import cmdrsp, context
 from pysnmp.carrier.asyncio.dgram import udp
 from pysnmp.proto import rfc1902, rfc1905
 from pysnmp.proto.api import v2c
+from pyasn1.codec.ber import decoder, encoder
+
+from mib_registry import MibRegistry
+from mib_compiler import load_mib
+from persistence import WriteBehindWriter
+from notify_email import EmailNotifier
+from notify_trap import TrapOriginator, InformOriginator
+from agent_logging import DEBUG, get_logger, setup_logging
+from cpu_cores import CpuCores
+from cpu_history import CpuHistory
+from collectors import CollectorScheduler
+from lazy_values import LazyGroup, StaleValue, allow_stale
+from alarms import (AlarmTable, STATE_KEY as ALARMS_KEY, RISING, ACTION_TRAP, ACTION_EMAIL,
+                    ACTION_BOTH, oid_str)
+from agent_metrics import AgentMetrics, H_GET, H_GETNEXT, H_GETBULK, H_SET, H_SAMPLER, now_ns
+from shared_state import StateHub, StateReplica, reuseport_socket
 
 import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -30,11 +57,97 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 OctetString = rfc1902.OctetString
 Integer = rfc1902.Integer32
 ObjectIdentifier = rfc1902.ObjectIdentifier
+COUNTER64_TAGSET = rfc1902.Counter64.tagSet
+
+NUMERIC_TYPES = {
+    "Integer32": Integer,
+    "Counter32": rfc1902.Counter32,
+    "Counter64": rfc1902.Counter64,
+    "Gauge32": rfc1902.Gauge32,
+    "Unsigned32": rfc1902.Unsigned32,
+    "TimeTicks": rfc1902.TimeTicks,
+}
+
+def to_snmp_value(type_name, value):
+    """Python value from the store/providers -> pyasn1 object of the MIB type"""
+    if type_name == "DisplayString":
+        return OctetString("" if value is None else str(value))
+    if type_name == "ObjectIdentifier":
+        return ObjectIdentifier(value or (0, 0))
+    try:
+        value = 0 if value is None else int(value)
+    except Exception:
+        value = 0
+    if type_name == "Counter32":
+        value &= 0xFFFFFFFF          # counters wrap
+    elif type_name == "Counter64":
+        value &= 0xFFFFFFFFFFFFFFFF
+    elif type_name in ("Gauge32", "Unsigned32", "TimeTicks"):
+        value = max(0, min(value, 0xFFFFFFFF))  # gauges latch at the maximum
+    return NUMERIC_TYPES.get(type_name, Integer)(value)
+
+def value_fits(props, value):
+    """Stored python value valid for an object definition (type and min/max)"""
+    if props["type"] == "DisplayString":
+        return isinstance(value, str) and props.get("min", 0) <= len(value) <= props.get("max", 255)
+    if props["type"] in NUMERIC_TYPES:
+        return (isinstance(value, int) and not isinstance(value, bool)
+                and props.get("min", value) <= value <= props.get("max", value))
+    return True
+
+# =========================
+# Logging (per-component levels; override with MINI_AGENT_LOG="agent.get=DEBUG,...")
+# =========================
+LOG_FORMAT = 'text'   # 'text' or 'json'
+LOG_LEVELS = {
+    'agent': 'INFO',
+    'agent.store': 'INFO',
+    'agent.get': 'INFO',
+    'agent.getnext': 'INFO',
+    'agent.getbulk': 'INFO',
+    'agent.set': 'INFO',
+    'agent.sampler': 'INFO',
+    'agent.notify': 'INFO',
+    'agent.persist': 'INFO',
+}
+log = get_logger('')
+log_store = get_logger('store')
+log_get = get_logger('get')
+log_getnext = get_logger('getnext')
+log_getbulk = get_logger('getbulk')
+log_set = get_logger('set')
+log_sampler = get_logger('sampler')
+log_notify = get_logger('notify')
+
+# =========================
+# Network, communities and sampling (CLI options override these)
+# =========================
+# Prefer high port in dev; 161 needs admin/root (MINI_AGENT_HOST/MINI_AGENT_PORT override)
+AGENT_HOST = os.environ.get('MINI_AGENT_HOST', '127.0.0.1')
+AGENT_PORT = int(os.environ.get('MINI_AGENT_PORT', '161'))
+# Community strings; they map to the securityNames 'public' (read view) and
+# 'private' (read + write view) used by VACM and JsonSet
+READ_COMMUNITY = 'public'
+WRITE_COMMUNITY = 'private'
+SAMPLE_INTERVAL = 5.0   # seconds between CPU samples
+
+# =========================
+# SNMPv3 (USM)
+# =========================
+# user -> (auth protocol, auth passphrase, priv protocol, priv passphrase, 'ro' | 'rw')
+#   auth: none, md5, sha, sha224, sha256, sha384, sha512
+#   priv: none, des, aes, aes192, aes256
+V3_USERS = {
+    # 'admin': ('sha', 'cambia-esta-clave', 'aes', 'cambia-esta-otra', 'rw'),
+}
+ENGINE_ID = ''   # snmpEngineID in hex; '' = derived from the enterprise and AGENT_HOST:AGENT_PORT
+ENGINE_BOOTS = int(os.environ.get('MINI_AGENT_ENGINE_BOOTS', '0'))   # set by the hub for its workers
+USM_KEY_CACHE = 'usm_keys.json'   # localized keys per engineID (mode 0600)
 
 # =========================
 # Agent uptime tracking
 # =========================
-AGENT_START = time.time()
+AGENT_START = time.time()   # reset by create_agent()
 
 def sys_uptime_ticks() -> int:
     """Devuelve el uptime del agente en TimeTicks (centésimas de segundo)"""
@@ -48,6 +161,25 @@ SMTP_PORT = 587
 # Configure your email if you want alerts
 SENDER_EMAIL = '740540.practicas@gmail.com'  # ← PUT YOUR GMAIL ADDRESS HERE
 SENDER_PASS = 'hcpq sfgt dojo zwbx'  # 16-char App Password
+SMTP_STARTTLS = True
+SMTP_TIMEOUT = 10
+# Async pipeline: bounded queue + worker pool, each worker reuses one SMTP session
+EMAIL_WORKERS = 2
+EMAIL_QUEUE_SIZE = 100
+EMAIL_MAX_RETRIES = 3
+EMAIL_BACKOFF = 1.0  # seconds, doubled on every retry
+
+# =========================
+# SNMP Trap configuration
+# =========================
+TRAP_TARGETS = [('127.0.0.1', 162)]  # (host, port) of the trap receivers
+TRAP_SECURITY_NAME = 'public'         # v2c securityName -> READ_COMMUNITY used for traps
+TRAP_QUEUE_SIZE = 256
+# 'trap' = fire-and-forget; 'inform' = acknowledged, retransmitted by the agent
+NOTIFY_MODE = 'trap'
+INFORM_TIMEOUT = 1.5        # seconds before each retransmission
+INFORM_RETRIES = 3
+INFORM_MAX_INFLIGHT = 32    # outstanding informs per target
 
 # =========================
 # Files and OIDs
@@ -56,6 +188,101 @@ STATE_FILE = 'mib_state.json'
 OIDS_FILE = 'myagent_oids.json'
 ENTERPRISE_OID = 28308
 
+# OID definitions come from MYAGENT-MIB.txt, compiled by mib_compiler.py into a
+# binary cache that is rebuilt only when the MIB changes (content hash). Only
+# the scalars under MIB_STORE_GROUPS are kept in STATE_FILE; tables and the
+# other groups are served by providers. Without the MIB the agent falls back
+# to OIDS_FILE.
+MIB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'MYAGENT-MIB.txt')
+MIB_CACHE = 'MYAGENT-MIB.cache'
+MIB_STORE_GROUPS = [(1, 3, 6, 1, 4, 1, ENTERPRISE_OID, 1)]   # cpuObjects
+
+# Hot reload of the definitions (MIB_FILE, or OIDS_FILE without it): on SIGHUP
+# or when the file changes, a new registry is built off the event loop,
+# validated against the current state and swapped in while requests go on.
+RELOAD_WATCH_INTERVAL = 2.0   # seconds between file checks (0 = SIGHUP only)
+
+# Persistence policy (durability vs throughput):
+#   'always'   -> rewrite mib_state.json after every change (safest)
+#   'interval' -> coalesce changes, flush every PERSIST_INTERVAL s or PERSIST_MAX_PENDING changes
+#   'shutdown' -> only flush when the agent stops (fastest)
+PERSIST_POLICY = 'interval'
+PERSIST_INTERVAL = 2.0
+PERSIST_MAX_PENDING = 64
+
+# State backend:
+#   'json'    -> mib_state.json rewritten by the write-behind writer
+#   'journal' -> append-only journal + binary snapshot; mib_state.json kept as a JSON export
+STATE_BACKEND = 'json'
+SNAPSHOT_FILE = 'mib_state.snap'
+JOURNAL_FILE = 'mib_state.journal'
+COMPACT_INTERVAL = 60.0
+COMPACT_MAX_LOG_BYTES = 1 << 20
+
+# Pre-encoded BER fast path for single/few-varbind scalar GETs (bypasses pyasn1)
+FASTPATH_ENABLED = False
+FASTPATH_VERIFY = True   # compare each freshly built response with the normal path
+
+# Retransmission cache: a duplicate request (same source, community/user,
+# request-id and PDU) within the window gets the first response again
+RESPONSE_CACHE_WINDOW = 5.0          # seconds (0 = disabled)
+RESPONSE_CACHE_IN_FLIGHT = 0.5       # seconds a request with no response yet holds back its duplicates
+RESPONSE_CACHE_MAX_ENTRIES = 4096
+RESPONSE_CACHE_MAX_BYTES = 8 << 20
+
+# Admission control, checked on every datagram before anything else: token
+# buckets per source IP and per community / v3 user (requests/s and burst;
+# rate 0 = unlimited) and, while the dispatcher loop stays busier than
+# ADMISSION_SHED_ABOVE (0 = never) for ADMISSION_SHED_AFTER intervals,
+# GETNEXT/GETBULK from the sources over their fair share are shed to keep the rest going
+ADMISSION_SOURCE_RATE = 500.0
+ADMISSION_SOURCE_BURST = 1000
+ADMISSION_COMMUNITY_RATE = 2000.0
+ADMISSION_COMMUNITY_BURST = 4000
+ADMISSION_SHED_ABOVE = 0.9
+ADMISSION_RECOVER_BELOW = 0.7
+ADMISSION_SHED_AFTER = 3     # consecutive intervals over ADMISSION_SHED_ABOVE before shedding
+ADMISSION_INTERVAL = 0.5     # seconds between utilization checks
+ADMISSION_MAX_SOURCES = 10000
+
+# Multi-process mode: N processes bind the UDP port with SO_REUSEPORT and the
+# kernel spreads requests across them. The hub (this process) keeps the sampler,
+# persistence, notifications and applies every SET; workers serve a replica.
+WORKERS = int(os.environ.get('MINI_AGENT_WORKERS', '1'))
+WORKER_ID = int(os.environ.get('MINI_AGENT_WORKER_ID', '0'))  # 0 = hub / single process
+HUB_SOCKET = os.environ.get('MINI_AGENT_HUB', '')            # default: <tmp>/mini-agent-<port>.sock
+WORKER_START_TIMEOUT = 30.0
+
+# Shared-memory state (shm_state.py): values live in a seqlock-protected
+# segment with one fixed-width slot per OID. The hub / single process is the
+# only writer; workers and sidecars (python shm_state.py <name>) read it
+# without IPC. '' = plain dict in each process.
+SHM_SEGMENT = os.environ.get('MINI_AGENT_SHM', '')
+
+# GETBULK limits (keep responses well below the UDP/msgMaxSize limit)
+BULK_MAX_REPETITIONS = 64
+BULK_MAX_VARBINDS = 256
+
+# Host resources (hostObjects, 1.3.6.1.4.1.28308.5) are collected lazily: only
+# when a request touches them, cached per provider for its TTL. Collectors that
+# may block run in a thread pool and the response waits for them.
+LAZY_THREADS = 4
+LAZY_MAX_ROUNDS = 3          # deferred rebuilds before answering with the last values
+HOST_DISK_PATH = '/'
+HOST_TTL = {"memory": 2.0, "load": 5.0, "disk": 30.0, "processes": 10.0}
+
+# Sampler collectors (collectors.py): blocking reads (psutil, /proc, statvfs) run
+# in a bounded pool and their results are published to the store on the loop.
+# Collectors registered with process=True use a process pool when
+# COLLECTOR_PROCESSES > 0 (threads otherwise).
+COLLECTOR_THREADS = 4
+COLLECTOR_PROCESSES = 0
+COLLECTOR_TIMEOUT = 2.0      # seconds; a slower collection is dropped for that tick
+
+# RMON-style alarm table (alarms.py), evaluated by the sampler every tick
+ALARM_MAX_ROWS = 10000
+ALARM_BATCH = 1000           # rules evaluated between yields to the dispatcher
+
 DEFAULT_OIDS = {
     "manager": {
         "oid": [1, 3, 6, 1, 4, 1, ENTERPRISE_OID, 1, 1, 0],
@@ -91,7 +318,7 @@ def check_and_create_json(fname, default):
     if not os.path.exists(fname):
         with open(fname, 'w') as f:
             json.dump(default, f, indent=2)
-        print(f"✅ Created {fname}")
+        log.info("✅ Created %s", fname)
 
 default_state = {
     "manager": "Admin",
@@ -100,69 +327,150 @@ default_state = {
     "cpuThreshold": 80
 }
 
-check_and_create_json(STATE_FILE, default_state)
-check_and_create_json(OIDS_FILE, DEFAULT_OIDS)
-
-def load_oids():
+def load_definitions():
+    """([(name, oid, props)], source file, 'cache'|'compiled'|'json')"""
+    if os.path.exists(MIB_FILE):
+        mib, how = load_mib(MIB_FILE, MIB_CACHE)
+        return list(mib.scalars(MIB_STORE_GROUPS)), MIB_FILE, how
+    check_and_create_json(OIDS_FILE, DEFAULT_OIDS)
     with open(OIDS_FILE) as f:
         oids = json.load(f)
-    name_map = {tuple(v["oid"]): k for k, v in oids.items()}
-    oid_props = {k: v for k, v in oids.items()}
-    sorted_oids = sorted([tuple(v["oid"]) for v in oids.values()])
-    return name_map, oid_props, sorted_oids
+    return [(name, props["oid"], props) for name, props in oids.items()], OIDS_FILE, 'json'
+
+REGISTRY = DEFINITIONS_FILE = None   # set by load_registry()
 
-NAME_MAP, OID_PROPS, SORTED_OIDS = load_oids()
-print("DEBUG NAME_MAP:", NAME_MAP) # Prints para comprobar que NAME_MAP no está vacío
-print("DEBUG SORTED_OIDS:", SORTED_OIDS)
+def load_registry():
+    """Create the state file if missing and build REGISTRY from the OID definitions"""
+    global REGISTRY, DEFINITIONS_FILE
+    check_and_create_json(STATE_FILE, default_state)
+    t0 = time.perf_counter()
+    definitions, DEFINITIONS_FILE, how = load_definitions()
+    REGISTRY = MibRegistry(definitions)
+    log_store.info("Registro MIB: %d OIDs de %s (%s, %.1f ms)", len(REGISTRY),
+                   os.path.basename(DEFINITIONS_FILE), how, (time.perf_counter() - t0) * 1000)
+    if log_store.isEnabledFor(DEBUG):
+        log_store.debug("OIDs ordenados: %s", list(REGISTRY))
 
 class JsonStore:
-    def __init__(self, fname):
+    def __init__(self, fname, registry, writer=None, segment=None):
         self.fname = fname
+        self.registry = registry
+        self.writer = writer or WriteBehindWriter(fname)
+        self.segment = segment   # SharedSegment backing `data`, if any
+        # Ready-made SNMP objects per OID; dropped only when that OID changes
+        self._value_cache = {}
+        self.fastpath = None     # BerFastPath with pre-encoded varbinds, if enabled
+        self.listeners = []      # callables(values dict) run after every change
+        self.extra_keys = set()  # non-scalar state entries (alarm rows...), replicated too
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.load()
 
     def load(self):
-        with open(self.fname) as f:
-            self.data = json.load(f)
+        data = self.writer.load()
+        if self.segment is not None:
+            from shm_state import SharedData
+            data = SharedData(self.segment, data)
+        self.data = data
+        self._value_cache.clear()
+        if self.fastpath is not None:
+            self.fastpath.clear()
 
-    def save(self):
-        with open(self.fname, 'w') as f:
-            json.dump(self.data, f, indent=2)
+    def _invalidate(self, name):
+        oid_tuple = self.registry.oid(name)
+        self._value_cache.pop(oid_tuple, None)
+        if self.fastpath is not None:
+            self.fastpath.invalidate(oid_tuple)
+
+    def raw_value(self, oid_tuple):
+        """(type, python value) for the BER fast path, or None if unknown"""
+        name = self.registry.name(oid_tuple)
+        if name is None:
+            return None
+        return self.registry.props(name)["type"], self.data.get(name)
+
+    def save(self, name=None):
+        """
+        Mark state (or just `name`, or one (name, sub-key) entry of a nested
+        dict) dirty; the writer decides when to hit disk
+        """
+        self.writer.mark_dirty(self.data, name)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+        if self.segment is not None:
+            self.segment.close()
 
     def _to_snmp_type(self, oid_tuple, value):
-        name = NAME_MAP[oid_tuple]
-        prop = OID_PROPS[name]
-        if prop["type"] == "DisplayString":
-            return OctetString("" if value is None else str(value))
-        try:
-            return Integer(0 if value is None else int(value))
-        except Exception:
-            return Integer(0)
-        
+        prop = self.registry.props(self.registry.name(oid_tuple))
+        return to_snmp_value(prop["type"], value)
+
     def get_exact(self, oid_tuple):
-        print(f"DEBUG get_exact: buscando {oid_tuple}") # Prints para comprobar que la tupla obtenida es la correcta
-        print(f"DEBUG NAME_MAP keys: {list(NAME_MAP.keys())}")
-        if oid_tuple in NAME_MAP:
-            name = NAME_MAP[oid_tuple]
-            value = self.data.get(name)
-            return True, self._to_snmp_type(oid_tuple, value)
+        val = self._value_cache.get(oid_tuple)
+        if val is not None:
+            self.cache_hits += 1
+            return True, val
+        name = self.registry.name(oid_tuple)
+        if name is not None:
+            self.cache_misses += 1
+            val = self._to_snmp_type(oid_tuple, self.data.get(name))
+            self._value_cache[oid_tuple] = val
+            return True, val
+        # Mounted subtree (tables, agent statistics): always live, never cached
+        mount = self.registry.find_mount(oid_tuple)
+        if mount is not None:
+            prefix, provider = mount
+            found = provider.get(oid_tuple[len(prefix):])
+            if found is not None:
+                return True, to_snmp_value(*found)
         return False, None
-    
+
     def get_next(self, oid_tuple):
-        idx = 0
-        while idx < len(SORTED_OIDS) and SORTED_OIDS[idx] <= oid_tuple:
-            idx += 1
-        if idx < len(SORTED_OIDS):
-            next_oid = SORTED_OIDS[idx]
-            found, val = self.get_exact(next_oid)
-            return True, next_oid, val
+        registry = self.registry
+        mount = registry.find_mount(oid_tuple)
+        if mount is not None:
+            prefix, provider = mount
+            found = provider.next(oid_tuple[len(prefix):])
+            if found is not None:
+                suffix, type_name, value = found
+                return True, prefix + suffix, to_snmp_value(type_name, value)
+        next_oid = registry.next_oid(oid_tuple)
+        while next_oid is not None:
+            provider = registry.mount_at(next_oid)
+            if provider is None:
+                found, val = self.get_exact(next_oid)
+                return True, next_oid, val
+            found = provider.next(())
+            if found is not None:
+                suffix, type_name, value = found
+                return True, next_oid + suffix, to_snmp_value(type_name, value)
+            next_oid = registry.next_oid(next_oid)  # empty subtree
         return False, None, None
+
+    def get_bulk(self, oid_tuple, count):
+        """Up to `count` (oid, value) successors of oid_tuple"""
+        if not self.registry.has_mounts:
+            # Scalars only: one registry slice
+            return [(next_oid, self.get_exact(next_oid)[1])
+                    for next_oid in self.registry.successors(oid_tuple, count)]
+        run = []
+        for _ in range(count):
+            ok, oid_tuple, val = self.get_next(oid_tuple)
+            if not ok:
+                break
+            run.append((oid_tuple, val))
+        return run
     
     def validate_set(self, oid_tuple, snmp_val, _community_unused='public'):
         # 6=noAccess, 7=wrongType, 10=wrongValue, 17=notWritable
-        if oid_tuple not in NAME_MAP:
-            return 6, None
-        name = NAME_MAP[oid_tuple]
-        prop = OID_PROPS[name]
+        name = self.registry.name(oid_tuple)
+        if name is None:
+            # Mounted subtrees are read-only statistics/tables
+            return (17 if self.registry.find_mount(oid_tuple) else 6), None
+        prop = self.registry.props(name)
         if prop["access"] != "read-write":
             return 17, None
         if prop["type"] == "DisplayString":
@@ -184,133 +492,625 @@ class JsonStore:
             return 0, None
         return 7, None
     
+    def set_value(self, name, snmp_val):
+        """Python value stored for a (validated) SET of `name`"""
+        if self.registry.props(name)["type"] == "DisplayString":
+            return bytes(snmp_val).decode('utf-8', 'ignore')
+        return int(snmp_val)
+
     def commit_set(self, oid_tuple, snmp_val):
-        name = NAME_MAP.get(oid_tuple)
+        name = self.registry.name(oid_tuple)
         if not name:
             return False
-        prop = OID_PROPS[name]
-        if prop["type"] == "DisplayString":
-            self.data[name] = bytes(snmp_val).decode('utf-8', 'ignore')
-        else:
-            self.data[name] = int(snmp_val)
-        self.save()
+        self.commit_values({name: self.set_value(name, snmp_val)})
         return True
+
+    def _apply_entry(self, name, sub, value):
+        """Set (or remove, value None) one entry of nested state, e.g. an alarm row"""
+        entries = self.data.get(name)
+        if not isinstance(entries, dict):
+            entries = self.data[name] = {}
+        if value is None:
+            entries.pop(sub, None)
+        else:
+            entries[sub] = value
+
+    def commit_values(self, values):
+        """
+        Apply {name: value} and {(name, sub-key): entry or None}, persist and
+        notify listeners (hub / single process)
+        """
+        scalars = self.registry.names()
+        for name, value in values.items():
+            if isinstance(name, tuple):
+                self._apply_entry(*name, value)
+                self.save(name)
+                continue
+            old = self.data.get(name)
+            self.data[name] = value
+            if name in scalars:
+                self._invalidate(name)
+            if isinstance(value, dict) and isinstance(old, dict):
+                # Nested state (alarm rows): persist only the entries that changed
+                for sub in old.keys() - value.keys():
+                    self.save((name, sub))
+                for sub, entry in value.items():
+                    if old.get(sub) != entry:
+                        self.save((name, sub))
+            else:
+                self.save(name)
+        for listener in self.listeners:
+            listener(values)
+
+    def apply_remote(self, values):
+        """Values replicated from the hub: update and invalidate, never persist"""
+        shared = self.segment.index if self.segment is not None and self.segment.readonly else ()
+        scalars = self.registry.names()
+        for name, value in values.items():
+            if isinstance(name, tuple):
+                self._apply_entry(*name, value)
+                continue
+            if name not in shared:   # a shared segment already holds the hub's value
+                self.data[name] = value
+            if name in scalars:
+                self._invalidate(name)
+        for listener in self.listeners:
+            listener(values)
+
+    def check_update(self, update):
+        """Reasons why a RegistryUpdate does not fit the current state ([] = it does)"""
+        problems = []
+        shared = self.segment.index if self.segment is not None else {}
+        for name, (oid, props) in list(update.added.items()) + list(update.changed.items()):
+            if name in self.extra_keys:
+                problems.append(f"{name}: nombre reservado del estado")
+                continue
+            if name in shared:
+                from shm_state import slot_width
+                _, type_name, width = self.segment.layout[shared[name]]
+                if props["type"] != type_name or slot_width(props["type"], props) > width:
+                    problems.append(f"{name}: cambia su slot en memoria compartida (requiere reinicio)")
+                    continue
+            value = self.data.get(name)
+            if value is not None and not value_fits(props, value):
+                problems.append(f"{name}: el valor actual {value!r} no cumple {props['type']} "
+                                f"{props.get('min')}..{props.get('max')}")
+        return problems
+
+    def swap_registry(self, update):
+        """Install a validated RegistryUpdate; drop cached encodings of the affected OIDs"""
+        self.registry.swap(update)
+        for oid_tuple in update.oids():
+            self._value_cache.pop(oid_tuple, None)
+            if self.fastpath is not None:
+                self.fastpath.invalidate(oid_tuple)
     
     # New method for internal CPU update (bypasses RO restriction)
     def set_cpu_usage_internal(self, cpu_value):
         """Actualiza cpuUsage (RO) desde el monitor interno sin validar SET"""
-        self.data["cpuUsage"] = int(cpu_value)
-        self.save()
+        cpu_value = int(cpu_value)
+        if self.data.get("cpuUsage") == cpu_value:
+            return  # unchanged: keep the cached object, nothing to persist
+        self.commit_values({"cpuUsage": cpu_value})
+
+def make_writer():
+    if WORKER_ID:
+        # Worker process: replica fed by the hub, nothing persisted here
+        return StateReplica(HUB_SOCKET)
+    if STATE_BACKEND == 'journal':
+        from journal import JournalWriter
+        return JournalWriter(SNAPSHOT_FILE, JOURNAL_FILE, json_export=STATE_FILE,
+                             policy=PERSIST_POLICY, interval=PERSIST_INTERVAL,
+                             compact_interval=COMPACT_INTERVAL,
+                             max_log_bytes=COMPACT_MAX_LOG_BYTES)
+    return WriteBehindWriter(STATE_FILE, PERSIST_POLICY, PERSIST_INTERVAL, PERSIST_MAX_PENDING)
+
+def make_segment():
+    if not SHM_SEGMENT:
+        return None
+    from shm_state import SharedSegment, layout_for
+    if WORKER_ID:
+        return SharedSegment.attach(SHM_SEGMENT)   # created by the hub before spawning us
+    segment = SharedSegment.create(SHM_SEGMENT, layout_for(REGISTRY))
+    log_store.info("Estado compartido en memoria: %s (%d slots, %d bytes)",
+                   SHM_SEGMENT, len(segment.layout), segment.size)
+    return segment
+
+store = replica = None   # set by create_store()
 
-store = JsonStore(STATE_FILE)
+def create_store():
+    global store, replica
+    store = JsonStore(STATE_FILE, REGISTRY, make_writer(), make_segment())
+    replica = store.writer if WORKER_ID else None
+    if replica is not None:
+        replica.on_update = store.apply_remote
 
 # =========================
-# Responders (7.x signatures) + debug prints
+# Agent self-monitoring (MYAGENT-MIB agentStats)
 # =========================
+AGENT_STATS_OID = (1, 3, 6, 1, 4, 1, ENTERPRISE_OID, 4)
+metrics = None     # AgentMetrics, set by mount_agent_stats()
+admission = None   # AdmissionControl, set by mount_admission()
+
+def mount_agent_stats():
+    global metrics
+    metrics = AgentMetrics()
+    REGISTRY.mount(AGENT_STATS_OID + (1,), metrics.handler_table())   # agentHandlerTable
+    REGISTRY.mount(AGENT_STATS_OID + (2,), metrics.error_table())     # agentErrorTable
+    REGISTRY.mount(AGENT_STATS_OID + (3,), metrics.latency_table())   # agentLatencyTable
+
+def mount_admission():
+    global admission
+    from admission import AdmissionControl
+    admission = AdmissionControl(
+        [READ_COMMUNITY, WRITE_COMMUNITY], V3_USERS,
+        source_rate=ADMISSION_SOURCE_RATE, source_burst=ADMISSION_SOURCE_BURST,
+        community_rate=ADMISSION_COMMUNITY_RATE, community_burst=ADMISSION_COMMUNITY_BURST,
+        shed_above=ADMISSION_SHED_ABOVE, recover_below=ADMISSION_RECOVER_BELOW,
+        shed_after=ADMISSION_SHED_AFTER, max_sources=ADMISSION_MAX_SOURCES)
+    REGISTRY.mount(AGENT_STATS_OID + (4,), admission.view())           # agentAdmission
+
+# =========================
+# Per-core CPU usage (MYAGENT-MIB cpuCoreTable)
+# =========================
+CPU_CORE_TABLE_OID = (1, 3, 6, 1, 4, 1, ENTERPRISE_OID, 1, 5)
+cpu_cores = None     # CpuCores, set by mount_cpu_tables()
+
+# cpuUsage history: 15 min ring buffer, 1/5/15 min averages/maxima and EWMA
+CPU_HISTORY_OID = (1, 3, 6, 1, 4, 1, ENTERPRISE_OID, 1, 6)
+cpu_history = None   # set by mount_cpu_tables(): its windows depend on SAMPLE_INTERVAL
+
+def mount_cpu_tables():
+    global cpu_cores, cpu_history
+    cpu_cores = CpuCores()
+    REGISTRY.mount(CPU_CORE_TABLE_OID, cpu_cores.table())
+    cpu_history = CpuHistory(interval=SAMPLE_INTERVAL, alpha=0.2)
+    REGISTRY.mount(CPU_HISTORY_OID, cpu_history.view())
+
+# =========================
+# Host resources (MYAGENT-MIB hostObjects), lazy providers
+# =========================
+HOST_OID = (1, 3, 6, 1, 4, 1, ENTERPRISE_OID, 5)
+lazy_executor = host_groups = None   # set by mount_host_objects()
+
+def collect_memory():
+    import psutil
+    vm = psutil.virtual_memory()
+    return {"total": vm.total // 1024, "available": vm.available // 1024, "usage": round(vm.percent)}
+
+def collect_disk():
+    import psutil
+    du = psutil.disk_usage(HOST_DISK_PATH)   # statvfs: may hang on network filesystems
+    return {"total": du.total // 2**20, "free": du.free // 2**20, "usage": round(du.percent)}
+
+def collect_load():
+    import psutil
+    return dict(zip(("1", "5", "15"), (round(l * 100) for l in psutil.getloadavg())))
+
+def collect_processes():
+    import psutil
+    return {"count": len(psutil.pids())}     # lists /proc: slow with many processes
+
+HOST_OBJECTS = [   # (hostObjects arc, group, field, type)
+    (1, "memory", "total", "Gauge32"),       # hostMemTotal (KB)
+    (2, "memory", "available", "Gauge32"),   # hostMemAvailable (KB)
+    (3, "memory", "usage", "Integer32"),     # hostMemUsage (%)
+    (4, "disk", "total", "Gauge32"),         # hostDiskTotal (MB)
+    (5, "disk", "free", "Gauge32"),          # hostDiskFree (MB)
+    (6, "disk", "usage", "Integer32"),       # hostDiskUsage (%)
+    (7, "load", "1", "Integer32"),           # hostLoadAverage1 (x100)
+    (8, "load", "5", "Integer32"),           # hostLoadAverage5 (x100)
+    (9, "load", "15", "Integer32"),          # hostLoadAverage15 (x100)
+    (10, "processes", "count", "Gauge32"),   # hostProcessCount
+]
+
+def mount_host_objects():
+    global lazy_executor, host_groups
+    lazy_executor = ThreadPoolExecutor(LAZY_THREADS, thread_name_prefix='lazy')
+    host_groups = {
+        "memory": LazyGroup("memory", collect_memory, HOST_TTL["memory"]),
+        "load": LazyGroup("load", collect_load, HOST_TTL["load"]),
+        "disk": LazyGroup("disk", collect_disk, HOST_TTL["disk"], blocking=True, executor=lazy_executor),
+        "processes": LazyGroup("processes", collect_processes, HOST_TTL["processes"],
+                               blocking=True, executor=lazy_executor),
+    }
+    for arc, group, field, type_name in HOST_OBJECTS:
+        REGISTRY.mount(HOST_OID + (arc,), host_groups[group].scalar(field, type_name))
+
+# =========================
+# RMON-style alarm table (alarms.py): rows are state, created/destroyed by SET
+# =========================
+ALARM_TABLE_OID = (1,3,6,1,4,1,ENTERPRISE_OID,6,1)   # alarmTable
+
+def alarm_variable_known(oid):
+    return REGISTRY.name(oid) is not None or REGISTRY.find_mount(oid) is not None
+
+alarm_table = None   # AlarmTable, set by mount_alarm_table()
+
+def mount_alarm_table():
+    global alarm_table
+    alarm_table = AlarmTable(alarm_variable_known, ALARM_MAX_ROWS)
+    alarm_table.load(store.data.get(ALARMS_KEY))
+    store.extra_keys.add(ALARMS_KEY)
+    store.listeners.append(alarm_table.sync)
+    REGISTRY.mount(ALARM_TABLE_OID, alarm_table)
+
+# =========================
+# BER fast path and retransmission cache (answered straight from the UDP transport)
+# =========================
+CACHE_HIT, CACHE_IN_FLIGHT = 'hit', 'in-flight'   # response_cache.HIT / IN_FLIGHT
+response_cache = None   # ResponseCache, set by create_agent() when RESPONSE_CACHE_WINDOW > 0
+
+def normal_path_response(wholeMsg):
+    """Encode the GetResponse exactly as the pyasn1/JsonGet path would"""
+    reqMsg, _ = decoder.decode(wholeMsg, asn1Spec=v2c.Message())
+    reqPDU = v2c.apiMessage.get_pdu(reqMsg)
+    rspMsg = v2c.apiMessage.get_response(reqMsg)
+    rspPDU = v2c.apiMessage.get_pdu(rspMsg)
+    rspVarBinds = []
+    for oid, _ in v2c.apiPDU.get_varbinds(reqPDU):
+        found, value = store.get_exact(tuple(oid))
+        rspVarBinds.append((oid, value if found else rfc1905.NoSuchObject()))
+    v2c.apiPDU.set_error_status(rspPDU, 0)
+    v2c.apiPDU.set_error_index(rspPDU, 0)
+    v2c.apiPDU.set_varbinds(rspPDU, rspVarBinds)
+    return encoder.encode(rspMsg)
+
+def verify_fastpath(wholeMsg, fast_rsp):
+    try:
+        expected = normal_path_response(wholeMsg)
+    except Exception as e:
+        log.warning("⚠️ Fast path verification failed to run: %s", e)
+        return False
+    if expected != fast_rsp:
+        log.warning("⚠️ Fast path mismatch: %s != %s", fast_rsp.hex(), expected.hex())
+        return False
+    return True
+
+class AgentUdpTransport(udp.UdpTransport):
+    """
+    UDP transport that filters (admission control), then answers
+    retransmissions and hot GETs before PySNMP decodes anything
+    """
+    fastpath = None
+    response_cache = None
+    admission = None
+
+    def datagram_received(self, datagram, transportAddress):
+        admission = self.admission
+        if admission is None:
+            return self._receive(datagram, transportAddress)
+        t0 = time.perf_counter()
+        if admission.admit(datagram, transportAddress):
+            self._receive(datagram, transportAddress)
+        admission.busy(time.perf_counter() - t0)
+
+    def _receive(self, datagram, transportAddress):
+        cache = self.response_cache
+        if cache is not None:
+            status, rsp = cache.lookup(datagram, transportAddress)
+            if status == CACHE_HIT:
+                self.transport.sendto(rsp, transportAddress)
+                return
+            if status == CACHE_IN_FLIGHT:
+                return                    # the first copy's response answers this one too
+        if self.fastpath is not None:
+            rsp = self.fastpath.respond(datagram)
+            if rsp is not None:
+                if cache is not None:
+                    cache.store(rsp, transportAddress)
+                self.transport.sendto(rsp, transportAddress)
+                return
+        if self.admission is None:
+            super().datagram_received(datagram, transportAddress)
+        else:
+            self.loop.call_soon(self._dispatch, transportAddress, datagram)
+
+    def _dispatch(self, transportAddress, datagram):
+        """PySNMP's receive callback, timed for the admission control's utilization"""
+        t0 = time.perf_counter()
+        try:
+            self._callback_function(self, transportAddress, datagram)
+        finally:
+            self.admission.busy(time.perf_counter() - t0)
+
+    def send_message(self, outgoingMessage, transportAddress):
+        if self.response_cache is not None:
+            self.response_cache.store(outgoingMessage, transportAddress)
+        super().send_message(outgoingMessage, transportAddress)
+
+def enable_fastpath():
+    from ber_fastpath import BerFastPath
+    # Both communities' read views cover the MIB
+    store.fastpath = BerFastPath(store.raw_value, [READ_COMMUNITY, WRITE_COMMUNITY])
+    if FASTPATH_VERIFY:
+        store.fastpath.verifier = verify_fastpath
+
+# =========================
+# Responders (7.x signatures); debug output only when enabled
+# =========================
+
+class DeferredResponder:
+    """
+    Mixin for responders that may answer after handle_management_operation
+    returns. PySNMP releases the request state as soon as the handler returns;
+    deferred requests keep it until send_deferred().
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._deferred = set()
+
+    def defer(self, stateReference):
+        self._deferred.add(stateReference)
+
+    def release_state_information(self, stateReference):
+        if stateReference not in self._deferred:
+            super().release_state_information(stateReference)
+
+    def send_deferred(self, snmpEngine, stateReference, rspPDU):
+        self._deferred.discard(stateReference)
+        try:
+            self.send_pdu(snmpEngine, stateReference, rspPDU)
+        finally:
+            super().release_state_information(stateReference)
+
+    def respond(self, snmpEngine, stateReference, build, handler, t0, rounds=0):
+        """
+        Send build() now or, when it touches a lazy provider that is refreshing
+        in the thread pool, defer and rebuild once the refresh is done.
+        """
+        try:
+            if rounds < LAZY_MAX_ROUNDS:
+                rspPDU = build()
+            else:
+                with allow_stale():
+                    rspPDU = build()
+        except StaleValue as stale:
+            if rounds == 0:
+                self.defer(stateReference)
+            log.debug("Respuesta diferida: provider %s refrescando", stale.group.name)
+            stale.future.add_done_callback(
+                lambda _: self.respond(snmpEngine, stateReference, build, handler, t0, rounds + 1))
+            return
+        if rounds:
+            self.send_deferred(snmpEngine, stateReference, rspPDU)
+        else:
+            self.send_pdu(snmpEngine, stateReference, rspPDU)
+        metrics.observe(handler, t0)
+
+class JsonGet(DeferredResponder, cmdrsp.GetCommandResponder):
+    def handle_management_operation(self, snmpEngine, stateReference, contextName, PDU):
+        self.respond(snmpEngine, stateReference, partial(self._build, PDU), H_GET, now_ns())
+
+    @staticmethod
+    def _build(PDU):
+        reqVarBinds = v2c.apiPDU.get_varbinds(PDU)
+        debug = log_get.isEnabledFor(DEBUG)
+        if debug:
+            log_get.debug("GET con %d varbinds", len(reqVarBinds))
 
-class JsonGet(cmdrsp.GetCommandResponder):
-    def handleMgmtOperation(self, snmpEngine, stateReference, contextName, PDU):
-        print("\n=== JsonGet handler LLAMADO ===")
-        reqVarBinds = v2c.apiPDU.getVarBinds(PDU)
-        print(f"Número de varbinds recibidos: {len(reqVarBinds)}")
-        
         rspVarBinds = []
         for oid, _ in reqVarBinds:
-            oid_tuple = tuple(oid)
-            print(f"OID recibido: {oid_tuple}")
-            print(f"Tipo de OID: {type(oid)}")
-            print(f"¿Existe en NAME_MAP? {oid_tuple in NAME_MAP}")
-            
-            found, value = store.get_exact(oid_tuple)
-            print(f"get_exact resultado: found={found}, value={value}")
-            
+            found, value = store.get_exact(tuple(oid))
+            if debug:
+                log_get.debug("GET %s -> found=%s value=%s", oid, found, value)
             rspVarBinds.append((oid, value if found else rfc1905.NoSuchObject()))
         
-        rspPDU = v2c.apiPDU.getResponsePDU(PDU)
-        v2c.apiPDU.setErrorStatus(rspPDU, 0)
-        v2c.apiPDU.setErrorIndex(rspPDU, 0)
-        v2c.apiPDU.setVarBinds(rspPDU, rspVarBinds)
-        self.sendPdu(snmpEngine, stateReference, rspPDU)
-        print("=== JsonGet respuesta enviada ===\n")
-
-class JsonGetNext(cmdrsp.NextCommandResponder):
-    def handleMgmtOperation(self, snmpEngine, stateReference, contextName, PDU):
-        print("JsonGetNext handler llamado")
-        reqVarBinds = v2c.apiPDU.getVarBinds(PDU)
+        rspPDU = v2c.apiPDU.get_response(PDU)
+        v2c.apiPDU.set_error_status(rspPDU, 0)
+        v2c.apiPDU.set_error_index(rspPDU, 0)
+        v2c.apiPDU.set_varbinds(rspPDU, rspVarBinds)
+        return rspPDU
+
+class JsonGetNext(DeferredResponder, cmdrsp.NextCommandResponder):
+    def handle_management_operation(self, snmpEngine, stateReference, contextName, PDU):
+        v1 = request_security_model(snmpEngine) == 1
+        self.respond(snmpEngine, stateReference, partial(self._build, PDU, v1), H_GETNEXT, now_ns())
+
+    @staticmethod
+    def _build(PDU, v1=False):
+        reqVarBinds = v2c.apiPDU.get_varbinds(PDU)
+        debug = log_getnext.isEnabledFor(DEBUG)
         rspVarBinds = []
         for oid, _ in reqVarBinds:
-            print("SNMP GETNEXT desde:", tuple(oid))
+            ok, next_oid, val = store.get_next(tuple(oid))
+            # RFC 2576 4.1.2.1: SNMPv1 has no Counter64, skip those instances
+            # (rfc2576.v2_to_v1 would raise in send_pdu and the request got no answer)
+            while v1 and ok and val.tagSet == COUNTER64_TAGSET:
+                ok, next_oid, val = store.get_next(next_oid)
+            if debug:
+                log_getnext.debug("GETNEXT desde %s -> %s", oid, next_oid)
+            if ok:
+                rspVarBinds.append((ObjectIdentifier(next_oid), val))
+            else:
+                rspVarBinds.append((oid, rfc1905.EndOfMibView()))
+        rspPDU = v2c.apiPDU.get_response(PDU)
+        v2c.apiPDU.set_error_status(rspPDU, 0)
+        v2c.apiPDU.set_error_index(rspPDU, 0)
+        v2c.apiPDU.set_varbinds(rspPDU, rspVarBinds)
+        return rspPDU
+
+class JsonGetBulk(DeferredResponder, cmdrsp.BulkCommandResponder):
+    def handle_management_operation(self, snmpEngine, stateReference, contextName, PDU):
+        self.respond(snmpEngine, stateReference, partial(self._build, PDU), H_GETBULK, now_ns())
+
+    @staticmethod
+    def _build(PDU):
+        reqVarBinds = v2c.apiBulkPDU.get_varbinds(PDU)
+        nonRepeaters = min(max(0, int(v2c.apiBulkPDU.get_non_repeaters(PDU))), len(reqVarBinds))
+        maxRepetitions = max(0, int(v2c.apiBulkPDU.get_max_repetitions(PDU)))
+        repeaters = reqVarBinds[nonRepeaters:]
+        if repeaters:
+            budget = max(0, BULK_MAX_VARBINDS - nonRepeaters) // len(repeaters)
+            maxRepetitions = min(maxRepetitions, BULK_MAX_REPETITIONS, budget)
+        log_getbulk.debug("GETBULK non-repeaters=%d max-repetitions=%d repeaters=%d",
+                          nonRepeaters, maxRepetitions, len(repeaters))
+
+        rspVarBinds = []
+        # Non-repeaters: plain GETNEXT
+        for oid, _ in reqVarBinds[:nonRepeaters]:
             ok, next_oid, val = store.get_next(tuple(oid))
             if ok:
                 rspVarBinds.append((ObjectIdentifier(next_oid), val))
             else:
                 rspVarBinds.append((oid, rfc1905.EndOfMibView()))
-        rspPDU = v2c.apiPDU.getResponsePDU(PDU)
-        v2c.apiPDU.setErrorStatus(rspPDU, 0)
-        v2c.apiPDU.setErrorIndex(rspPDU, 0)
-        v2c.apiPDU.setVarBinds(rspPDU, rspVarBinds)
-        self.sendPdu(snmpEngine, stateReference, rspPDU)
 
-class JsonSet(cmdrsp.SetCommandResponder):
-    def handleMgmtOperation(self, snmpEngine, stateReference, contextName, PDU):
-        print("JsonSet handler llamado")
-        reqVarBinds = v2c.apiPDU.getVarBinds(PDU)
+        # Repeaters: one registry slice per column, then interleave row by row
+        if maxRepetitions:
+            runs = [store.get_bulk(tuple(oid), maxRepetitions) for oid, _ in repeaters]
+            longest = max(len(run) for run in runs)
+            # One extra row of endOfMibView when some column ran off the MIB
+            rows = min(maxRepetitions, longest + (longest < maxRepetitions))
+            for row in range(rows):
+                for (oid, _), run in zip(repeaters, runs):
+                    if row < len(run):
+                        rspVarBinds.append((ObjectIdentifier(run[row][0]), run[row][1]))
+                    else:
+                        last = ObjectIdentifier(run[-1][0]) if run else oid
+                        rspVarBinds.append((last, rfc1905.EndOfMibView()))
+
+        rspPDU = v2c.apiBulkPDU.get_response(PDU)
+        v2c.apiPDU.set_error_status(rspPDU, 0)
+        v2c.apiPDU.set_error_index(rspPDU, 0)
+        v2c.apiPDU.set_varbinds(rspPDU, rspVarBinds)
+        return rspPDU
+
+def request_security_name(snmpEngine):
+    """securityName of the request being dispatched, or None"""
+    try:
+        # dict stored by rfc3412.receiveMessage for the duration of the dispatch
+        ctx = snmpEngine.observer.get_execution_context('rfc3412.receiveMessage:request')
+        return str(ctx['securityName'])
+    except Exception:
+        return None
+
+def request_security_model(snmpEngine):
+    """securityModel of the request being dispatched (1 = SNMPv1), or None"""
+    try:
+        ctx = snmpEngine.observer.get_execution_context('rfc3412.receiveMessage:request')
+        return int(ctx['securityModel'])
+    except Exception:
+        return None
+
+class JsonSet(DeferredResponder, cmdrsp.SetCommandResponder):
+    def handle_management_operation(self, snmpEngine, stateReference, contextName, PDU):
+        t0 = now_ns()
+        reqVarBinds = v2c.apiPDU.get_varbinds(PDU)
 
         # Deducir securityName (opcional) para RO/RW
-        sec_name = None
-        try:
-            ctx_list = snmpEngine.observer.getExecutionContext('rfc3412.receiveMessage:request')
-            if ctx_list:
-                (_, _, _, securityName, _, _, _) = ctx_list[0]
-                sec_name = str(securityName)
-        except Exception:
-            pass
-        is_rw = (sec_name == 'private')
-        print("SecurityName:", sec_name, "is_rw:", is_rw)
-
-        # Phase 1: validate
+        sec_name = request_security_name(snmpEngine)
+        is_rw = (sec_name in WRITE_SECURITY_NAMES)
+        log_set.debug("SET securityName=%s is_rw=%s", sec_name, is_rw)
+
+        # Phase 1: validate (writable tables validate all their varbinds together)
+        scalars, table_writes = [], {}
         for idx, (oid, val) in enumerate(reqVarBinds, start=1):
-            print("SNMP SET solicitando:", tuple(oid), "valor:", val.prettyPrint())
+            if log_set.isEnabledFor(DEBUG):
+                log_set.debug("SET %s = %s", oid, val.prettyPrint())
             errStatus = 0
+            oid_tuple = tuple(oid)
+            mount = store.registry.find_mount(oid_tuple) if is_rw else None
             if not is_rw:
                 errStatus = 6  # noAccess
+            elif mount is not None and hasattr(mount[1], 'prepare_set'):
+                prefix, provider = mount
+                table_writes.setdefault(provider, []).append((idx, oid_tuple[len(prefix):], val))
             else:
-                errStatus, _ = store.validate_set(tuple(oid), val, 'private')
+                errStatus, _ = store.validate_set(oid_tuple, val, 'private')
+                scalars.append((oid_tuple, val))
             if errStatus != 0:
-                print("SET denegado. errStatus:", errStatus, "errIndex:", idx)
-                rspPDU = v2c.apiPDU.getResponsePDU(PDU)
-                v2c.apiPDU.setErrorStatus(rspPDU, errStatus)
-                v2c.apiPDU.setErrorIndex(rspPDU, idx)
-                v2c.apiPDU.setVarBinds(rspPDU, reqVarBinds)
-                self.sendPdu(snmpEngine, stateReference, rspPDU)
-                return
+                return self._deny(snmpEngine, stateReference, PDU, reqVarBinds, errStatus, idx, t0)
+        values = {}
+        for provider, writes in table_writes.items():
+            errStatus, idx, rows = provider.prepare_set(writes)
+            if errStatus != 0:
+                return self._deny(snmpEngine, stateReference, PDU, reqVarBinds, errStatus, idx, t0)
+            values.update(rows)
 
         # Phase 2: commit
-        for oid, val in reqVarBinds:
-            store.commit_set(tuple(oid), val)
+        for oid_tuple, val in scalars:
+            name = store.registry.name(oid_tuple)
+            values[name] = store.set_value(name, val)
+        if replica is None:
+            store.commit_values(values)
+            self.send_pdu(snmpEngine, stateReference, self._response(PDU, reqVarBinds))
+            metrics.observe(H_SET, t0)
+            return
+
+        # Worker process: the hub applies the SET; answer once it acknowledges
+        self.defer(stateReference)
+        replica.forward_set(values).add_done_callback(
+            lambda fut: self._hub_done(fut, values, snmpEngine, stateReference, PDU, reqVarBinds, t0))
+
+    def _hub_done(self, fut, values, snmpEngine, stateReference, PDU, reqVarBinds, t0):
+        if fut.cancelled() or fut.exception() is not None:
+            log_set.error("❌ SET no aplicado por el hub: %s",
+                          "cancelled" if fut.cancelled() else fut.exception())
+            self.send_deferred(snmpEngine, stateReference,
+                               self._error_response(PDU, reqVarBinds, 14, 1))  # commitFailed
+            metrics.observe(H_SET, t0, 14)
+            return
+        store.apply_remote(values)   # usually already broadcast by the hub
+        self.send_deferred(snmpEngine, stateReference, self._response(PDU, reqVarBinds))
+        metrics.observe(H_SET, t0)
 
-        # Respond with post-SET values
+    def _deny(self, snmpEngine, stateReference, PDU, reqVarBinds, errStatus, errIndex, t0):
+        log_set.info("SET denegado: errStatus=%d errIndex=%d oid=%s",
+                     errStatus, errIndex, reqVarBinds[errIndex - 1][0])
+        self.send_pdu(snmpEngine, stateReference,
+                      self._error_response(PDU, reqVarBinds, errStatus, errIndex))
+        metrics.observe(H_SET, t0, errStatus)
+
+    @staticmethod
+    def _error_response(PDU, reqVarBinds, errStatus, errIndex):
+        rspPDU = v2c.apiPDU.get_response(PDU)
+        v2c.apiPDU.set_error_status(rspPDU, errStatus)
+        v2c.apiPDU.set_error_index(rspPDU, errIndex)
+        v2c.apiPDU.set_varbinds(rspPDU, reqVarBinds)
+        return rspPDU
+
+    @staticmethod
+    def _response(PDU, reqVarBinds):
+        # Respond with post-SET values (the requested one for rows that are gone, e.g. destroy)
         rspVarBinds = []
-        for oid, _ in reqVarBinds:
+        for oid, val in reqVarBinds:
             found, value = store.get_exact(tuple(oid))
-            rspVarBinds.append((oid, value if found else rfc1905.NoSuchObject()))
-
-        rspPDU = v2c.apiPDU.getResponsePDU(PDU)
-        v2c.apiPDU.setErrorStatus(rspPDU, 0)
-        v2c.apiPDU.setErrorIndex(rspPDU, 0)
-        v2c.apiPDU.setVarBinds(rspPDU, rspVarBinds)
-        self.sendPdu(snmpEngine, stateReference, rspPDU)
+            rspVarBinds.append((oid, value if found else val))
+        rspPDU = v2c.apiPDU.get_response(PDU)
+        v2c.apiPDU.set_error_status(rspPDU, 0)
+        v2c.apiPDU.set_error_index(rspPDU, 0)
+        v2c.apiPDU.set_varbinds(rspPDU, rspVarBinds)
+        return rspPDU
 
 # =========================
 # Email notification
 # =========================
-def send_email_alert(cpu, threshold, to_addr):
+email_notifier = None   # EmailNotifier, set by create_notifier()
+
+def create_notifier():
+    global email_notifier
+    email_notifier = EmailNotifier(
+        SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, SENDER_PASS,
+        starttls=SMTP_STARTTLS, workers=EMAIL_WORKERS, queue_size=EMAIL_QUEUE_SIZE,
+        max_retries=EMAIL_MAX_RETRIES, backoff=EMAIL_BACKOFF, timeout=SMTP_TIMEOUT)
+
+def queue_email(to_addr, subject, body):
     if not to_addr or '@' not in to_addr:
-        print(f"⚠️ Invalid email: {to_addr}")
+        log_notify.warning("⚠️ Invalid email: %s", to_addr)
         return
     if SENDER_EMAIL == 'your_email@gmail.com' or SENDER_PASS.startswith('xxxx'):
-        print("⚠️ Gmail credentials not configured. Edit SENDER_EMAIL/SENDER_PASS.")
+        log_notify.warning("⚠️ Gmail credentials not configured. Edit SENDER_EMAIL/SENDER_PASS.")
         return
+    from email.mime.text import MIMEText
+    msg = MIMEText(body)
+    msg["From"] = SENDER_EMAIL
+    msg["To"] = to_addr
+    msg["Subject"] = subject
+    # Non-blocking: the worker pool sends it off the dispatcher loop
+    if email_notifier.submit(msg):
+        log_notify.info("📧 Email queued for %s %s", to_addr, email_notifier.metrics())
+
+def send_email_alert(cpu, threshold, to_addr):
     subject = f"🚨 CPU Alert: {cpu}% exceeds {threshold}%"
     body = f"""CPU Usage Alert - SNMP Agent
 Current CPU Usage: {cpu}%
@@ -320,29 +1120,28 @@ Email: {to_addr}
 Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}
 This is an automated notification.
 """
-    msg = MIMEText(body)
-    msg["From"] = SENDER_EMAIL
-    msg["To"] = to_addr
-    msg["Subject"] = subject
-    try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=10) as server:
-            server.ehlo()
-            server.starttls()
-            server.ehlo()
-            server.login(SENDER_EMAIL, SENDER_PASS)
-            server.send_message(msg)
-            print(f"✅ Email sent to {to_addr}")
-    except smtplib.SMTPAuthenticationError:
-        print("❌ Gmail authentication failed (check App Password & 2FA).")
-    except Exception as e:
-        print(f"❌ Email error: {e}")
+    queue_email(to_addr, subject, body)
+
+def send_alarm_email(index, kind, variable, value, threshold, to_addr):
+    edge = "rising" if kind == RISING else "falling"
+    subject = f"🚨 Alarm {index} ({edge}): {oid_str(variable)} = {value}"
+    body = f"""Alarm Table Event - SNMP Agent
+Alarm: {index} ({edge})
+Variable: {oid_str(variable)}
+Sampled Value: {value}
+Threshold: {threshold}
+Manager: {store.data.get('manager', 'Unknown')}
+Timestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}
+This is an automated notification.
+"""
+    queue_email(to_addr, subject, body)
 
 # =========================
 # SNMP Trap notification
 # =========================
 def send_trap_notification(snmpEngine, cpu, threshold, email):
     """Envía trap SNMPv2c cuando CPU supera threshold"""
-    print(f"📤 Preparando trap: CPU {cpu}% > {threshold}%")
+    log_notify.info("📤 Preparando %s: CPU %s%% > %s%%", NOTIFY_MODE, cpu, threshold)
     
     # varBinds: sysUpTime.0, snmpTrapOID.0, cpuUsage, cpuThreshold, managerEmail
     varBinds = [
@@ -353,110 +1152,397 @@ def send_trap_notification(snmpEngine, cpu, threshold, email):
         (ObjectIdentifier('1.3.6.1.4.1.28308.1.2.0'), OctetString(email))
     ]
     
-    # TODO: Implementar envío real con pysnmp notificator API
-    # Por ahora solo registramos el trap construido
-    print(f"📤 Trap construido con {len(varBinds)} varBinds")
-    for oid, val in varBinds:
-        print(f"  {oid.prettyPrint()} = {val.prettyPrint()}")
+    # Non-blocking: the originator task sends it on the agent's own engine
+    if trap_originator.submit(varBinds):
+        log_notify.info("📤 %s encolado con %d varBinds %s", NOTIFY_MODE, len(varBinds),
+                        trap_originator.metrics())
+
+def send_alarm_notification(index, kind, variable, sample_type, value, threshold):
+    """alarmRisingNotification / alarmFallingNotification for alarm row `index`"""
+    entry = '.'.join(map(str, ALARM_TABLE_OID + (1,)))
+    trap_oid = '1.3.6.1.4.1.28308.2.0.2' if kind == RISING else '1.3.6.1.4.1.28308.2.0.3'
+    threshold_col = 6 if kind == RISING else 7
+    varBinds = [
+        (ObjectIdentifier('1.3.6.1.2.1.1.3.0'), rfc1902.TimeTicks(sys_uptime_ticks())),
+        (ObjectIdentifier('1.3.6.1.6.3.1.1.4.1.0'), ObjectIdentifier(trap_oid)),
+        (ObjectIdentifier(f'{entry}.2.{index}'), ObjectIdentifier(variable)),
+        (ObjectIdentifier(f'{entry}.3.{index}'), Integer(sample_type)),
+        (ObjectIdentifier(f'{entry}.4.{index}'), Integer(max(-2**31, min(2**31 - 1, value)))),
+        (ObjectIdentifier(f'{entry}.{threshold_col}.{index}'), Integer(threshold)),
+    ]
+    if trap_originator.submit(varBinds):
+        log_notify.info("📤 Alarm %d %s encolado %s", index, NOTIFY_MODE, trap_originator.metrics())
+
+def read_alarm_variable(oid):
+    """Integer value of any agent OID for the alarm table, None to skip this tick"""
+    try:
+        found, value = store.get_exact(oid)
+        return int(value) if found else None
+    except StaleValue:
+        return None          # lazy provider refreshing in the pool: sampled next tick
+    except Exception:
+        return None          # not an integer (DisplayString, OID...)
+
+def fire_alarm_events(events):
+    for index, kind, variable, sample_type, value, threshold, action in events:
+        log_sampler.warning("⚠️ Alarm %d %s: %s = %d (umbral %d)", index,
+                            "rising" if kind == RISING else "falling", oid_str(variable), value, threshold)
+        if action in (ACTION_TRAP, ACTION_BOTH):
+            send_alarm_notification(index, kind, variable, sample_type, value, threshold)
+        if action in (ACTION_EMAIL, ACTION_BOTH):
+            send_alarm_email(index, kind, variable, value, threshold,
+                             str(store.data.get("managerEmail", "admin@example.com")))
 
 # =========================
-# Async CPU sampler (edge-triggered trap)
+# Sampler: collectors in a thread pool, results published on the loop (edge-triggered trap)
 # =========================
-async def cpu_sampler(store, trap_sender_func):
+collectors = None   # CollectorScheduler, set by create_agent()
+
+class CpuSampler:
     """
-    Periodic task:
-    - every 5s: read CPU, clamp to [0,100], update RO scalar
+    Publishes each psutil sample (read in the collector pool):
+    - cpuCoreTable + cpuHistory + cpuUsage (mean), clamp to [0,100]
     - if cpuUsage crosses above cpuThreshold -> send a trap (edge-triggered)
+    - evaluate every active alarmTable row (rising/falling events with hysteresis)
     """
-    print("cpu_sampler: arrancando monitor de CPU")
-    psutil.cpu_percent(interval=None)  # warm-up
-    last_over = False
-    print("🔍 CPU monitoring started (every 5s)")
-    
-    while True:
-        await asyncio.sleep(5)
-        cpu = round(psutil.cpu_percent(interval=None))
-        cpu = max(0, min(100, cpu))
-        
+    def __init__(self, store, trap_sender_func):
+        self.store = store
+        self.trap_sender_func = trap_sender_func
+        self.last_over = False
+
+    async def publish(self, times):
+        t0 = now_ns()
+        store = self.store
+        usage = cpu_cores.apply(times)
+        cpu_history.add(usage)
+        cpu = max(0, min(100, round(usage)))
+
         # Update RO scalar via internal setter
         store.set_cpu_usage_internal(cpu)
-        print(f"cpu_sampler: cpuUsage actualizado a {cpu}%")
-        
+        log_sampler.debug("cpuUsage actualizado a %s%% (value cache hits=%d misses=%d)",
+                          cpu, store.cache_hits, store.cache_misses)
+
         # Leer threshold y email desde el store
         thr = int(store.data.get("cpuThreshold", 80))
         email = str(store.data.get("managerEmail", "admin@example.com"))
-        
+
         over = cpu > thr
-        if over and not last_over:
-            print(f"\n⚠️ CPU threshold exceeded: {cpu}% > {thr}%")
+        if over and not self.last_over:
+            log_sampler.warning("⚠️ CPU threshold exceeded: %s%% > %s%%", cpu, thr)
             # Enviar trap
-            trap_sender_func(cpu, thr, email)
+            self.trap_sender_func(cpu, thr, email)
             # También enviar email si está configurado
             send_email_alert(cpu, thr, email)
-        last_over = over
-
-# =========================
-# SNMP Engine + Context + Transport + VACM (with debug prints)
-# =========================
-print("Inicializando snmpEngine...")
-snmpEngine = engine.SnmpEngine()
-print("SnmpEngine creado.")
-
-snmpContext = context.SnmpContext(snmpEngine)
-print("Contexto SNMP registrado.")
-
-host = '127.0.0.1'
-port = 161  # Prefer high port in dev; 161 needs admin/root
-print("Registrando transporte UDP...")
-config.addTransport(
-    snmpEngine,
-    udp.domainName,
-    udp.UdpTransport().openServerMode((host, port))
-)
-print(f"Transporte UDP abierto en {host}:{port}")
-
-print("Registrando comunidades y VACM...")
-# 1) Map communities -> securityName (deben coincidir para simplicidad)
-config.addV1System(snmpEngine, 'public', 'public')   # securityName='public', community='public'
-config.addV1System(snmpEngine, 'private', 'private') # securityName='private', community='private'
-
-# 2) Grant views per (securityModel, securityName)
-for secModel in (1, 2):  # 1 = v1, 2 = v2c
-    # Read-only: everything under 1.3.6.1 (includes your MIB)
-    config.addVacmUser(
-        snmpEngine, secModel, 'public', 'noAuthNoPriv',
-        readSubTree=(1, 3, 6, 1)
-    )
-    # Read-write: same read view, plus write permission
-    config.addVacmUser(
-        snmpEngine, secModel, 'private', 'noAuthNoPriv',
-        readSubTree=(1, 3, 6, 1),
-        writeSubTree=(1, 3, 6, 1)
-    )
-print("VACM y comunidades listos.")
-
-
-print("Instanciando responders...")
-JsonGet(snmpEngine, snmpContext)
-print("JsonGet registrado.")
-JsonGetNext(snmpEngine, snmpContext)
-print("JsonGetNext registrado.")
-JsonSet(snmpEngine, snmpContext)
-print("JsonSet registrado.")
-
-print("OIDs gestionados:")
-for oid in SORTED_OIDS:
-    print(oid)
+        self.last_over = over
+        if alarm_table.active:
+            fire_alarm_events(await alarm_table.evaluate(read_alarm_variable, ALARM_BATCH))
+        metrics.observe(H_SAMPLER, t0)
+
+def add_cpu_collector(publish):
+    collectors.add("cpu", cpu_cores.read, publish, SAMPLE_INTERVAL,
+                   timeout=COLLECTOR_TIMEOUT, setup=cpu_cores.start)
+
+def publish_cores(times):
+    """Worker processes: keep their own cpuCoreTable/cpuHistory fresh (CpuSampler runs in the hub)"""
+    cpu_history.add(cpu_cores.apply(times))
+
+# =========================
+# Hot reload of OID definitions (SIGHUP / file watch)
+# =========================
+reload_lock = None   # asyncio.Lock, set by create_agent()
+
+async def reload_definitions(reason, hub=None):
+    """Build the new registry off the loop, validate it and swap it in atomically"""
+    async with reload_lock:
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        try:
+            definitions, source, how = await loop.run_in_executor(None, load_definitions)
+            update = await loop.run_in_executor(None, REGISTRY.prepare_update, definitions)
+        except (OSError, ValueError, KeyError) as e:
+            log_store.error("❌ Recarga de OIDs descartada (%s): %s", reason, e)
+            return False
+        if not update:
+            log_store.info("Recarga de OIDs (%s): sin cambios", reason)
+            return True
+        problems = store.check_update(update)
+        if problems:
+            log_store.error("❌ Recarga de OIDs descartada (%s): %s", reason, "; ".join(problems))
+            return False
+        store.swap_registry(update)
+        log_store.info("🔄 OIDs recargados de %s (%s, %s): +%d -%d ~%d, %d OIDs en %.1f ms",
+                       os.path.basename(source), reason, how, len(update.added), len(update.removed),
+                       len(update.changed), len(REGISTRY), (time.perf_counter() - t0) * 1000)
+        if hub is not None:
+            hub.send_reload()      # workers load the cache just written and swap too
+        return True
+
+async def watch_definitions(interval, hub=None):
+    """Reload when DEFINITIONS_FILE changes (mtime/size polling, no extra dependency)"""
+    def signature():
+        try:
+            st = os.stat(DEFINITIONS_FILE)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+    last = signature()
+    while True:
+        await asyncio.sleep(interval)
+        current = signature()
+        if current is not None and current != last:
+            last = current
+            await reload_definitions(f"cambio en {os.path.basename(DEFINITIONS_FILE)}", hub)
+
+# =========================
+# Application factory: SNMP Engine + Context + Transport + VACM
+# =========================
+snmpEngine = trap_originator = None   # set by create_agent()
+WRITE_SECURITY_NAMES = {'private'}    # + the 'rw' SNMPv3 users, set by create_agent()
+
+def create_agent():
+    """
+    Build the agent from the configuration above (see configure() for the
+    CLI): state file and OID registry, store and providers (with their
+    thread pools), email notifier, collector pool, SnmpEngine with its UDP
+    transport, communities/VACM, notification originator and responders.
+    Nothing of this happens at import time.
+    """
+    global AGENT_START, snmpEngine, trap_originator, WRITE_SECURITY_NAMES, response_cache
+    global collectors, reload_lock
+    AGENT_START = time.time()
+    load_registry()
+    create_store()
+    mount_agent_stats()
+    mount_admission()
+    mount_cpu_tables()
+    mount_host_objects()
+    mount_alarm_table()
+    create_notifier()
+    collectors = CollectorScheduler(COLLECTOR_THREADS, COLLECTOR_PROCESSES)
+    reload_lock = asyncio.Lock()
+    if FASTPATH_ENABLED:
+        enable_fastpath()
+
+    if V3_USERS or ENGINE_ID:
+        # Localized USM keys are bound to the engineID: keep it stable across restarts
+        from usm_users import engine_id_from, set_engine_boots
+        engine_id = (bytes.fromhex(ENGINE_ID) if ENGINE_ID
+                     else engine_id_from(ENTERPRISE_OID, f"{AGENT_HOST}:{AGENT_PORT}"))
+        snmpEngine = engine.SnmpEngine(snmpEngineID=rfc1902.OctetString(engine_id))
+        if ENGINE_BOOTS:
+            set_engine_boots(snmpEngine, ENGINE_BOOTS)
+    else:
+        snmpEngine = engine.SnmpEngine()
+    log.info("SnmpEngine creado (engineID %s).", snmpEngine.snmpEngineID.prettyPrint())
+
+    snmpContext = context.SnmpContext(snmpEngine)
+    log.info("Contexto SNMP registrado.")
+
+    transport = AgentUdpTransport()
+    transport.fastpath = store.fastpath
+    transport.admission = admission
+    if RESPONSE_CACHE_WINDOW:
+        from response_cache import ResponseCache
+        response_cache = ResponseCache(RESPONSE_CACHE_WINDOW, RESPONSE_CACHE_MAX_ENTRIES,
+                                       RESPONSE_CACHE_MAX_BYTES, in_flight=RESPONSE_CACHE_IN_FLIGHT)
+        transport.response_cache = response_cache
+    if WORKERS > 1:
+        # Every process binds the same port; the kernel load-balances datagrams
+        transport.open_server_mode(sock=reuseport_socket(AGENT_HOST, AGENT_PORT))
+    else:
+        transport.open_server_mode((AGENT_HOST, AGENT_PORT))
+    config.addTransport(snmpEngine, udp.DOMAIN_NAME, transport)
+    log.info("Transporte UDP abierto en %s:%s%s", AGENT_HOST, AGENT_PORT,
+             f" (SO_REUSEPORT, worker {WORKER_ID}/{WORKERS})" if WORKERS > 1 else "")
+
+    # 1) Map communities -> securityName ('public' = read, 'private' = read-write)
+    config.addV1System(snmpEngine, 'public', READ_COMMUNITY)
+    config.addV1System(snmpEngine, 'private', WRITE_COMMUNITY)
+
+    # 2) Grant views per (securityModel, securityName)
+    for secModel in (1, 2):  # 1 = v1, 2 = v2c
+        # Read-only: everything under 1.3.6.1 (includes your MIB); also used for traps
+        config.addVacmUser(
+            snmpEngine, secModel, 'public', 'noAuthNoPriv',
+            readSubTree=(1, 3, 6, 1),
+            notifySubTree=(1, 3, 6, 1)
+        )
+        # Read-write: same read view, plus write permission
+        config.addVacmUser(
+            snmpEngine, secModel, 'private', 'noAuthNoPriv',
+            readSubTree=(1, 3, 6, 1),
+            writeSubTree=(1, 3, 6, 1)
+        )
+    WRITE_SECURITY_NAMES = {'private'}
+    if V3_USERS:
+        from usm_users import LocalizedKeyCache, configure_users
+        cache = LocalizedKeyCache(USM_KEY_CACHE)
+        WRITE_SECURITY_NAMES |= configure_users(snmpEngine, V3_USERS, cache)
+        log.info("USM: %d usuarios (claves localizadas: %d en caché, %d calculadas)",
+                 len(V3_USERS), cache.hits, cache.misses)
+    log.info("VACM y comunidades listos.")
+
+    if NOTIFY_MODE == 'inform':
+        trap_originator = InformOriginator(snmpEngine, TRAP_TARGETS, TRAP_SECURITY_NAME,
+                                           timeout=INFORM_TIMEOUT, retries=INFORM_RETRIES,
+                                           max_inflight=INFORM_MAX_INFLIGHT,
+                                           queue_size=TRAP_QUEUE_SIZE, community=READ_COMMUNITY)
+    else:
+        trap_originator = TrapOriginator(snmpEngine, TRAP_TARGETS, TRAP_SECURITY_NAME,
+                                         queue_size=TRAP_QUEUE_SIZE)
+    trap_originator.configure()
+    log.info("Notification originator listo (%s) -> %s", NOTIFY_MODE, TRAP_TARGETS)
+
+    JsonGet(snmpEngine, snmpContext)
+    log.info("JsonGet registrado.")
+    JsonGetNext(snmpEngine, snmpContext)
+    log.info("JsonGetNext registrado.")
+    JsonSet(snmpEngine, snmpContext)
+    log.info("JsonSet registrado.")
+    JsonGetBulk(snmpEngine, snmpContext)
+    log.info("JsonGetBulk registrado.")
+
+    if log.isEnabledFor(DEBUG):
+        log.debug("OIDs gestionados: %s", list(REGISTRY))
+    return snmpEngine
+
+# =========================
+# Command line
+# =========================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mini SNMP agent (MYAGENT-MIB, enterprise 1.3.6.1.4.1.%d)" % ENTERPRISE_OID)
+    parser.add_argument('--host', default=AGENT_HOST, help="bind address (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=AGENT_PORT, help="UDP port (default: %(default)s)")
+    parser.add_argument('--read-community', default=READ_COMMUNITY,
+                        help="read-only community (default: %(default)s)")
+    parser.add_argument('--write-community', default=WRITE_COMMUNITY,
+                        help="read-write community (default: %(default)s)")
+    parser.add_argument('--sample-interval', type=float, default=SAMPLE_INTERVAL,
+                        help="seconds between CPU samples (default: %(default)s)")
+    parser.add_argument('--persist-interval', type=float, default=PERSIST_INTERVAL,
+                        help="seconds between state flushes, policy 'interval' (default: %(default)s)")
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_WATCH_INTERVAL,
+                        help="seconds between OID definition file checks, 0 = SIGHUP only "
+                             "(default: %(default)s)")
+    parser.add_argument('--source-rate', type=float, default=ADMISSION_SOURCE_RATE,
+                        help="requests/s allowed per source IP, 0 = unlimited (default: %(default)s)")
+    parser.add_argument('--community-rate', type=float, default=ADMISSION_COMMUNITY_RATE,
+                        help="requests/s allowed per community or v3 user, 0 = unlimited "
+                             "(default: %(default)s)")
+    parser.add_argument('--shed-above', type=float, default=ADMISSION_SHED_ABOVE,
+                        help="sustained dispatcher utilization (0-1) above which GETNEXT/GETBULK "
+                             "from the busiest sources are shed, 0 = never (default: %(default)s)")
+    parser.add_argument('--engine-id', default=ENGINE_ID,
+                        help="snmpEngineID in hex (default: derived from host and port)")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="SO_REUSEPORT processes (default: %(default)s)")
+    parser.add_argument('--log-format', choices=('text', 'json'), default=LOG_FORMAT)
+    args = parser.parse_args(argv)
+    if not 0 < args.port < 65536:
+        parser.error(f"invalid port: {args.port}")
+    if args.sample_interval <= 0 or args.persist_interval <= 0 or args.reload_interval < 0:
+        parser.error("intervals must be positive")
+    if args.source_rate < 0 or args.community_rate < 0:
+        parser.error("rates must be >= 0")
+    if not 0 <= args.shed_above <= 1:
+        parser.error("--shed-above must be between 0 and 1")
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    try:
+        bytes.fromhex(args.engine_id)
+    except ValueError:
+        parser.error(f"invalid --engine-id: {args.engine_id}")
+    if args.engine_id and not 5 <= len(bytes.fromhex(args.engine_id)) <= 32:
+        parser.error("--engine-id must be 5 to 32 octets")
+    return args
+
+def configure(args):
+    """Apply the command line over the configuration constants (before create_agent())"""
+    global AGENT_HOST, AGENT_PORT, READ_COMMUNITY, WRITE_COMMUNITY, SAMPLE_INTERVAL
+    global PERSIST_INTERVAL, RELOAD_WATCH_INTERVAL, WORKERS, LOG_FORMAT, ENGINE_ID
+    global ADMISSION_SOURCE_RATE, ADMISSION_COMMUNITY_RATE, ADMISSION_SHED_ABOVE
+    AGENT_HOST, AGENT_PORT = args.host, args.port
+    READ_COMMUNITY, WRITE_COMMUNITY = args.read_community, args.write_community
+    SAMPLE_INTERVAL = args.sample_interval
+    PERSIST_INTERVAL = args.persist_interval
+    RELOAD_WATCH_INTERVAL = args.reload_interval
+    WORKERS = args.workers
+    ENGINE_ID = args.engine_id
+    ADMISSION_SOURCE_RATE, ADMISSION_COMMUNITY_RATE = args.source_rate, args.community_rate
+    ADMISSION_SHED_ABOVE = args.shed_above
+    LOG_FORMAT = args.log_format
 
 # =========================
 # Main using PySNMP's loop
 # =========================
-def main():
+def spawn_workers(hub_path, argv):
+    """Start WORKERS-1 copies of this agent (same command line) as SO_REUSEPORT workers"""
+    import subprocess
+    from usm_users import engine_boots
+    boots = engine_boots(snmpEngine)   # same engineID in every process: same snmpEngineBoots
+    procs = []
+    for worker_id in range(1, WORKERS):
+        env = dict(os.environ, MINI_AGENT_WORKERS=str(WORKERS),
+                   MINI_AGENT_WORKER_ID=str(worker_id), MINI_AGENT_HUB=hub_path,
+                   MINI_AGENT_HOST=AGENT_HOST, MINI_AGENT_PORT=str(AGENT_PORT),
+                   MINI_AGENT_ENGINE_BOOTS=str(boots))
+        procs.append(subprocess.Popen([sys.executable, os.path.abspath(__file__)] + argv,
+                                      env=env))
+    return procs
+
+def stop_workers(procs):
+    import subprocess
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def run_worker():
+    """Worker process: serve requests from the replica until the hub goes away"""
+    loop = snmpEngine.transport_dispatcher.loop
+    loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    loop.add_signal_handler(signal.SIGHUP, lambda: loop.create_task(reload_definitions("SIGHUP")))
+    replica.on_reload = lambda: loop.create_task(reload_definitions("hub"))
+    replica_task = loop.create_task(replica.run())
+    add_cpu_collector(publish_cores)
+    collectors_task = loop.create_task(collectors.run())
+    admission_task = loop.create_task(admission.run(ADMISSION_INTERVAL))
+    log.info("Worker %d/%d listo (hub %s)", WORKER_ID, WORKERS, HUB_SOCKET)
+    snmpEngine.transport_dispatcher.job_started(1)
+    try:
+        snmpEngine.transport_dispatcher.run_dispatcher()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tasks = (replica_task, collectors_task, admission_task)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        snmpEngine.transport_dispatcher.close_dispatcher()
+        collectors.close()
+        lazy_executor.shutdown(wait=False, cancel_futures=True)
+        store.close()
+
+def main(argv=None):
+    configure(parse_args(argv))
+    setup_logging(LOG_LEVELS, LOG_FORMAT)
+    create_agent()
+    if WORKER_ID:
+        run_worker()
+        return
+
     print("\n" + "="*60)
     print(" Mini SNMP Agent - Python 3.13 + PySNMP 7.1.22")
     print("="*60)
     print(f" Enterprise OID: 1.3.6.1.4.1.{ENTERPRISE_OID}")
-    print(f" Listening on: {host}:{port}")
+    print(f" Listening on: {AGENT_HOST}:{AGENT_PORT}" + (f" ({WORKERS} processes)" if WORKERS > 1 else ""))
+    if V3_USERS:
+        print(f" SNMPv3 users: {', '.join(V3_USERS)} (engineID {snmpEngine.snmpEngineID.prettyPrint()})")
     print(f" Email via: {SMTP_SERVER}")
     print(f" Agent started at: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(AGENT_START))}")
     print("="*60 + "\n")
@@ -466,18 +1552,56 @@ def main():
         send_trap_notification(snmpEngine, cpu, thr, email)
 
     loop = snmpEngine.transport_dispatcher.loop
-    print("Preparando event loop y tarea cpu_sampler...")
-    loop.create_task(cpu_sampler(store, trap_sender))
-    print("Tarea cpu_sampler lanzada.")
+    loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    hub = None
+    workers = []
+    if WORKERS > 1:
+        import tempfile
+        hub = StateHub(store, HUB_SOCKET or os.path.join(tempfile.gettempdir(), f'mini-agent-{AGENT_PORT}.sock'))
+        loop.run_until_complete(hub.start())
+        workers = spawn_workers(hub.path, sys.argv[1:] if argv is None else list(argv))
+        try:
+            loop.run_until_complete(hub.wait_for_workers(WORKERS - 1, WORKER_START_TIMEOUT))
+            log.info("✅ All %d workers ready", WORKERS - 1)
+        except asyncio.TimeoutError:
+            log.error("❌ Solo %d de %d workers conectaron", hub.workers, WORKERS - 1)
+    loop.add_signal_handler(signal.SIGHUP, lambda: loop.create_task(reload_definitions("SIGHUP", hub)))
+    if RELOAD_WATCH_INTERVAL:
+        loop.create_task(watch_definitions(RELOAD_WATCH_INTERVAL, hub))
+    add_cpu_collector(CpuSampler(store, trap_sender).publish)
+    loop.create_task(collectors.run())
+    loop.create_task(admission.run(ADMISSION_INTERVAL))
+    log.info("Admisión: %s req/s por origen, %s por comunidad/usuario, shedding al %d%% de ocupación",
+             ADMISSION_SOURCE_RATE or "∞", ADMISSION_COMMUNITY_RATE or "∞",
+             round(ADMISSION_SHED_ABOVE * 100))
+    log.info("Collectors lanzados (%s, cada %ss; pool de %d hilos).",
+             ", ".join(c.name for c in collectors.collectors), SAMPLE_INTERVAL, COLLECTOR_THREADS)
+    loop.create_task(store.writer.run())
+    loop.create_task(email_notifier.run())
+    loop.create_task(trap_originator.run())
+    log.info("Email notifier: %d workers, cola de %d", EMAIL_WORKERS, EMAIL_QUEUE_SIZE)
+    log.info("Persistencia: backend=%s policy=%s", STATE_BACKEND, PERSIST_POLICY)
     snmpEngine.transport_dispatcher.job_started(1)
     try:
-        print("Dispatcher RUN...")
+        log.info("Dispatcher RUN...")
         snmpEngine.transport_dispatcher.run_dispatcher()
     except KeyboardInterrupt:
-        print("\nShutting down...")
+        log.info("Shutting down...")
     finally:
+        if hub is not None:
+            hub.close()
+            stop_workers(workers)
         snmpEngine.transport_dispatcher.close_dispatcher()
-        print("Dispatcher CLOSED.")
+        collectors.close()
+        lazy_executor.shutdown(wait=False, cancel_futures=True)
+        log.info("Dispatcher CLOSED.")
+        log_sampler.debug("Collectors: %s", collectors.metrics())
+        if response_cache is not None:
+            log.info("Caché de retransmisiones: %s", response_cache.metrics())
+        log.info("Control de admisión: %s", admission.metrics())
+        email_notifier.close()
+        store.close()
+        log.info("Estado guardado (%s)", STATE_BACKEND)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,207 @@
+"""
+Asynchronous email notification pipeline.
+
+cpu_sampler used to run a blocking smtplib connect/STARTTLS/login/send on the
+PySNMP dispatcher loop. Now alerts go into a bounded asyncio queue and return
+right away. A small pool of workers drains the queue:
+
+- each worker owns one persistent SMTP session that is reused across alerts
+  (reconnected when the server drops it, closed after `idle_timeout` s idle)
+- the blocking smtplib calls run in a dedicated thread pool, never on the loop
+- transient failures (connection errors, 4xx replies) are retried with
+  exponential backoff; permanent ones (5xx: refused sender or recipients,
+  rejected data) fail at once
+- counters (queued/sent/failed/dropped/retries) plus the live queue depth are
+  available from metrics()
+
+For tests point it at a local stand-in, e.g.
+    python -m aiosmtpd -n -l 127.0.0.1:1025
+with starttls=False and an empty password (login is skipped);
+test_notify_email.py does that with a tiny in-process server.
+
+smtplib (and the ssl/email modules it pulls in) is imported when the first
+email is sent, not at agent startup.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from agent_logging import get_logger
+
+log = get_logger('notify')
+
+
+def is_transient(error):
+    """True if sending again later may succeed (connection trouble or a 4xx reply)"""
+    import smtplib
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):   # sender refused, data, helo...
+        return 400 <= error.smtp_code < 500
+    # SMTPException is an OSError too: only a dropped connection is worth a retry
+    return (isinstance(error, smtplib.SMTPServerDisconnected)
+            or not isinstance(error, smtplib.SMTPException))
+
+
+class SmtpSession:
+    """One reusable SMTP connection (used by a single worker at a time)"""
+
+    def __init__(self, server, port, sender, password, starttls, timeout):
+        self.server = server
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._smtp = None
+        self.connects = 0
+
+    def _connect(self):
+        import smtplib
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        smtp.ehlo()
+        if self.starttls:
+            smtp.starttls()
+            smtp.ehlo()
+        if self.password:
+            smtp.login(self.sender, self.password)
+        self._smtp = smtp
+        self.connects += 1
+
+    def send(self, msg):
+        if self._smtp is None:
+            self._connect()
+        self._smtp.send_message(msg)
+
+    def reset(self):
+        """Drop the connection (after an error or when idle)"""
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None:
+            import smtplib
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+
+
+class EmailNotifier:
+    def __init__(self, server, port, sender, password, starttls=True,
+                 workers=2, queue_size=100, max_retries=3, backoff=1.0,
+                 timeout=10, idle_timeout=60.0):
+        self.server = server
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.starttls = starttls
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.queue_size = queue_size
+        self.queue = None            # created in run(), on the agent loop
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='smtp')
+        self._sessions = []
+        self._tasks = []
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+
+    def submit(self, msg):
+        """Enqueue an email.message.Message without blocking; False if dropped"""
+        if self.queue is None:
+            self.dropped += 1
+            log.warning("⚠️ Email notifier not running, alert dropped")
+            return False
+        try:
+            self.queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log.warning("⚠️ Email queue full (%d), alert dropped", self.queue_size)
+            return False
+        self.queued += 1
+        return True
+
+    def metrics(self):
+        return {
+            "depth": self.queue.qsize() if self.queue is not None else 0,
+            "queued": self.queued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "connects": sum(s.connects for s in self._sessions),
+        }
+
+    async def run(self):
+        """Start the worker pool (call once from the agent loop)"""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        for _ in range(self.workers):
+            session = SmtpSession(self.server, self.port, self.sender, self.password,
+                                  self.starttls, self.timeout)
+            self._sessions.append(session)
+            self._tasks.append(asyncio.create_task(self._worker(session)))
+        await asyncio.gather(*self._tasks)
+
+    async def _worker(self, session):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                msg = await asyncio.wait_for(self.queue.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                await loop.run_in_executor(self._executor, session.reset)
+                continue
+            try:
+                await self._deliver(loop, session, msg)
+            except Exception as e:
+                # e.g. a UnicodeEncodeError from a bad header: drop this alert,
+                # keep the worker (and its pooled session) for the next ones
+                self.failed += 1
+                log.error("❌ Email could not be sent (not retried): %r", e)
+                await loop.run_in_executor(self._executor, session.reset)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, loop, session, msg):
+        import smtplib
+        attempt = 0
+        while True:
+            try:
+                await loop.run_in_executor(self._executor, session.send, msg)
+                self.sent += 1
+                log.info("✅ Email sent to %s", msg['To'])
+                return
+            except smtplib.SMTPAuthenticationError:
+                # Retrying will not fix bad credentials
+                await loop.run_in_executor(self._executor, session.reset)
+                self.failed += 1
+                log.error("❌ SMTP authentication failed (check App Password & 2FA).")
+                return
+            except (smtplib.SMTPException, OSError) as e:
+                await loop.run_in_executor(self._executor, session.reset)
+                attempt += 1
+                if not is_transient(e):
+                    self.failed += 1
+                    log.error("❌ Email rejected (permanent error, not retried): %s", e)
+                    return
+                if attempt > self.max_retries:
+                    self.failed += 1
+                    log.error("❌ Email error after %d attempts: %s", attempt, e)
+                    return
+                self.retries += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+
+    def close(self):
+        """Stop workers and close SMTP sessions; pending alerts are reported"""
+        for task in self._tasks:
+            task.cancel()
+        pending = self.queue.qsize() if self.queue is not None else 0
+        if pending:
+            log.warning("⚠️ %d email alert(s) not sent at shutdown", pending)
+        # A send may still be running in a pool thread: let it finish (bounded
+        # by the SMTP timeout) before closing the sessions it uses
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for session in self._sessions:
+            session.reset()
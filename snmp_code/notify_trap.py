@@ -0,0 +1,252 @@
+"""
+SNMP notification originator running on the agent's own SnmpEngine.
+
+Target address / params / notification tables are configured once in
+configure(); after that every trap is just a list of varbinds pushed onto a
+bounded asyncio queue with put_nowait(), so the caller (cpu_sampler) never
+waits on the network. A single sender task drains the queue through
+ntforg.NotificationOriginator on the shared engine and transport.
+
+Counters: queued (total accepted), sent, dropped (queue full / not running),
+errors (reported by PySNMP), plus the current queue depth.
+
+InformOriginator offers the same submit()/metrics()/run() interface for
+acknowledged SNMPv2c INFORMs.
+"""
+
+import asyncio
+import itertools
+import time
+from collections import deque
+
+from pysnmp.carrier.asyncio.dgram import udp
+from pysnmp.entity import config
+from pysnmp.entity.rfc3413 import ntforg
+
+from agent_logging import get_logger
+
+NOTIFICATION_NAME = 'agent-notification'
+TARGET_PARAMS = 'agent-trap-params'
+TARGET_TAG = 'agent-trap-targets'
+INFORM_PARAMS = 'agent-inform-params'
+# Extra tag on every inform target plus a community entry with the same tag:
+# responses from a known target address are only accepted for communities
+# whose transport tag matches one of the target's tags
+INFORM_ACK_TAG = 'agent-inform-acks'
+# Default context as bytes: VACM keys contexts by SnmpAdminString and a plain ''
+# is never matched (the notification is silently dropped as noSuchContext)
+DEFAULT_CONTEXT = b''
+
+log = get_logger('notify')
+
+
+class TrapOriginator:
+    def __init__(self, snmpEngine, targets, security_name='public',
+                 notify_type='trap', queue_size=256):
+        """
+        targets: list of (host, port) receivers
+        security_name: v1/v2c securityName already mapped to a community
+                       (config.addV1System) with a VACM notify view
+        """
+        self.snmpEngine = snmpEngine
+        self.targets = list(targets)
+        self.security_name = security_name
+        self.notify_type = notify_type
+        self.queue_size = queue_size
+        self.queue = None            # created in run(), on the agent loop
+        self._ntfOrg = ntforg.NotificationOriginator()
+        self.queued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def configure(self):
+        """Register target params/addresses once (SNMP-TARGET-MIB / NOTIFICATION-MIB)"""
+        config.addTargetParams(self.snmpEngine, TARGET_PARAMS, self.security_name,
+                               'noAuthNoPriv', 1)  # mpModel 1 = SNMPv2c
+        for idx, (host, port) in enumerate(self.targets, start=1):
+            config.addTargetAddr(self.snmpEngine, f'agent-nms-{idx}', udp.DOMAIN_NAME,
+                                 (host, port), TARGET_PARAMS, tagList=TARGET_TAG)
+        config.add_notification_target(self.snmpEngine, NOTIFICATION_NAME, 'agent-filter',
+                                       TARGET_TAG, self.notify_type)
+
+    def submit(self, varBinds):
+        """Enqueue a notification (sysUpTime.0, snmpTrapOID.0, ...); never blocks"""
+        if self.queue is None:
+            self.dropped += 1
+            return False
+        try:
+            self.queue.put_nowait(varBinds)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log.warning("⚠️ Trap queue full (%d), notification dropped", self.queue_size)
+            return False
+        self.queued += 1
+        return True
+
+    def metrics(self):
+        return {
+            "depth": self.queue.qsize() if self.queue is not None else 0,
+            "queued": self.queued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    def _cbFun(self, snmpEngine, sendRequestHandle, errorIndication,
+               errorStatus, errorIndex, varBinds, cbCtx):
+        if errorIndication:
+            self.errors += 1
+            log.error("❌ Notification %s failed: %s", sendRequestHandle, errorIndication)
+
+    async def run(self):
+        """Sender task: drains the queue on the dispatcher loop"""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        while True:
+            varBinds = await self.queue.get()
+            try:
+                # Only serialises and hands the datagram to the transport
+                self._ntfOrg.send_varbinds(self.snmpEngine, NOTIFICATION_NAME,
+                                           None, DEFAULT_CONTEXT, varBinds, self._cbFun)
+                self.sent += 1
+            except Exception as e:
+                self.errors += 1
+                log.error("❌ Trap send error: %s", e)
+            finally:
+                self.queue.task_done()
+
+
+class InformOriginator:
+    """
+    Acknowledged notifications (SNMPv2c InformRequest).
+
+    Each receiver gets its own notification target so acknowledgements can be
+    tracked per target. Outstanding informs live in a table keyed by a token
+    handed to PySNMP as the callback context (the handle send_varbinds
+    returns is not the one the callback receives). Retransmission is done by PySNMP
+    using the per-target `timeout`/`retries` (SNMP-TARGET-MIB). At most
+    `max_inflight` informs are outstanding per target. Anything beyond that
+    waits in a bounded per-target backlog and is sent as acks free slots.
+    Everything is callback-driven, so pending acks cost one dict entry each and
+    never block the dispatcher.
+    """
+
+    def __init__(self, snmpEngine, targets, security_name='public',
+                 timeout=1.5, retries=3, max_inflight=32, queue_size=1024,
+                 community=None):
+        self.snmpEngine = snmpEngine
+        self.targets = list(targets)
+        self.security_name = security_name
+        self.community = community or security_name
+        self.timeout = timeout
+        self.retries = retries
+        self.max_inflight = max_inflight
+        self.queue_size = queue_size
+        self._ntfOrg = ntforg.NotificationOriginator()
+        self._outstanding = {}       # token -> (target index, sent_at)
+        self._tokens = itertools.count(1)
+        self._inflight = [0] * len(self.targets)
+        self._backlog = [deque() for _ in self.targets]
+        self._running = False
+        self.queued = 0
+        self.sent = 0
+        self.acked = 0
+        self.timed_out = 0
+        self.dropped = 0
+        self.errors = 0
+        self.ack_time_total = 0.0
+
+    def configure(self):
+        config.addTargetParams(self.snmpEngine, INFORM_PARAMS, self.security_name,
+                               'noAuthNoPriv', 1)
+        config.addV1System(self.snmpEngine, INFORM_ACK_TAG, self.community,
+                           transportTag=INFORM_ACK_TAG, securityName=self.security_name)
+        for idx, (host, port) in enumerate(self.targets):
+            tag = f'agent-inform-{idx + 1}'
+            config.addTargetAddr(self.snmpEngine, f'agent-inform-nms-{idx + 1}', udp.DOMAIN_NAME,
+                                 (host, port), INFORM_PARAMS,
+                                 timeout=int(self.timeout * 100),  # TimeInterval: 1/100 s
+                                 retryCount=self.retries, tagList=f'{tag} {INFORM_ACK_TAG}')
+            config.add_notification_target(self.snmpEngine, tag, 'agent-filter', tag, 'inform')
+
+    def submit(self, varBinds):
+        """Send (or backlog) one inform per target; never blocks"""
+        if not self._running:
+            self.dropped += 1
+            return False
+        accepted = False
+        for idx in range(len(self.targets)):
+            if self._inflight[idx] < self.max_inflight:
+                self._send(idx, varBinds)
+                accepted = True
+            elif len(self._backlog[idx]) < self.queue_size:
+                self._backlog[idx].append(varBinds)
+                accepted = True
+            else:
+                self.dropped += 1
+        if accepted:
+            self.queued += 1
+        return accepted
+
+    def _send(self, idx, varBinds):
+        token = next(self._tokens)
+        # Registered first: PySNMP may call back synchronously on send errors
+        self._outstanding[token] = (idx, time.monotonic())
+        self._inflight[idx] += 1
+        try:
+            self._ntfOrg.send_varbinds(self.snmpEngine, f'agent-inform-{idx + 1}',
+                                       None, DEFAULT_CONTEXT, varBinds, self._cbFun, token)
+        except Exception as e:
+            if self._outstanding.pop(token, None) is not None:
+                self._inflight[idx] -= 1
+            self.errors += 1
+            log.error("❌ Inform send error: %s", e)
+            return
+        self.sent += 1
+
+    def _release(self, handle):
+        entry = self._outstanding.pop(handle, None)
+        if entry is None:
+            return None
+        idx, sent_at = entry
+        self._inflight[idx] -= 1
+        if self._backlog[idx]:
+            self._send(idx, self._backlog[idx].popleft())
+        return sent_at
+
+    def _cbFun(self, snmpEngine, sendRequestHandle, errorIndication,
+               errorStatus, errorIndex, varBinds, cbCtx):
+        sent_at = self._release(cbCtx)
+        if sent_at is None:
+            return
+        if errorIndication:
+            self.timed_out += 1
+            log.warning("❌ Inform %s not acknowledged: %s", sendRequestHandle, errorIndication)
+        else:
+            self.acked += 1
+            self.ack_time_total += time.monotonic() - sent_at
+
+    def metrics(self):
+        return {
+            "outstanding": len(self._outstanding),
+            "backlog": sum(len(b) for b in self._backlog),
+            "queued": self.queued,
+            "sent": self.sent,
+            "acked": self.acked,
+            "timed_out": self.timed_out,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "avg_ack_ms": round(self.ack_time_total / self.acked * 1000, 2) if self.acked else 0,
+        }
+
+    async def run(self):
+        """Housekeeping: expire entries PySNMP never called back for"""
+        self._running = True
+        deadline = self.timeout * (self.retries + 1) + 5.0
+        while True:
+            await asyncio.sleep(self.timeout)
+            now = time.monotonic()
+            stale = [h for h, (_, sent_at) in self._outstanding.items() if now - sent_at > deadline]
+            for handle in stale:
+                self._release(handle)
+                self.timed_out += 1
@@ -0,0 +1,135 @@
+"""
+Write-behind persistence for the JSON state file.
+
+JsonStore.save() no longer rewrites mib_state.json on every change: it only
+marks the store dirty. A background task coalesces all pending changes and
+flushes them once per interval (or as soon as max_pending changes pile up).
+Each flush serialises and writes in a worker thread and replaces the file
+atomically (temp file + os.replace), so a crash never leaves a torn JSON.
+
+Durability policies:
+- 'always'   : flush synchronously after every change (+ fsync). Safest, slowest.
+- 'interval' : coalesce changes, flush every `interval` s or `max_pending` changes.
+- 'shutdown' : keep everything in memory, flush only on close(). Fastest.
+"""
+
+import asyncio
+import json
+import os
+import threading
+
+from agent_logging import get_logger
+
+log = get_logger('persist')
+
+POLICIES = ('always', 'interval', 'shutdown')
+
+
+def write_json_atomic(fname, data, fsync=False):
+    """Write data as JSON to fname via temp file + rename"""
+    tmp = fname + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, fname)
+
+
+class WriteBehindWriter:
+    def __init__(self, fname, policy='interval', interval=2.0, max_pending=64):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown persistence policy {policy!r} (expected one of {POLICIES})")
+        self.fname = fname
+        self.policy = policy
+        self.interval = interval
+        self.max_pending = max_pending
+        self._data = None
+        self._pending = 0        # changes since last flush
+        self._lock = threading.Lock()
+        self._generation = 0     # snapshot sequence number
+        self._written = 0        # newest generation on disk
+        self._wake = None        # asyncio.Event, created inside run()
+        self.flushes = 0
+        self.coalesced = 0       # changes absorbed by a flush beyond the first
+
+    @property
+    def dirty(self):
+        return self._pending > 0
+
+    def load(self):
+        with open(self.fname) as f:
+            return json.load(f)
+
+    def mark_dirty(self, data, key=None):
+        """Record that `data` changed; flush according to the policy"""
+        self._data = data
+        self._pending += 1
+        if self.policy == 'always':
+            self.flush()
+        elif (self.policy == 'interval' and self._wake is not None
+                and self._pending >= self.max_pending):
+            self._wake.set()
+
+    def _take_snapshot(self):
+        # Values are str/int, so a shallow copy is a consistent snapshot
+        pending, self._pending = self._pending, 0
+        self.coalesced += max(0, pending - 1)
+        self._generation += 1
+        return self._generation, dict(self._data)
+
+    def _write(self, snapshot):
+        generation, data = snapshot
+        with self._lock:
+            # A slower thread must never overwrite a newer snapshot
+            if generation <= self._written:
+                return
+            write_json_atomic(self.fname, data, fsync=(self.policy == 'always'))
+            self._written = generation
+            self.flushes += 1
+
+    def flush(self):
+        """Synchronous flush (used by 'always' and on shutdown)"""
+        if not self.dirty:
+            return
+        snapshot = self._take_snapshot()
+        try:
+            self._write(snapshot)
+        except Exception as e:
+            # Keep the store dirty: the next flush retries with the current data
+            self._pending += 1
+            log.error("❌ Error saving %s: %s", self.fname, e)
+
+    async def flush_async(self):
+        """Flush off the event loop, in the default thread pool"""
+        if not self.dirty:
+            return
+        snapshot = self._take_snapshot()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._write, snapshot)
+        except Exception as e:
+            # Not only OSError: e.g. a TypeError from a value json cannot
+            # serialise must not end run() and stop every later flush
+            self._pending += 1
+            log.error("❌ Error saving %s: %s", self.fname, e)
+
+    async def run(self):
+        """Background flusher task (no-op loop for 'always'/'shutdown')"""
+        if self.policy != 'interval':
+            return
+        self._wake = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush_async()
+            except Exception as e:
+                log.error("❌ Write-behind flush failed: %s", e)
+
+    def close(self):
+        """Final flush; call once the dispatcher has stopped"""
+        self.flush()
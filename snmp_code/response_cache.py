@@ -0,0 +1,171 @@
+"""
+Retransmission-aware response cache.
+
+A manager that gets no answer in time sends the very same request again
+(same request-id). Without a cache every copy goes down the whole PySNMP
+path, and a retransmitted SET is validated, committed and persisted again.
+The transport asks this cache first:
+
+- requests are keyed by (source address, SNMP version, community or USM
+  user name, request-id, hash of the PDU). For SNMPv3 the id is the msgID
+  and the hash covers the whole message (the PDU may be encrypted), so only
+  byte-identical retransmissions match.
+- the first copy is registered as in flight and goes on to the agent. A
+  duplicate that arrives while it is still being handled (e.g. a deferred
+  SET waiting for the hub) is dropped: the first response answers both.
+  The agent may also drop a request without answering (unknown community,
+  undecodable PDU...), so an in-flight entry only lasts `in_flight`
+  seconds: after that a retransmission goes through again, and the entry
+  is counted as abandoned.
+- send_message() hands every outgoing message to store(). A response to a
+  registered request (same address, community/user and request-id) is kept
+  for `window` seconds and re-sent as-is to later duplicates, so a
+  retransmitted SET is answered without being applied twice and a
+  duplicate GET costs a header parse and a dict lookup.
+
+Memory is bounded by entries and by response bytes; the least recently used
+entries are evicted first. Only requests are cached (GET, GETNEXT, GETBULK,
+SET; v3 messages with the reportable flag); traps, informs and responses
+coming in are left alone.
+"""
+
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+
+from ber_fastpath import (BerError, REQUEST_TAGS, TAG_RESPONSE, V3_REPORTABLE, message_version,
+                          parse_request, parse_v3)
+
+MISS, HIT, IN_FLIGHT = 'miss', 'hit', 'in-flight'
+
+
+def pdu_hash(data):
+    return blake2b(data, digest_size=16).digest()
+
+
+class ResponseCache:
+    def __init__(self, window=5.0, max_entries=4096, max_bytes=8 << 20, clock=time.monotonic,
+                 in_flight=0.5):
+        self.window = window
+        self.in_flight_window = min(in_flight, window)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        # key -> [expires, response bytes or None while in flight, request ident]
+        self.entries = OrderedDict()
+        self.in_flight = {}      # (address, version, community/user, request-id) -> key
+        self.bytes = 0
+        self.hits = 0
+        self.dropped = 0         # duplicates of a request still in flight
+        self.abandoned = 0       # in-flight entries that expired without a response
+        self.stored = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _request(datagram, address):
+        """(key, ident) of a cacheable request, or None"""
+        try:
+            if message_version(datagram) == 3:
+                msg_id, flags, user = parse_v3(datagram)
+                if not flags & V3_REPORTABLE:
+                    return None
+                ident = (address, 3, user, msg_id)
+                return ident + (pdu_hash(datagram),), ident
+            version, community, pdu_tag, request_id, ps, pe, _, _ = parse_request(datagram)
+        except (BerError, IndexError):
+            return None
+        if pdu_tag not in REQUEST_TAGS:
+            return None
+        ident = (address, version, community, request_id)
+        return ident + (pdu_hash(datagram[ps:pe]),), ident
+
+    @staticmethod
+    def _response(message, address):
+        """ident of the request an outgoing message answers, or None"""
+        try:
+            if message_version(message) == 3:
+                msg_id, _, user = parse_v3(message)
+                return (address, 3, user, msg_id)
+            version, community, pdu_tag, request_id, _, _, _, _ = parse_request(message)
+        except (BerError, IndexError):
+            return None
+        return (address, version, community, request_id) if pdu_tag == TAG_RESPONSE else None
+
+    def lookup(self, datagram, address):
+        """(HIT, response) | (IN_FLIGHT, None) | (MISS, None); a miss is registered as in flight"""
+        address = (address[0], address[1])
+        request = self._request(datagram, address)
+        if request is None:
+            return MISS, None
+        key, ident = request
+        now = self.clock()
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.entries.move_to_end(key)
+            if entry[1] is None:
+                self.dropped += 1
+                return IN_FLIGHT, None
+            self.hits += 1
+            return HIT, entry[1]
+        if entry is not None:
+            self._remove(key, expired=True)
+        stale = self.in_flight.get(ident)
+        if stale is not None:            # same request-id, different PDU: a new request
+            self._remove(stale)
+        self.entries[key] = [now + self.in_flight_window, None, ident]
+        self.in_flight[ident] = key
+        self._expire(now)
+        return MISS, None
+
+    def store(self, message, address):
+        """Keep an outgoing response if it answers a request in flight"""
+        ident = self._response(message, (address[0], address[1]))
+        if ident is None:
+            return
+        key = self.in_flight.pop(ident, None)
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        entry[0] = self.clock() + self.window
+        entry[1] = message
+        self.entries.move_to_end(key)
+        self.bytes += len(message)
+        self.stored += 1
+        self._evict()
+
+    def _remove(self, key, expired=False):
+        _, response, ident = self.entries.pop(key)
+        if response is None:
+            if self.in_flight.get(ident) == key:
+                del self.in_flight[ident]
+            if expired:
+                self.abandoned += 1
+        else:
+            self.bytes -= len(response)
+
+    def _expire(self, now):
+        """Drop expired entries from the LRU end and abandoned requests, then enforce the bounds"""
+        entries = self.entries
+        while entries:
+            key = next(iter(entries))
+            if entries[key][0] > now:
+                break
+            self._remove(key, expired=True)
+        # in_flight is in registration order, i.e. in expiry order
+        in_flight = self.in_flight
+        while in_flight:
+            key = next(iter(in_flight.values()))
+            if entries[key][0] > now:
+                break
+            self._remove(key, expired=True)
+        self._evict()
+
+    def _evict(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def metrics(self):
+        return {"entries": len(self.entries), "bytes": self.bytes, "hits": self.hits,
+                "dropped": self.dropped, "abandoned": self.abandoned, "stored": self.stored,
+                "evictions": self.evictions}
@@ -0,0 +1,301 @@
+"""
+Shared state layer for the multi-process (SO_REUSEPORT) worker mode.
+
+With MINI_AGENT_WORKERS=N the agent runs N processes that all bind the same
+UDP port with SO_REUSEPORT, so the kernel spreads requests across them:
+
+- the hub (the process started by the user) owns the authoritative JsonStore:
+  it runs cpu_sampler, persistence and notifications, and applies every SET;
+- each worker keeps a read replica of the store and answers GET/GETNEXT/
+  GETBULK locally. SETs are validated locally, then forwarded to the hub,
+  which applies them in arrival order and broadcasts the new values to every
+  worker before acknowledging. The worker answers the SET only after the ack,
+  so a manager always reads its own writes.
+
+Protocol: JSON messages over a Unix stream socket, each one framed by a
+4-byte big-endian length. A snapshot or update can be as large as the whole
+state, so there is no line-length limit to hit (asyncio's StreamReader caps
+readline() at 64 KiB) and the blocking snapshot read in load() knows exactly
+how many bytes to consume.
+
+    hub -> worker   {"op": "snapshot", "data": {...}}          (on connect)
+                    {"op": "update", "values": {name: value}, "entries": [...]}
+                    {"op": "result", "id": n}
+                    {"op": "reload"}       (OID definitions changed: reload them)
+    worker -> hub   {"op": "set", "id": n, "values": {name: value}, "entries": [...]}
+
+"entries" carries changes to single entries of nested state (alarm rows),
+[[name, sub-key, entry or null], ...]: in the store they are keyed by a
+(name, sub-key) tuple, which JSON objects cannot hold. Only the changed rows
+travel, and concurrent SETs on different rows both apply at the hub.
+
+StateReplica implements the writer interface JsonStore expects (load,
+mark_dirty, flush, run, close), so a worker store is just
+JsonStore(..., writer=StateReplica(path)): load() blocks until the hub sends
+the snapshot and mark_dirty() is a no-op (only the hub persists).
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import socket
+import struct
+import time
+
+from agent_logging import get_logger
+
+log = get_logger('hub')
+
+
+FRAME = struct.Struct('>I')
+MAX_FRAME = 1 << 30            # anything longer is a corrupted stream
+
+
+def encode(msg):
+    body = json.dumps(msg, separators=(',', ':')).encode()
+    return FRAME.pack(len(body)) + body
+
+
+def pack_values(msg, values):
+    """Put {name: value, (name, sub-key): entry} into msg as "values"/"entries" """
+    msg["values"] = {name: value for name, value in values.items() if not isinstance(name, tuple)}
+    entries = [[name[0], name[1], value] for name, value in values.items() if isinstance(name, tuple)]
+    if entries:
+        msg["entries"] = entries
+    return msg
+
+
+def unpack_values(msg):
+    values = msg["values"]
+    for name, sub, value in msg.get("entries", ()):
+        values[(name, sub)] = value
+    return values
+
+
+async def read_message(reader):
+    """Next framed message from a StreamReader, or None at end of stream"""
+    try:
+        header = await reader.readexactly(FRAME.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ConnectionError("stream closed inside a frame header") from None
+        return None
+    size, = FRAME.unpack(header)
+    if size > MAX_FRAME:
+        raise ValueError(f"frame of {size} bytes")
+    try:
+        return json.loads(await reader.readexactly(size))
+    except asyncio.IncompleteReadError:
+        raise ConnectionError("stream closed inside a frame") from None
+
+
+def recv_exactly(sock, size):
+    """Blocking read of exactly size bytes (socket timeout applies)"""
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(min(size - len(buf), 1 << 20))
+        if not chunk:
+            raise ConnectionError("hub closed the connection before the snapshot")
+        buf += chunk
+    return bytes(buf)
+
+
+def reuseport_socket(host, port):
+    """Non-blocking UDP server socket other processes can bind too"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.setblocking(False)
+    return sock
+
+
+class StateHub:
+    def __init__(self, store, path):
+        self.store = store
+        self.path = path
+        self._clients = set()          # StreamWriter per connected worker
+        self._connected = None         # asyncio.Condition, created in start()
+        self._server = None
+        self.sets = 0
+        self.updates = 0
+        store.listeners.append(self.broadcast)
+
+    @property
+    def workers(self):
+        return len(self._clients)
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)       # stale socket from a previous run
+        self._connected = asyncio.Condition()
+        self._server = await asyncio.start_unix_server(self._serve, self.path)
+        log.info("Hub escuchando en %s", self.path)
+
+    async def wait_for_workers(self, count, timeout):
+        async with self._connected:
+            await asyncio.wait_for(
+                self._connected.wait_for(lambda: len(self._clients) >= count), timeout)
+
+    def broadcast(self, values):
+        """JsonStore listener: push changed values to every worker"""
+        if not self._clients:
+            return
+        line = encode(pack_values({"op": "update"}, values))
+        for writer in self._clients:
+            writer.write(line)
+        self.updates += 1
+
+    def send_reload(self):
+        """Tell every worker to reload the OID definitions the hub just swapped in"""
+        line = encode({"op": "reload"})
+        for writer in self._clients:
+            writer.write(line)
+
+    async def _serve(self, reader, writer):
+        writer.write(encode({"op": "snapshot", "data": dict(self.store.data)}))
+        self._clients.add(writer)
+        async with self._connected:
+            self._connected.notify_all()
+        log.info("Worker conectado (%d en total)", len(self._clients))
+        try:
+            while (msg := await read_message(reader)) is not None:
+                if msg["op"] == "set":
+                    # Applies, persists and broadcasts (listener) before the ack
+                    self.store.commit_values(unpack_values(msg))
+                    self.sets += 1
+                    writer.write(encode({"op": "result", "id": msg["id"]}))
+        except (ConnectionError, ValueError) as e:
+            log.warning("⚠️ Worker connection error: %s", e)
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+            log.warning("⚠️ Worker desconectado (%d restantes)", len(self._clients))
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        for writer in self._clients:
+            writer.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def metrics(self):
+        return {"workers": len(self._clients), "sets": self.sets, "updates": self.updates}
+
+
+class StateReplica:
+    def __init__(self, path, connect_timeout=15.0, snapshot_timeout=30.0):
+        self.path = path
+        self.connect_timeout = connect_timeout
+        self.snapshot_timeout = snapshot_timeout
+        self.on_update = None          # callable(values), set to JsonStore.apply_remote
+        self.on_hub_lost = None        # callable(), default: stop the event loop
+        self.on_reload = None          # callable(), hub reloaded the OID definitions
+        self._sock = None
+        self._writer = None
+        self._pending = {}             # set id -> future
+        self._ids = itertools.count(1)
+        self.forwarded = 0
+
+    # ---- writer interface (JsonStore) ----
+    dirty = False
+
+    def load(self):
+        """Connect to the hub (blocking) and return its snapshot"""
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+                break
+            except OSError:
+                sock.close()
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+        # Consume exactly the snapshot frame; later updates stay in the socket
+        # for the asyncio reader in run()
+        sock.settimeout(self.snapshot_timeout)
+        try:
+            size, = FRAME.unpack(recv_exactly(sock, FRAME.size))
+            if size > MAX_FRAME:
+                raise ConnectionError(f"bad snapshot frame from hub ({size} bytes)")
+            msg = json.loads(recv_exactly(sock, size))
+        except socket.timeout:
+            sock.close()
+            raise TimeoutError(f"no snapshot from the hub at {self.path} "
+                               f"within {self.snapshot_timeout:.0f} s") from None
+        except BaseException:
+            sock.close()
+            raise
+        if msg.get("op") != "snapshot":
+            raise ConnectionError(f"expected snapshot from hub, got {msg.get('op')!r}")
+        sock.setblocking(False)
+        self._sock = sock
+        return msg["data"]
+
+    def mark_dirty(self, data, key=None):
+        pass                           # the hub persists
+
+    def flush(self):
+        pass
+
+    async def flush_async(self):
+        pass
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        elif self._sock is not None:
+            self._sock.close()
+
+    # ---- replication ----
+    def forward_set(self, values):
+        """Send validated SET values to the hub; future resolves on its ack"""
+        fut = asyncio.get_running_loop().create_future()
+        if self._writer is None or self._writer.is_closing():
+            fut.set_exception(ConnectionError("hub not connected"))
+            return fut
+        set_id = next(self._ids)
+        self._pending[set_id] = fut
+        self._writer.write(encode(pack_values({"op": "set", "id": set_id}, values)))
+        self.forwarded += 1
+        return fut
+
+    def _handle(self, msg):
+        op = msg["op"]
+        if op == "update":
+            if self.on_update is not None:
+                self.on_update(unpack_values(msg))
+        elif op == "result":
+            fut = self._pending.pop(msg["id"], None)
+            if fut is not None and not fut.done():
+                fut.set_result(True)
+        elif op == "reload":
+            if self.on_reload is not None:
+                self.on_reload()
+        elif op == "snapshot" and self.on_update is not None:
+            self.on_update(msg["data"])
+
+    async def run(self):
+        reader, self._writer = await asyncio.open_unix_connection(sock=self._sock)
+        try:
+            while (msg := await read_message(reader)) is not None:
+                self._handle(msg)
+        except asyncio.CancelledError:
+            self._writer.close()       # orderly worker shutdown
+            raise
+        except (ConnectionError, ValueError) as e:
+            log.error("❌ Hub stream error: %s", e)
+        log.error("❌ Conexión con el hub perdida")
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(ConnectionError("hub connection lost"))
+        self._pending.clear()
+        if self.on_hub_lost is not None:
+            self.on_hub_lost()
+        else:
+            asyncio.get_running_loop().stop()
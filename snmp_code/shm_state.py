@@ -0,0 +1,339 @@
+"""
+Shared-memory state segment (seqlock) for cross-process reads.
+
+The agent state is laid out in a multiprocessing.shared_memory segment with
+one fixed-width slot per managed object, so other processes (SO_REUSEPORT
+workers, sidecars, exporters) read current values straight from memory: no
+syscalls, no pickling, no IPC round trip.
+
+Segment layout (native byte order, the segment never leaves the host):
+
+    header   magic "MINISHM1", version, slot count, layout length, owner pid
+    layout   JSON [[name, type, payload width], ...]   (self-describing)
+    slots    seq:u32 kind:u8 pad:u8 length:u16 payload[width]
+
+Each slot is guarded by a seqlock. There is exactly one writer (the hub /
+single agent process: cpu_sampler and the SET path):
+
+    seq += 1 (odd: write in progress) -> payload -> seq += 1 (even)
+
+Readers copy the slot and retry if seq was odd or changed meanwhile, so they
+never see a torn value and never block the writer. CPython performs the
+stores in program order; on weakly ordered CPUs (ARM) a concurrent reader
+could in theory observe them reordered, the retry loop does not fence.
+seq is stored through a uint32 memoryview (one aligned store):
+struct.pack_into zero-fills its target first, which would briefly publish
+seq = 0, an even value a reader would accept.
+
+SharedData wraps a segment in the dict interface JsonStore expects for
+`data` (get, [], items, dict(...)), so the store, the persistence writers
+and the SET path work unchanged on top of it.
+
+Dump a live segment from any process:
+    python shm_state.py mini-agent-state
+"""
+
+import json
+import os
+import struct
+import sys
+from collections.abc import MutableMapping
+from multiprocessing import resource_tracker, shared_memory
+
+MAGIC = b'MINISHM1'
+VERSION = 2
+HEADER = struct.Struct('=8sIIII')     # magic, version, slots, layout length, owner pid
+SLOT_HEADER = struct.Struct('=IBxH')  # seq, kind, length
+KIND_LENGTH = struct.Struct('=BxH')   # slot header without seq (offset + 4)
+INT = struct.Struct('=q')
+UINT = struct.Struct('=Q')
+
+KIND_ABSENT = 0
+KIND_INT = 1
+KIND_UINT = 2                         # Counter64 values above 2**63 - 1
+KIND_STR = 3
+
+INT_WIDTH = 8
+STR_WIDTH = 255                       # DisplayString SIZE (0..255)
+SPINS_BEFORE_YIELD = 64               # writer preempted mid-update: give it the CPU
+MAX_SPINS = 1_000_000                 # writer died mid-update -> give up
+
+
+class TornSlotError(RuntimeError):
+    """Slot stayed odd (write in progress) for MAX_SPINS reads"""
+
+
+def slot_width(type_name, props=None):
+    """Payload bytes reserved for an object of this SNMP type"""
+    if type_name in ("DisplayString", "OctetString"):
+        chars = (props or {}).get("max", STR_WIDTH)
+        return min(4 * chars, 4 * STR_WIDTH)   # worst case UTF-8
+    return INT_WIDTH
+
+
+def layout_for(registry):
+    """[(name, type, width)] for every scalar of a MibRegistry, in OID order"""
+    layout = []
+    for oid in registry:
+        name = registry.name(oid)
+        if name is not None:
+            props = registry.props(name)
+            layout.append((name, props["type"], slot_width(props["type"], props)))
+    return layout
+
+
+class SharedSegment:
+    def __init__(self, shm, layout, owner):
+        self.shm = shm
+        self.owner = owner                # creator: the single writer, unlinks on close
+        self.readonly = not owner
+        self.layout = [tuple(entry) for entry in layout]
+        self.index = {}                   # name -> slot number
+        self._offsets = []
+        self._widths = []
+        layout_len = len(json.dumps(self.layout).encode())
+        offset = _align(HEADER.size + layout_len)
+        for i, (name, _type, width) in enumerate(self.layout):
+            self.index[name] = i
+            self._offsets.append(offset)
+            self._widths.append(width)
+            offset = _align(offset + SLOT_HEADER.size + width)
+        self.size = offset
+        self.buf = shm.buf
+        self._seqs = shm.buf[:offset].cast('I')   # slot seq = _seqs[slot offset // 4]
+        self.retries = 0                  # reader retries (contention indicator)
+
+    # ---- construction ----
+    @classmethod
+    def create(cls, name, layout):
+        """
+        Create (or replace a stale) segment; the caller becomes the writer.
+        FileExistsError if the segment belongs to another live agent.
+        """
+        layout = [tuple(entry) for entry in layout]
+        blob = json.dumps(layout).encode()
+        size = cls._size_for(layout, len(blob))
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = _open_untracked(name)
+            owner = _owner_pid(stale)
+            stale.close()
+            if owner is not None and owner != os.getpid() and _pid_alive(owner):
+                raise FileExistsError(f"{name}: segmento en uso por el agente con pid {owner}")
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, len(layout), len(blob), os.getpid())
+        shm.buf[HEADER.size:HEADER.size + len(blob)] = blob
+        segment = cls(shm, layout, owner=True)
+        for i in range(len(layout)):
+            SLOT_HEADER.pack_into(segment.buf, segment._offsets[i], 0, KIND_ABSENT, 0)
+        return segment
+
+    @classmethod
+    def attach(cls, name):
+        """Open an existing segment read-only (layout comes from the segment)"""
+        shm = _open_untracked(name)
+        magic, version, slots, layout_len, _ = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            shm.close()
+            raise ValueError(f"{name}: not a mini agent state segment (v{VERSION})")
+        layout = json.loads(bytes(shm.buf[HEADER.size:HEADER.size + layout_len]))
+        if len(layout) != slots:
+            shm.close()
+            raise ValueError(f"{name}: corrupt layout")
+        return cls(shm, layout, owner=False)
+
+    @staticmethod
+    def _size_for(layout, layout_len):
+        offset = _align(HEADER.size + layout_len)
+        for _name, _type, width in layout:
+            offset = _align(offset + SLOT_HEADER.size + width)
+        return offset
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        self._seqs.release()
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    # ---- slot access ----
+    def read(self, slot):
+        """Consistent value of slot (None if absent)"""
+        buf = self.buf
+        seqs = self._seqs
+        offset = self._offsets[slot]
+        payload = offset + SLOT_HEADER.size
+        for spins in range(MAX_SPINS):
+            seq, kind, length = SLOT_HEADER.unpack_from(buf, offset)
+            if seq & 1:
+                self.retries += 1
+                if spins > SPINS_BEFORE_YIELD:
+                    os.sched_yield()
+                continue
+            if kind == KIND_INT:
+                value = INT.unpack_from(buf, payload)[0]
+            elif kind == KIND_STR:
+                value = bytes(buf[payload:payload + length])
+            elif kind == KIND_UINT:
+                value = UINT.unpack_from(buf, payload)[0]
+            else:
+                value = None
+            if seqs[offset >> 2] == seq:
+                return value.decode('utf-8', 'replace') if kind == KIND_STR else value
+            self.retries += 1
+        raise TornSlotError(f"slot {self.layout[slot][0]} locked by a dead writer?")
+
+    def write(self, slot, value):
+        """Publish value in slot (single writer)"""
+        if self.readonly:
+            raise TypeError("shared state segment attached read-only")
+        buf = self.buf
+        offset = self._offsets[slot]
+        payload = offset + SLOT_HEADER.size
+        if value is None:
+            kind, raw = KIND_ABSENT, None
+        elif isinstance(value, int):
+            kind, raw = (KIND_INT if value < 1 << 63 else KIND_UINT), None
+        else:
+            kind, raw = KIND_STR, _truncate(str(value).encode('utf-8'), self._widths[slot])
+        seqs = self._seqs
+        pos = offset >> 2
+        seq = seqs[pos]
+        seqs[pos] = (seq + 1) & 0xFFFFFFFF          # odd: readers retry
+        if kind == KIND_INT:
+            INT.pack_into(buf, payload, value)
+        elif kind == KIND_UINT:
+            UINT.pack_into(buf, payload, value & 0xFFFFFFFFFFFFFFFF)
+        elif kind == KIND_STR:
+            buf[payload:payload + len(raw)] = raw
+        KIND_LENGTH.pack_into(buf, offset + 4, kind, len(raw) if raw is not None else 0)
+        seqs[pos] = (seq + 2) & 0xFFFFFFFF          # even: published
+
+    def version(self, slot):
+        """Current seq of slot (changes on every write)"""
+        return self._seqs[self._offsets[slot] >> 2]
+
+
+class SharedData(MutableMapping):
+    """
+    dict-compatible view of a SharedSegment (JsonStore.data). Keys outside the
+    segment layout (extra entries in mib_state.json) stay in a local dict.
+    """
+
+    def __init__(self, segment, initial=None):
+        self.segment = segment
+        self._index = segment.index
+        self._local = {}
+        for name, value in (initial or {}).items():
+            if name not in self._index:
+                self._local[name] = value
+            elif not segment.readonly:
+                segment.write(self._index[name], value)
+
+    def __getitem__(self, name):
+        slot = self._index.get(name)
+        if slot is None:
+            return self._local[name]
+        value = self.segment.read(slot)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def get(self, name, default=None):
+        slot = self._index.get(name)
+        if slot is None:
+            return self._local.get(name, default)
+        value = self.segment.read(slot)
+        return default if value is None else value
+
+    def __setitem__(self, name, value):
+        slot = self._index.get(name)
+        if slot is None:
+            self._local[name] = value
+        else:
+            self.segment.write(slot, value)
+
+    def __delitem__(self, name):
+        slot = self._index.get(name)
+        if slot is None:
+            del self._local[name]
+        elif self.segment.read(slot) is None:
+            raise KeyError(name)
+        else:
+            self.segment.write(slot, None)
+
+    def __iter__(self):
+        for name, slot in self._index.items():
+            if self.segment.read(slot) is not None:
+                yield name
+        yield from self._local
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"SharedData({self.segment.name!r}, {dict(self)!r})"
+
+
+def _open_untracked(name):
+    """Open an existing segment without handing it to this process's resource tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)   # 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # Before 3.13 the tracker would unlink the segment when we exit
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _owner_pid(shm):
+    """pid of the agent that created a segment, or None (not ours / other version)"""
+    if shm.size < HEADER.size:
+        return None
+    magic, version, _, _, pid = HEADER.unpack_from(shm.buf, 0)
+    return pid if magic == MAGIC and version == VERSION else None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True                       # exists, owned by another user
+    return True
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _truncate(raw, width):
+    """Cut UTF-8 bytes to width without splitting a character"""
+    if len(raw) <= width:
+        return raw
+    return raw[:width].decode('utf-8', 'ignore').encode('utf-8')
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    name = argv[0] if argv else os.environ.get('MINI_AGENT_SHM', 'mini-agent-state')
+    segment = SharedSegment.attach(name)
+    try:
+        for name, type_name, _width in segment.layout:
+            print(f"{name:<20} {type_name:<14} {segment.read(segment.index[name])!r}")
+    finally:
+        segment.close()
+
+
+if __name__ == "__main__":
+    main()
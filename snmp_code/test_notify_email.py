@@ -0,0 +1,133 @@
+"""
+EmailNotifier against a local SMTP stand-in (no network, no credentials).
+
+The stand-in speaks just enough SMTP for smtplib (EHLO, MAIL, RCPT, DATA,
+RSET, QUIT) and records every accepted message. RCPT can be told to answer
+with a fixed code to exercise the retry policy.
+
+Usage:
+    python -m pytest -q test_notify_email.py
+"""
+
+import asyncio
+import socketserver
+import threading
+from email.message import EmailMessage
+
+import pytest
+
+from notify_email import EmailNotifier
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, rcpt_replies=()):
+        super().__init__(('127.0.0.1', 0), SmtpHandler)
+        self.rcpt_replies = list(rcpt_replies)   # codes for the next RCPTs, then 250
+        self.rcpts = 0
+        self.messages = []
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        self.reply('220 stand-in ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line[:4].upper()
+            if verb in (b'EHLO', b'HELO'):
+                self.reply('250 stand-in')
+            elif verb == b'RCPT':
+                server.rcpts += 1
+                code = server.rcpt_replies.pop(0) if server.rcpt_replies else 250
+                self.reply(f'{code} recipient {"ok" if code == 250 else "refused"}')
+            elif verb == b'DATA':
+                self.reply('354 go ahead')
+                body = []
+                for data in iter(self.rfile.readline, b''):
+                    if data == b'.\r\n':
+                        break
+                    body.append(data)
+                server.messages.append(b''.join(body))
+                self.reply('250 queued')
+            elif verb == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:                      # MAIL, RSET, NOOP
+                self.reply('250 ok')
+
+
+class BrokenHeaders(EmailMessage):
+    """A message that cannot be serialised (as a bad header would)"""
+
+    def get_all(self, name, failobj=None):
+        raise UnicodeEncodeError('ascii', name, 0, 1, 'bad header')
+
+
+@pytest.fixture
+def smtp_server(request):
+    server = SmtpStandIn(getattr(request, 'param', ()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_message(subject):
+    msg = EmailMessage()
+    msg['From'] = 'agent@example.org'
+    msg['To'] = 'admin@example.org'
+    msg['Subject'] = subject
+    msg.set_content('cpuUsage over threshold')
+    return msg
+
+
+def deliver(server, messages, **kwargs):
+    """Run a notifier until every message has been handled; returns it"""
+    notifier = EmailNotifier('127.0.0.1', server.server_address[1], 'agent@example.org', '',
+                             starttls=False, workers=1, backoff=0.01, timeout=5, **kwargs)
+
+    async def main():
+        runner = asyncio.create_task(notifier.run())
+        while notifier.queue is None:
+            await asyncio.sleep(0)
+        for msg in messages:
+            assert notifier.submit(msg)
+        await asyncio.wait_for(notifier.queue.join(), 10)
+        runner.cancel()
+
+    asyncio.run(main())
+    notifier.close()
+    return notifier
+
+
+def test_sends_through_one_pooled_session(smtp_server):
+    notifier = deliver(smtp_server, [make_message('alert 1'), make_message('alert 2')])
+    assert notifier.metrics()['sent'] == 2
+    assert notifier.metrics()['connects'] == 1
+    assert [b'Subject: alert 1' in m for m in smtp_server.messages] == [True, False]
+
+
+@pytest.mark.parametrize('smtp_server', [[550]], indirect=True)
+def test_permanent_error_is_not_retried(smtp_server):
+    notifier = deliver(smtp_server, [make_message('refused')])
+    assert (notifier.failed, notifier.retries, smtp_server.rcpts) == (1, 0, 1)
+
+
+@pytest.mark.parametrize('smtp_server', [[451, 451]], indirect=True)
+def test_transient_error_is_retried(smtp_server):
+    notifier = deliver(smtp_server, [make_message('greylisted')])
+    assert (notifier.sent, notifier.retries, smtp_server.rcpts) == (1, 2, 3)
+
+
+def test_unexpected_error_keeps_the_queue_draining(smtp_server):
+    notifier = deliver(smtp_server, [BrokenHeaders(), make_message('after')])
+    assert (notifier.failed, notifier.sent) == (1, 1)
+    assert len(smtp_server.messages) == 1
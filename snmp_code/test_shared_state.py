@@ -0,0 +1,127 @@
+"""
+Hub <-> replica replication with messages far larger than a socket buffer
+or asyncio's 64 KiB StreamReader line limit.
+
+The hub runs on its own event loop in a thread (as in the hub process); the
+replica does the blocking load() and then runs its reader on the test's loop.
+
+Usage:
+    python -m pytest -q test_shared_state.py
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+
+import pytest
+
+from shared_state import StateHub, StateReplica
+
+
+class DictStore:
+    """The parts of JsonStore the hub uses"""
+
+    def __init__(self, data):
+        self.data = data
+        self.listeners = []
+
+    def commit_values(self, values):
+        for name, value in values.items():
+            if isinstance(name, tuple):            # one nested entry, e.g. an alarm row
+                entries = self.data.setdefault(name[0], {})
+                if value is None:
+                    entries.pop(name[1], None)
+                else:
+                    entries[name[1]] = value
+            else:
+                self.data[name] = value
+        for listener in self.listeners:
+            listener(values)
+
+
+@pytest.fixture
+def hub():
+    path = os.path.join(tempfile.mkdtemp(), 'hub.sock')
+    store = DictStore({f"value{i}": f"{i:08d}" for i in range(100_000)})
+    hub = StateHub(store, path)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(hub.start(), loop).result(5)
+    yield hub, loop
+    loop.call_soon_threadsafe(hub.close)
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_snapshot_larger_than_the_socket_buffer(hub):
+    hub, _ = hub
+    replica = StateReplica(hub.path, connect_timeout=5, snapshot_timeout=10)
+    data = replica.load()
+    replica.close()
+    assert len(data) == 100_000 and data["value99999"] == "00099999"
+
+
+def test_snapshot_timeout_raises(tmp_path):
+    import socket
+    path = str(tmp_path / 'silent.sock')
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    replica = StateReplica(path, connect_timeout=1, snapshot_timeout=0.2)
+    with pytest.raises(TimeoutError, match="no snapshot from the hub"):
+        replica.load()
+    server.close()
+
+
+def test_updates_and_sets_over_64k(hub):
+    hub, hub_loop = hub
+    replica = StateReplica(hub.path, connect_timeout=5)
+    replica.load()
+    updates = []
+    big = {"alarms": {str(i): ["x" * 100, i] for i in range(2000)}}   # ~250 KB
+
+    async def main():
+        got = asyncio.Event()
+        replica.on_update = lambda values: (updates.append(values), got.set())
+        replica.on_hub_lost = got.set
+        reader = asyncio.create_task(replica.run())
+        while replica._writer is None:
+            await asyncio.sleep(0.01)
+        # worker -> hub SET, hub -> worker update and ack
+        await asyncio.wait_for(replica.forward_set(big), 10)
+        await asyncio.wait_for(got.wait(), 10)
+        reader.cancel()
+
+    asyncio.run(main())
+    assert updates == [big]
+    assert hub.store.data["alarms"] == big["alarms"]
+    assert hub_loop.is_running() and hub.sets == 1
+
+
+def test_row_entries_from_two_workers_both_apply(hub):
+    hub, _ = hub
+    hub.store.data["alarms"] = {"1": {"status": 1}}
+    replicas = [StateReplica(hub.path, connect_timeout=5) for _ in range(2)]
+    for replica in replicas:
+        replica.load()
+    seen = [[], []]
+
+    async def main():
+        for replica, updates in zip(replicas, seen):
+            replica.on_update = updates.append
+        readers = [asyncio.create_task(r.run()) for r in replicas]
+        while any(r._writer is None for r in replicas):
+            await asyncio.sleep(0.01)
+        await asyncio.gather(replicas[0].forward_set({("alarms", "2"): {"status": 1}}),
+                             replicas[1].forward_set({("alarms", "1"): None, "manager": "x"}))
+        await asyncio.sleep(0.1)
+        for reader in readers:
+            reader.cancel()
+
+    asyncio.run(main())
+    assert hub.store.data["alarms"] == {"2": {"status": 1}}
+    assert hub.store.data["manager"] == "x"
+    # every replica got both changes, with the tuple keys restored
+    for updates in seen:
+        merged = {k: v for values in updates for k, v in values.items()}
+        assert merged == {("alarms", "2"): {"status": 1}, ("alarms", "1"): None, "manager": "x"}
@@ -0,0 +1,192 @@
+"""
+SNMPv3 USM users with localized keys cached per snmpEngineID.
+
+RFC 3414 turns every passphrase into a key in two steps: hash_passphrase()
+(1 MB of the auth hash: the expensive part) and localize_key() for the
+engine that authenticates the messages. PySNMP does both in add_v3_user()
+on every start; the per-request cost is then the HMAC of the whole message
+plus, for authPriv, the DES/AES pass over the scoped PDU (see bench_usm.py).
+
+configure_users() registers each user with its keys already localized
+(USM_KEY_TYPE_LOCALIZED), taken from a LocalizedKeyCache:
+
+- the cache is keyed by sha256(kind, protocols, snmpEngineID, passphrase),
+  so the file never holds a passphrase and a changed passphrase, protocol
+  or engineID is just a miss; only the entries used by the current users
+  are written back (removed users do not linger)
+- the file holds localized keys, which authenticate (and decrypt) for this
+  engine: written atomically with mode 0600
+- keys are only valid for one snmpEngineID, so the agent runs with a stable
+  one (engine_id_from(): RFC 3411 enterprise + text format, derived from the
+  bind address) instead of PySNMP's random default
+
+Users map to VACM like the communities: every user gets the read view,
+'rw' users also the write view, at the security level their protocols give
+(noAuthNoPriv / authNoPriv / authPriv).
+"""
+
+import hashlib
+import json
+import os
+
+from pysnmp.entity import config
+from pysnmp.proto import rfc1902
+
+from agent_logging import get_logger
+
+log = get_logger('')
+
+AUTH_PROTOCOLS = {
+    'none': config.USM_AUTH_NONE,
+    'md5': config.USM_AUTH_HMAC96_MD5,
+    'sha': config.USM_AUTH_HMAC96_SHA,
+    'sha224': config.USM_AUTH_HMAC128_SHA224,
+    'sha256': config.USM_AUTH_HMAC192_SHA256,
+    'sha384': config.USM_AUTH_HMAC256_SHA384,
+    'sha512': config.USM_AUTH_HMAC384_SHA512,
+}
+PRIV_PROTOCOLS = {
+    'none': config.USM_PRIV_NONE,
+    'des': config.USM_PRIV_CBC56_DES,
+    'aes': config.USM_PRIV_CFB128_AES,
+    'aes192': config.USM_PRIV_CFB192_AES,
+    'aes256': config.USM_PRIV_CFB256_AES,
+}
+MIN_PASSPHRASE = 8        # RFC 3414 section 11.2
+
+CACHE_VERSION = 1
+
+
+def engine_id_from(enterprise, text):
+    """RFC 3411 snmpEngineID: enterprise number, format 5 (octets), 8 bytes of sha256(text)"""
+    return ((0x80000000 | enterprise).to_bytes(4, 'big') + b'\x05'
+            + hashlib.sha256(text.encode()).digest()[:8])
+
+
+def localize_auth_key(auth_proto, passphrase, engine_id):
+    service = config.AUTH_SERVICES[auth_proto]
+    return bytes(service.localize_key(service.hash_passphrase(rfc1902.OctetString(passphrase)),
+                                      rfc1902.OctetString(engine_id)))
+
+
+def localize_priv_key(auth_proto, priv_proto, passphrase, engine_id):
+    service = config.PRIV_SERVICES[priv_proto]
+    master = service.hash_passphrase(auth_proto, rfc1902.OctetString(passphrase))
+    return bytes(service.localize_key(auth_proto, master, rfc1902.OctetString(engine_id)))
+
+
+def security_level(auth, priv):
+    if priv != 'none':
+        return 'authPriv'
+    return 'authNoPriv' if auth != 'none' else 'noAuthNoPriv'
+
+
+def check_user(name, auth, auth_pass, priv, priv_pass, access):
+    """ValueError with the reason if a V3_USERS entry is unusable"""
+    if auth not in AUTH_PROTOCOLS:
+        raise ValueError(f"usuario {name}: protocolo de autenticación desconocido {auth!r}")
+    if priv not in PRIV_PROTOCOLS:
+        raise ValueError(f"usuario {name}: protocolo de privacidad desconocido {priv!r}")
+    if auth == 'none' and priv != 'none':
+        raise ValueError(f"usuario {name}: privacidad sin autenticación")
+    for proto, passphrase in ((auth, auth_pass), (priv, priv_pass)):
+        if proto != 'none' and len(passphrase or '') < MIN_PASSPHRASE:
+            raise ValueError(f"usuario {name}: passphrase de menos de {MIN_PASSPHRASE} caracteres")
+    if access not in ('ro', 'rw'):
+        raise ValueError(f"usuario {name}: acceso {access!r} (ro o rw)")
+
+
+class LocalizedKeyCache:
+    def __init__(self, fname):
+        self.fname = fname
+        self.keys = {}       # digest -> localized key (hex), as loaded
+        self.used = {}       # digest -> localized key (hex), needed by the current users
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.fname, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.keys = dict(data.get("keys", {}))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            log.warning("⚠️ Caché de claves USM ilegible (%s): %s; se recalculan", self.fname, e)
+
+    @staticmethod
+    def _digest(*parts):
+        h = hashlib.sha256()
+        for part in parts:
+            part = part if isinstance(part, bytes) else str(part).encode()
+            h.update(len(part).to_bytes(4, 'big') + part)
+        return h.hexdigest()
+
+    def _get(self, digest, localize):
+        key = self.keys.get(digest)
+        if key is None:
+            self.misses += 1
+            key = localize().hex()
+        else:
+            self.hits += 1
+        self.used[digest] = key
+        return bytes.fromhex(key)
+
+    def auth_key(self, auth_proto, passphrase, engine_id):
+        return self._get(self._digest('auth', auth_proto, engine_id, passphrase),
+                         lambda: localize_auth_key(auth_proto, passphrase, engine_id))
+
+    def priv_key(self, auth_proto, priv_proto, passphrase, engine_id):
+        return self._get(self._digest('priv', auth_proto, priv_proto, engine_id, passphrase),
+                         lambda: localize_priv_key(auth_proto, priv_proto, passphrase, engine_id))
+
+    def save(self):
+        """Write the keys used by this run if they differ from the file (mode 0600)"""
+        if self.used == self.keys:
+            return
+        tmp = self.fname + '.tmp'
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"version": CACHE_VERSION, "keys": self.used}, f, indent=1)
+        os.replace(tmp, self.fname)
+        self.keys = dict(self.used)
+
+
+def configure_users(snmpEngine, users, cache):
+    """
+    Register users = {name: (auth, auth pass, priv, priv pass, 'ro'|'rw')}
+    in USM (localized keys from cache) and VACM. Returns the names with
+    write access.
+    """
+    engine_id = snmpEngine.snmpEngineID.asOctets()
+    writers = set()
+    for name, (auth, auth_pass, priv, priv_pass, access) in users.items():
+        check_user(name, auth, auth_pass, priv, priv_pass, access)
+        auth_proto, priv_proto = AUTH_PROTOCOLS[auth], PRIV_PROTOCOLS[priv]
+        auth_key = cache.auth_key(auth_proto, auth_pass, engine_id) if auth != 'none' else None
+        priv_key = (cache.priv_key(auth_proto, priv_proto, priv_pass, engine_id)
+                    if priv != 'none' else None)
+        config.add_v3_user(snmpEngine, name, auth_proto, auth_key, priv_proto, priv_key,
+                           authKeyType=config.USM_KEY_TYPE_LOCALIZED,
+                           privKeyType=config.USM_KEY_TYPE_LOCALIZED)
+        config.addVacmUser(snmpEngine, 3, name, security_level(auth, priv),
+                           readSubTree=(1, 3, 6, 1),
+                           writeSubTree=(1, 3, 6, 1) if access == 'rw' else ())
+        if access == 'rw':
+            writers.add(name)
+        log.info("Usuario SNMPv3 %s: %s/%s, %s", name, auth, priv, access)
+    cache.save()
+    return writers
+
+
+def engine_boots(snmpEngine):
+    (boots,) = snmpEngine.get_mib_builder().import_symbols('__SNMP-FRAMEWORK-MIB', 'snmpEngineBoots')
+    return int(boots.syntax)
+
+
+def set_engine_boots(snmpEngine, value):
+    """Workers share the hub's engineID, so they must also report its snmpEngineBoots"""
+    (boots,) = snmpEngine.get_mib_builder().import_symbols('__SNMP-FRAMEWORK-MIB', 'snmpEngineBoots')
+    boots.syntax = boots.syntax.clone(value)